@@ -1,10 +1,25 @@
-from flask import Blueprint, request, jsonify
-from models import db, Category
+from flask import Blueprint, Response, request, jsonify
+from models import db
 from sqlalchemy import or_
+from services.catalog_version import product_version
+from services.category_cache import category_cache
+from utils.http_cache import conditional_get
 
 categories_bp = Blueprint('categories', __name__)
 
+def _categories_version():
+    # Category has no updated_at, so no Last-Modified unless products are embedded
+    token = category_cache.snapshot().digest
+    if request.args.get('include_products', 'false').lower() == 'true':
+        product_token, last_modified = product_version.current()
+        return f"{token}|{product_token}", last_modified
+    return token, None
+
+def _tree_version():
+    return category_cache.snapshot().digest, None
+
 @categories_bp.route('/categories', methods=['GET'])
+@conditional_get(_categories_version, max_age=300)
 def get_categories():
     """Get all categories with optional filtering"""
     try:
@@ -14,24 +29,14 @@ def get_categories():
         include_products = request.args.get('include_products', 'false').lower() == 'true'
         active_only = request.args.get('active_only', 'true').lower() == 'true'
         
-        # Build query
-        query = Category.query
-        
-        if active_only:
-            query = query.filter(Category.is_active == True)
-        
-        if parent_id is not None:
-            query = query.filter(Category.parent_id == parent_id)
-        else:
-            # Get root categories by default
-            query = query.filter(Category.parent_id.is_(None))
-        
-        categories = query.order_by(Category.name).all()
+        # Select from the cached category snapshot (root categories by default)
+        snapshot = category_cache.snapshot()
+        categories = snapshot.list_children(parent_id, active_only)
         
         return jsonify({
             'success': True,
             'count': len(categories),
-            'categories': [cat.to_dict(include_children, include_products) for cat in categories]
+            'categories': snapshot.serialize(categories, include_children, include_products)
         })
         
     except Exception as e:
@@ -44,41 +49,27 @@ def get_category(category_id):
         include_children = request.args.get('include_children', 'false').lower() == 'true'
         include_products = request.args.get('include_products', 'false').lower() == 'true'
         
-        category = Category.query.filter_by(id=category_id, is_active=True).first()
+        snapshot = category_cache.snapshot()
+        category = snapshot.by_id.get(category_id)
         
-        if not category:
+        if not category or not category['is_active']:
             return jsonify({'error': 'Category not found'}), 404
         
         return jsonify({
             'success': True,
-            'category': category.to_dict(include_children, include_products)
+            'category': snapshot.serialize([category], include_children, include_products)[0]
         })
         
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 @categories_bp.route('/categories/tree', methods=['GET'])
+@conditional_get(_tree_version, max_age=3600)
 def get_category_tree():
     """Get full category tree structure"""
     try:
-        def build_tree(parent_id=None):
-            categories = Category.query.filter_by(parent_id=parent_id, is_active=True)\
-                                    .order_by(Category.name).all()
-            
-            tree = []
-            for category in categories:
-                cat_dict = category.to_dict()
-                cat_dict['children'] = build_tree(category.id)
-                tree.append(cat_dict)
-            
-            return tree
-        
-        tree = build_tree()
-        
-        return jsonify({
-            'success': True,
-            'category_tree': tree
-        })
+        # Pre-serialized once per category version
+        return Response(category_cache.snapshot().tree_json, mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
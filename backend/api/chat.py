@@ -1,12 +1,31 @@
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from models import db, ChatSession, Product, Category
 from services.ai_service import AIService
+from services import catalog_events
+from services.conversation_memory import ConversationMemory
+from utils.chat_history import history_cursors, json_array_chunks, page_history, parse_history_args, stream_history
 import uuid
 import json
 
 chat_bp = Blueprint('chat', __name__)
 ai_service = AIService()
+chat_memory = ConversationMemory(ChatSession, ChatSession.timestamp)
+_brands_loaded = False
+
+def _ensure_brands_loaded():
+    """Teach the intent matcher the catalog's brands on first use"""
+    global _brands_loaded
+    if not _brands_loaded:
+        brands = db.session.query(Product.brand).filter(Product.brand.isnot(None)).distinct()
+        ai_service.matcher.add_brands(brand for (brand,) in brands)
+        _brands_loaded = True
+
+def _track_new_brand(op, model, values):
+    if op != 'delete' and values.get('brand'):
+        ai_service.matcher.add_brands([values['brand']])
+
+catalog_events.subscribe(Product, _track_new_brand)
 
 @chat_bp.route('/chat', methods=['POST'])
 def chat():
@@ -22,19 +41,28 @@ def chat():
         
         session_id = data.get('session_id') or str(uuid.uuid4())
         
-        # Extract intent
-        intent = ai_service.extract_intent(user_message)
+        # Extract intent, brands and price range in one pass
+        _ensure_brands_loaded()
+        analysis = ai_service.analyze_message(user_message)
+        intent = ai_service.extract_intent(user_message, analysis)
         
         # Get context based on intent
         context = {}
         if intent == 'search':
-            # Get some sample products for context
-            sample_products = Product.query.filter(Product.is_active == True)\
-                                         .limit(3).all()
+            # Get some sample products for context, narrowed by brand and price if given
+            query = Product.query.filter(Product.is_active == True)
+            if analysis['brands']:
+                query = query.filter(Product.brand.in_(analysis['brands']))
+            if analysis['price_range']:
+                min_price, max_price = analysis['price_range']
+                query = query.filter(Product.price.between(min_price, max_price))
+            sample_products = query.limit(3).all()
             context['sample_products'] = [p.to_dict() for p in sample_products]
         
         # Generate AI response
-        bot_response = ai_service.generate_response(user_message, context)
+        bot_response = ai_service.generate_response(
+            user_message, context, history=chat_memory.messages(session_id)
+        )
         
         # Save to database
         chat_entry = ChatSession(
@@ -46,6 +74,7 @@ def chat():
         )
         db.session.add(chat_entry)
         db.session.commit()
+        chat_memory.record(session_id, user_message, bot_response)
         
         return jsonify({
             'success': True,
@@ -61,26 +90,78 @@ def chat():
 
 @chat_bp.route('/chat/history', methods=['GET'])
 def get_chat_history():
-    """Get chat history for session"""
+    """Get chat history for session, streamed whole or one page at a time"""
     try:
         session_id = request.args.get('session_id')
         if not session_id:
             return jsonify({'error': 'session_id is required'}), 400
         
-        messages = ChatSession.query.filter_by(session_id=session_id)\
-                                  .order_by(ChatSession.timestamp.asc())\
-                                  .all()
+        try:
+            limit, before, after = parse_history_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # context_data is only loaded and decoded when asked for
+        include_context = request.args.get('include_context', 'false').lower() == 'true'
+        columns = [ChatSession.id, ChatSession.session_id, ChatSession.user_message,
+                   ChatSession.bot_response, ChatSession.intent, ChatSession.timestamp]
+        if include_context:
+            columns.append(ChatSession.context_data)
+        
+        def serialize(row):
+            message = {
+                'id': row.id,
+                'session_id': row.session_id,
+                'user_message': row.user_message,
+                'bot_response': row.bot_response,
+                'intent': row.intent,
+                'timestamp': row.timestamp.isoformat() if row.timestamp else None
+            }
+            if include_context:
+                message['context_data'] = json.loads(row.context_data) if row.context_data else {}
+            return message
+        
+        if limit is None:
+            # Start the query here so database errors still get a 500
+            rows = iter(stream_history(ChatSession, ChatSession.timestamp, session_id, columns))
+            return Response(stream_with_context(_history_envelope(session_id, rows, serialize)),
+                            mimetype='application/json')
+        
+        rows, has_more = page_history(ChatSession, ChatSession.timestamp, session_id,
+                                      columns, limit, before, after)
+        before_cursor, after_cursor = history_cursors(rows, 'timestamp')
         
         return jsonify({
             'success': True,
             'session_id': session_id,
-            'message_count': len(messages),
-            'messages': [msg.to_dict() for msg in messages]
+            'message_count': len(rows),
+            'messages': [serialize(row) for row in rows],
+            'pagination': {
+                'limit': limit,
+                'direction': 'newer' if after else 'older',
+                'has_more': has_more,
+                'before_cursor': before_cursor,
+                'after_cursor': after_cursor
+            }
         })
         
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+def _history_envelope(session_id, rows, serialize):
+    """The usual history response, with messages encoded as they are read"""
+    count = 0
+    
+    def counting(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+    
+    yield f'{{"success": true, "session_id": {json.dumps(session_id)}, "messages": '
+    yield from json_array_chunks(counting(rows), serialize)
+    yield f', "message_count": {count}}}'
+
 @chat_bp.route('/chat/clear', methods=['POST'])
 def clear_chat():
     """Clear chat session"""
@@ -93,6 +174,8 @@ def clear_chat():
         
         deleted_count = ChatSession.query.filter_by(session_id=session_id).delete()
         db.session.commit()
+        # Otherwise the next message would still be answered with the cleared turns as context
+        chat_memory.forget(session_id)
         
         return jsonify({
             'success': True,
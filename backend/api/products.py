@@ -1,11 +1,124 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from models import db, Product, Category
 from sqlalchemy import or_, and_, desc, asc
+from sqlalchemy.orm import selectinload
 from config import Config
+import numpy as np
+from services import catalog_events
+from services.catalog_snapshot import SORT_COLUMNS, catalog_snapshots
+from services.catalog_version import product_version
+from services.cooccurrence import recommendation_store
+from services.category_cache import category_cache
+from services.product_cache import create_product_cache
+from services.top_lists import TopLists
+from utils.http_cache import conditional_get
+from utils.pagination import decode_cursor, encode_cursor, seek_after
 
 products_bp = Blueprint('products', __name__)
 
+# Serialized product dicts (with category) shared by the detail and list endpoints
+product_cache = create_product_cache('api-product')
+
+# Featured and top-rated id lists, rebuilt in the background after rating changes
+top_lists = TopLists(Product)
+
+def _invalidate_product(op, model, values):
+    product_cache.invalidate(values['id'])
+    top_lists.mark_dirty()
+
+def _invalidate_category_products(op, model, values):
+    product_cache.invalidate_category(values['id'])
+
+catalog_events.subscribe(Product, _invalidate_product)
+catalog_events.subscribe(Category, _invalidate_category_products)
+
+def _catalog_version():
+    # Listings embed each product's category
+    token, last_modified = product_version.current()
+    return f"{token}|{category_cache.snapshot().digest}", last_modified
+
+def _load_product_payloads(product_ids):
+    products = Product.query.options(selectinload(Product.category))\
+                            .filter(Product.id.in_(product_ids), Product.is_active == True).all()
+    return {
+        product.id: (product.category_id,
+                     current_app.json.dumps(product.to_dict(include_category=True)).encode('utf-8'))
+        for product in products
+    }
+
+def _load_product_payload(product_id):
+    return _load_product_payloads([product_id]).get(product_id)
+
+def _cached_payloads(snapshot, product_ids):
+    """Payloads of ``product_ids`` in order, from the product cache only if they match ``snapshot``
+    
+    Entries are keyed on each product's ``updated_at`` in the snapshot and
+    the category digest, the inputs of the listing ETag, so a validator is
+    never sent with a body cached from older data. Without a current
+    snapshot there is nothing to check them against, so they are loaded.
+    """
+    if snapshot is None:
+        loaded = _load_product_payloads(product_ids)
+        return [loaded[product_id][1] for product_id in product_ids if product_id in loaded]
+    
+    digest = category_cache.snapshot().digest
+    versions = {product_id: f"{updated_at}:{digest}"
+                for product_id, updated_at in snapshot.versions(product_ids).items()}
+    return product_cache.get_many(product_ids, _load_product_payloads, versions=versions)
+
+def _top_list_payloads(ids, limit, exclude_id=None, leading=()):
+    """Cached payloads of the first ``limit`` products of a top list, or None to query live
+    
+    ``leading`` ids (e.g. related products) come before the list.
+    """
+    if limit < 1 or limit >= top_lists.max_length:
+        return None
+    
+    snapshot = catalog_snapshots.current()
+    candidates = [product_id for product_id in dict.fromkeys([*leading, *ids]) if product_id != exclude_id]
+    payloads = []
+    start = 0
+    # Ids deactivated since the last rebuild load as nothing; read past them
+    while len(payloads) < limit and start < len(candidates):
+        payloads.extend(_cached_payloads(snapshot, candidates[start:start + limit]))
+        start += limit
+    
+    if len(payloads) < limit and len(ids) >= top_lists.max_length:
+        return None
+    return payloads[:limit]
+
+def _product_list_response(key, payloads):
+    """{success, count, <key>: [...]} assembled from cached product JSON"""
+    body = b''.join([
+        b'{"count": ', str(len(payloads)).encode('ascii'),
+        b', "', key.encode('ascii'), b'": [', b', '.join(payloads), b'], "success": true}'
+    ])
+    return Response(body, mimetype='application/json')
+
+def _snapshot_page(snapshot, filters, sort_by, descending, page, per_page):
+    """One offset page of /products filtered and ordered in memory, hydrated from the product cache"""
+    mask = snapshot.mask(**filters)
+    total = int(np.count_nonzero(mask))
+    page_ids = snapshot.top(mask, sort_by, descending, page * per_page)[(page - 1) * per_page:].tolist()
+    payloads = _cached_payloads(snapshot, page_ids)
+    
+    pages = -(-total // per_page)
+    pagination = {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': pages,
+        'has_next': page < pages,
+        'has_prev': page > 1
+    }
+    body = b''.join([
+        b'{"pagination": ', current_app.json.dumps(pagination).encode('utf-8'),
+        b', "products": [', b', '.join(payloads), b'], "success": true}'
+    ])
+    return Response(body, mimetype='application/json')
+
 @products_bp.route('/products', methods=['GET'])
+@conditional_get(_catalog_version, max_age=60)
 def get_products():
     """Get products with filtering, sorting, and pagination"""
     try:
@@ -24,9 +137,32 @@ def get_products():
         # Sorting
         sort_by = request.args.get('sort_by', 'name')  # name, price, rating, created_at
         sort_order = request.args.get('sort_order', 'asc')  # asc, desc
+        descending = sort_order == 'desc'
         
-        # Build query
-        query = Product.query.filter(Product.is_active == True)
+        # Opt-in keyset pagination: ?pagination=cursor, then ?cursor=<next_cursor>
+        cursor = request.args.get('cursor')
+        cursor_mode = cursor is not None or request.args.get('pagination') == 'cursor'
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        
+        # Offset pages are served from the columnar snapshot while it matches the catalog version
+        snapshot = None
+        if not cursor_mode and page >= 1 and per_page >= 1:
+            snapshot = catalog_snapshots.current()
+        if snapshot is not None:
+            filters = {
+                'category_id': category_id,
+                'brand': brand,
+                'min_price': min_price,
+                'max_price': max_price,
+                'in_stock': in_stock,
+                'featured': featured
+            }
+            return _snapshot_page(snapshot, filters, sort_by if sort_by in SORT_COLUMNS else 'name',
+                                  descending, page, per_page)
+        
+        # Build query (categories are loaded in one batched SELECT)
+        query = Product.query.options(selectinload(Product.category))\
+                             .filter(Product.is_active == True)
         
         if category_id:
             query = query.filter(Product.category_id == category_id)
@@ -56,10 +192,45 @@ def get_products():
         else:
             order_column = Product.name
         
-        if sort_order == 'desc':
-            query = query.order_by(desc(order_column))
+        # id breaks ties so every page (and cursor) has a stable position
+        if descending:
+            query = query.order_by(desc(order_column), desc(Product.id))
         else:
-            query = query.order_by(asc(order_column))
+            query = query.order_by(asc(order_column), asc(Product.id))
+        
+        if cursor_mode:
+            per_page = max(per_page, 1)
+            cursor_order = f"{order_column.key}:{'desc' if descending else 'asc'}"
+            
+            # Counting the filtered set is the expensive part, so it is opt-in
+            total = query.order_by(None).count() if include_total else None
+            
+            if cursor:
+                try:
+                    sort_value, last_id = decode_cursor(cursor, cursor_order)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                query = query.filter(seek_after(order_column, Product.id, sort_value, last_id, descending))
+            
+            rows = query.limit(per_page + 1).all()
+            products = rows[:per_page]
+            has_next = len(rows) > per_page
+            next_cursor = None
+            if has_next:
+                last = products[-1]
+                next_cursor = encode_cursor(getattr(last, order_column.key), last.id, cursor_order)
+            
+            return jsonify({
+                'success': True,
+                'products': [product.to_dict(include_category=True) for product in products],
+                'pagination': {
+                    'mode': 'cursor',
+                    'per_page': per_page,
+                    'total': total,
+                    'has_next': has_next,
+                    'next_cursor': next_cursor
+                }
+            })
         
         # Execute query with pagination
         pagination = query.paginate(
@@ -90,26 +261,28 @@ def get_products():
 def get_product(product_id):
     """Get specific product by ID"""
     try:
-        product = Product.query.filter_by(id=product_id, is_active=True).first()
+        payload = product_cache.get_or_load(product_id, _load_product_payload)
         
-        if not product:
+        if payload is None:
             return jsonify({'error': 'Product not found'}), 404
         
-        return jsonify({
-            'success': True,
-            'product': product.to_dict(include_category=True)
-        })
+        return Response(b'{"product": ' + payload + b', "success": true}', mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 @products_bp.route('/products/featured', methods=['GET'])
+@conditional_get(_catalog_version, max_age=300)
 def get_featured_products():
     """Get featured products"""
     try:
         limit = request.args.get('limit', 10, type=int)
         
-        products = Product.query.filter(
+        payloads = _top_list_payloads(top_lists.featured(), limit)
+        if payloads is not None:
+            return _product_list_response('products', payloads)
+        
+        products = Product.query.options(selectinload(Product.category)).filter(
             and_(Product.is_active == True, Product.is_featured == True)
         ).order_by(desc(Product.rating)).limit(limit).all()
         
@@ -130,7 +303,23 @@ def get_recommendations():
         product_id = request.args.get('exclude_product_id', type=int)
         limit = request.args.get('limit', 5, type=int)
         
-        query = Product.query.filter(Product.is_active == True)
+        # Products seen in the same chat and search sessions first, then top rated
+        related_ids = recommendation_store.related(product_id, limit, category_id) if product_id else []
+        payloads = _top_list_payloads(top_lists.top_rated(category_id), limit, exclude_id=product_id,
+                                      leading=related_ids)
+        if payloads is not None:
+            return _product_list_response('recommendations', payloads)
+        
+        query = Product.query.options(selectinload(Product.category))\
+                             .filter(Product.is_active == True)
+        
+        # Related products keep their place at the front here too
+        products = []
+        if related_ids and limit > 0:
+            related = query.filter(Product.id.in_(related_ids)).all()
+            related_by_id = {product.id: product for product in related}
+            products = [related_by_id[pid] for pid in related_ids if pid in related_by_id][:limit]
+            query = query.filter(Product.id.notin_(related_by_id))
         
         if category_id:
             query = query.filter(Product.category_id == category_id)
@@ -139,8 +328,9 @@ def get_recommendations():
             query = query.filter(Product.id != product_id)
         
         # Recommend based on rating and popularity
-        products = query.order_by(desc(Product.rating), desc(Product.review_count))\
-                      .limit(limit).all()
+        if len(products) < limit:
+            products += query.order_by(desc(Product.rating), desc(Product.review_count))\
+                             .limit(limit - len(products)).all()
         
         return jsonify({
             'success': True,
@@ -149,4 +339,15 @@ def get_recommendations():
         })
         
     except Exception as e:
-        return jsonify({'error': f'Server error: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@products_bp.route('/products/metrics', methods=['GET'])
+def get_product_metrics():
+    """Get product cache and top list counters"""
+    return jsonify({
+        'success': True,
+        'product_cache': product_cache.stats(),
+        'top_lists': top_lists.stats(),
+        'recommendations': recommendation_store.stats(),
+        'catalog_snapshot': catalog_snapshots.stats()
+    })
@@ -1,10 +1,33 @@
 
 from flask import Blueprint, request, jsonify
-from models import db, Product, Category, SearchLog
-from sqlalchemy import or_, and_, desc, func
+from models import db, Product, SearchLog
+from sqlalchemy.orm import selectinload
 from config import Config
+from datetime import datetime
+import heapq
+from services.autocomplete import search_suggester
+from services.catalog_snapshot import catalog_snapshots
+from services.log_sink import LogSink
+from services.ranking import BM25Scorer
+from services.search_index import ensure_product_index, filter_documents, tokenize
+from services.search_rollup import aggregate_searches, increment_rollups, popular_queries, prune_rollups_periodically
+from utils.pagination import decode_cursor, encode_cursor
 
 search_bp = Blueprint('search', __name__)
+log_sink = LogSink(db, name='search-log-sink')
+
+def _rollup_search_logs(session, rows):
+    increment_rollups(session, aggregate_searches((row['query'], row['timestamp']) for row in rows))
+    prune_rollups_periodically(session)
+
+log_sink.add_batch_hook(SearchLog, _rollup_search_logs)
+
+def _record_suggestion_queries(rows):
+    # Runs on the log sink's worker thread, so the trie is updated once per batch
+    if search_suggester.is_built:
+        search_suggester.record_queries(row['query'] for row in rows if row['results_count'])
+
+log_sink.add_commit_hook(SearchLog, _record_suggestion_queries)
 
 @search_bp.route('/search', methods=['GET'])
 def search_products():
@@ -32,89 +55,123 @@ def search_products():
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        # Build search query
-        search_query = Product.query.filter(Product.is_active == True)
-        
-        # Text search across multiple fields
-        search_terms = query.split()
-        for term in search_terms:
-            search_query = search_query.filter(
-                or_(
-                    Product.name.ilike(f'%{term}%'),
-                    Product.description.ilike(f'%{term}%'),
-                    Product.brand.ilike(f'%{term}%'),
-                    Product.tags.ilike(f'%{term}%')
-                )
-            )
-        
-        # Apply filters
-        if category_id:
-            search_query = search_query.filter(Product.category_id == category_id)
-        
-        if brand:
-            search_query = search_query.filter(Product.brand.ilike(f'%{brand}%'))
-        
-        if min_price is not None:
-            search_query = search_query.filter(Product.price >= min_price)
-        
-        if max_price is not None:
-            search_query = search_query.filter(Product.price <= max_price)
-        
-        if min_rating is not None:
-            search_query = search_query.filter(Product.rating >= min_rating)
-        
-        if in_stock:
-            search_query = search_query.filter(Product.stock_quantity > 0)
-        
-        # Apply sorting
-        if sort_by == 'price':
-            order_column = Product.price
-        elif sort_by == 'rating':
-            order_column = Product.rating
-        elif sort_by == 'name':
-            order_column = Product.name
-        else:  # relevance
-            order_column = Product.rating  # Simple relevance based on rating
-        
-        if sort_order == 'asc':
-            search_query = search_query.order_by(order_column.asc())
+        # Candidate retrieval from the in-memory index
+        index = ensure_product_index()
+        terms = tokenize(query)
+        candidate_ids = index.match(terms)
+        
+        # Apply filters, as array masks when the columnar snapshot is current
+        filters = {
+            'category_id': category_id,
+            'brand': brand,
+            'min_price': min_price,
+            'max_price': max_price,
+            'min_rating': min_rating,
+            'in_stock': in_stock
+        }
+        snapshot = catalog_snapshots.current()
+        if snapshot is not None:
+            matched_ids = snapshot.filter_ids(candidate_ids, **filters)
         else:
-            search_query = search_query.order_by(order_column.desc())
+            matched_ids = filter_documents(index, candidate_ids, **filters)
+        
+        # Opt-in keyset pagination: ?pagination=cursor, then ?cursor=<next_cursor>
+        cursor = request.args.get('cursor')
+        cursor_mode = cursor is not None or request.args.get('pagination') == 'cursor'
+        after = None
+        if sort_by in ('price', 'rating', 'name'):
+            cursor_order = f"{sort_by}:{'asc' if sort_order == 'asc' else 'desc'}"
+        else:
+            cursor_order = 'relevance'
+        if cursor:
+            try:
+                after = decode_cursor(cursor, cursor_order, str if sort_by == 'name' else (int, float))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        total = len(matched_ids)
+        if cursor_mode:
+            per_page = max(per_page, 1)
+            offset = 0
+            limit = per_page + 1  # one extra row tells us whether there is a next page
+        else:
+            pages = (total + per_page - 1) // per_page if per_page > 0 else 0
+            page = max(page, 1)
+            offset = (page - 1) * per_page
+            limit = offset + per_page
+        
+        # Apply sorting; only the first `limit` ids are ever ordered
+        scores = {}
+        if sort_by in ('price', 'rating', 'name'):
+            descending = sort_order != 'asc'
+            sort_key = lambda doc_id: (index.docs[doc_id][sort_by], doc_id)
+            if after is not None:
+                if descending:
+                    matched_ids = [doc_id for doc_id in matched_ids if sort_key(doc_id) < after]
+                else:
+                    matched_ids = [doc_id for doc_id in matched_ids if sort_key(doc_id) > after]
+            select = heapq.nlargest if descending else heapq.nsmallest
+            ordered_ids = select(limit, matched_ids, key=sort_key)
+        else:  # relevance
+            ranked = BM25Scorer(index).top_k(terms, matched_ids, limit, after=after)
+            ordered_ids = [doc_id for doc_id, _ in ranked]
+            scores = dict(ranked)
         
-        # Execute search with pagination
-        pagination = search_query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        page_ids = ordered_ids[offset:offset + per_page]
         
-        products = pagination.items
+        # Hydrate only the requested page from the database
+        products_by_id = {}
+        if page_ids:
+            page_products = Product.query.options(selectinload(Product.category))\
+                                         .filter(Product.id.in_(page_ids), Product.is_active == True).all()
+            products_by_id = {product.id: product for product in page_products}
+        products = [products_by_id[pid] for pid in page_ids if pid in products_by_id]
         
         # Log search
-        try:
-            search_log = SearchLog(
-                query=query,
-                results_count=pagination.total,
-                session_id=request.args.get('session_id'),
-                ip_address=request.remote_addr
-            )
-            db.session.add(search_log)
-            db.session.commit()
-        except:
-            pass  # Don't fail if logging fails
-        
-        return jsonify({
-            'success': True,
+        log_sink.submit(SearchLog, {
             'query': query,
-            'results': [product.to_dict(include_category=True) for product in products],
-            'pagination': {
+            'results_count': total,
+            'session_id': request.args.get('session_id'),
+            'ip_address': request.remote_addr,
+            'timestamp': datetime.utcnow()
+        })
+        
+        if cursor_mode:
+            has_next = len(ordered_ids) > per_page
+            next_cursor = None
+            if has_next:
+                last_id = page_ids[-1]
+                sort_value = scores[last_id] if scores else index.docs[last_id][sort_by]
+                next_cursor = encode_cursor(sort_value, last_id, cursor_order)
+            pagination = {
+                'mode': 'cursor',
+                'per_page': per_page,
+                'total': total,
+                'has_next': has_next,
+                'next_cursor': next_cursor
+            }
+        else:
+            pagination = {
                 'page': page,
                 'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
+                'total': total,
+                'pages': pages,
+                'has_next': page < pages,
+                'has_prev': page > 1
             }
+        
+        results = []
+        for product in products:
+            product_data = product.to_dict(include_category=True)
+            if product.id in scores:
+                product_data['score'] = round(scores[product.id], 4)
+            results.append(product_data)
+        
+        return jsonify({
+            'success': True,
+            'query': query,
+            'results': results,
+            'pagination': pagination
         })
         
     except Exception as e:
@@ -133,32 +190,12 @@ def get_search_suggestions():
                 'suggestions': []
             })
         
-        # Get product name suggestions
-        product_suggestions = db.session.query(Product.name)\
-                                      .filter(and_(
-                                          Product.is_active == True,
-                                          Product.name.ilike(f'%{query}%')
-                                      ))\
-                                      .limit(limit//2).all()
-        
-        # Get brand suggestions
-        brand_suggestions = db.session.query(Product.brand)\
-                                    .filter(and_(
-                                        Product.is_active == True,
-                                        Product.brand.ilike(f'%{query}%'),
-                                        Product.brand.isnot(None)
-                                    ))\
-                                    .distinct()\
-                                    .limit(limit//2).all()
-        
-        suggestions = []
-        suggestions.extend([p[0] for p in product_suggestions])
-        suggestions.extend([b[0] for b in brand_suggestions])
+        suggestions = search_suggester.ensure_built().suggest(query, limit)
         
         return jsonify({
             'success': True,
             'query': query,
-            'suggestions': list(set(suggestions))[:limit]
+            'suggestions': suggestions
         })
         
     except Exception as e:
@@ -171,24 +208,15 @@ def get_popular_searches():
         limit = request.args.get('limit', 10, type=int)
         days = request.args.get('days', 7, type=int)
         
-        # Get popular searches from last N days
-        from datetime import datetime, timedelta
-        since_date = datetime.utcnow() - timedelta(days=days)
-        
-        popular_searches = db.session.query(
-            SearchLog.query,
-            func.count(SearchLog.id).label('search_count')
-        ).filter(SearchLog.timestamp >= since_date)\
-         .group_by(SearchLog.query)\
-         .order_by(desc('search_count'))\
-         .limit(limit).all()
+        # Sum pre-aggregated rollup buckets for the last N days
+        popular_searches = popular_queries(days=days, limit=limit)
         
         return jsonify({
             'success': True,
             'popular_searches': [
                 {
-                    'query': search.query,
-                    'count': search.search_count
+                    'query': search.query_text,
+                    'count': int(search.search_count)
                 } for search in popular_searches
             ]
         })
@@ -196,3 +224,11 @@ def get_popular_searches():
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+
+@search_bp.route('/search/metrics', methods=['GET'])
+def get_search_metrics():
+    """Get search log writer counters"""
+    return jsonify({
+        'success': True,
+        'log_sink': log_sink.stats()
+    })
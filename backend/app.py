@@ -1,14 +1,29 @@
 from urllib.parse import quote_plus
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from database import db, Product, Category, ChatSession, init_database
+from sqlalchemy.orm import selectinload
 import os
-import re
+import json
+import asyncio
 from dotenv import load_dotenv
-from openai import OpenAI
 import uuid
+import time
 from datetime import datetime, timedelta
 import logging
+from services import catalog_events
+from services.log_sink import LogSink
+from services.response_cache import ResponseCache
+from services.intent_matcher import intent_matcher
+from services.llm_backend import create_backend
+from services.resilience import CircuitOpenError, wrap_backend
+from services.conversation_memory import ConversationMemory
+from services.event_loop import BackgroundEventLoop
+from services.prompt_snippets import PromptSnippetCache
+from services.product_retriever import ProductRetriever
+from services.catalog_version import CatalogVersion
+from services.product_cache import create_product_cache
+from utils.chat_history import history_cursors, json_array_chunks, page_history, parse_history_args, stream_history
 
 # Load environment variables
 load_dotenv()
@@ -22,7 +37,9 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Validate required environment variables
-required_env_vars = ['MYSQL_USER', 'MYSQL_PASSWORD', 'MYSQL_DATABASE', 'OPENAI_API_KEY']
+required_env_vars = ['MYSQL_USER', 'MYSQL_PASSWORD', 'MYSQL_DATABASE']
+if os.getenv('LLM_BACKEND', 'openai').lower() == 'openai':
+    required_env_vars.append('OPENAI_API_KEY')
 missing_vars = [var for var in required_env_vars if not os.getenv(var)]
 if missing_vars:
     raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
@@ -44,28 +61,16 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
 # Initialize database with app
 db.init_app(app)
 
-# Initialize OpenAI client with better error handling
-client = None
-try:
-    api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not found in environment variables")
-    
-    # Initialize OpenAI client with minimal configuration
-    client = OpenAI(api_key=api_key)
-    
-    # Test the API key with a simple request
-    try:
-        models = client.models.list()
-        logger.info("OpenAI client initialized successfully")
-    except Exception as test_error:
-        logger.warning(f"OpenAI API test failed: {test_error}")
-        # Continue anyway - the client might still work for chat completions
-        
-except Exception as e:
-    logger.error(f"Failed to initialize OpenAI client: {str(e)}")
-    # Set client to None and handle gracefully in the chatbot
-    client = None
+# LLM backend chosen by LLM_BACKEND (openai, fake or none); None means fallback replies only
+llm = wrap_backend(create_backend())
+if llm:
+    logger.info(f"LLM backend initialized: {llm.name}")
+
+ERROR_RESPONSE = {
+    "reply": "I'm having trouble processing your request right now. Could you please try again or contact our support team?",
+    "products": [],
+    "intent": "error"
+}
 
 class EcommerceChatbot:
     def __init__(self):
@@ -95,73 +100,41 @@ class EcommerceChatbot:
         """
     
     def get_products_context(self, search_query=None, category=None, price_range=None):
-        """Get relevant products from database for context"""
+        """Get relevant products for context: ranked in memory, then loaded by id"""
         try:
-            query = Product.query.filter(Product.is_active == True)
-            
-            # Apply search filters
-            if search_query:
-                search_terms = search_query.lower().split()
-                for term in search_terms:
-                    query = query.filter(
-                        db.or_(
-                            Product.name.ilike(f"%{term}%"),
-                            Product.description.ilike(f"%{term}%")
-                        )
-                    )
+            product_ids = product_retriever.retrieve(search_query, category, price_range, k=10)
+            if not product_ids:
+                return []
             
-            if category:
-                query = query.join(Category).filter(Category.name.ilike(f"%{category}%"))
-            
-            if price_range:
-                min_price, max_price = price_range
-                if min_price is not None:
-                    query = query.filter(Product.price >= min_price)
-                if max_price is not None:
-                    query = query.filter(Product.price <= max_price)
-            
-            products = query.limit(10).all()
-            return [product.to_dict() for product in products]
+            # Only products changed since they were cached are loaded and serialized
+            rows = Product.query.with_entities(Product.id, Product.updated_at)\
+                                .filter(Product.id.in_(product_ids), Product.is_active == True)\
+                                .all()
+            updated_at = {row.id: row.updated_at for row in rows}
+            return prompt_snippets.products(
+                [(product_id, updated_at[product_id]) for product_id in product_ids if product_id in updated_at],
+                self.load_product_dicts
+            )
         except Exception as e:
             logger.error(f"Error getting products context: {e}")
             return []
     
+    def load_product_dicts(self, product_ids):
+        products = Product.query.options(selectinload(Product.category))\
+                                .filter(Product.id.in_(product_ids))\
+                                .all()
+        return {product.id: product.to_dict() for product in products}
+    
     def extract_intent_and_filters(self, message):
         """Extract search intent and filters from user message"""
-        message_lower = message.lower()
-        
-        # Extract price range
-        price_pattern = r'\$?(\d+(?:\.\d{2})?)'
-        prices = re.findall(price_pattern, message_lower)
-        price_range = None
-        
-        if len(prices) >= 2:
-            price_range = (float(prices[0]), float(prices[1]))
-        elif len(prices) == 1:
-            if any(word in message_lower for word in ['under', 'below', 'less than']):
-                price_range = (0, float(prices[0]))
-            elif any(word in message_lower for word in ['over', 'above', 'more than']):
-                price_range = (float(prices[0]), 999999)
-        
-        # Extract category intent
-        category_keywords = {
-            'electronics': ['phone', 'smartphone', 'laptop', 'computer', 'headphone', 'tablet', 'electronics'],
-            'clothing': ['clothes', 'jeans', 'shoes', 'shirt', 'hoodie', 'dress', 'clothing', 'fashion'],
-            'books': ['book', 'novel', 'guide', 'manual', 'reading'],
-            'home & garden': ['furniture', 'table', 'chair', 'bulb', 'light', 'home', 'garden'],
-            'sports': ['sports', 'tennis', 'basketball', 'racket', 'ball', 'athletic', 'fitness']
-        }
-        
-        detected_category = None
-        for category, keywords in category_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                detected_category = category
-                break
+        match = intent_matcher.match(message)
         
         return {
             'search_query': message,
-            'category': detected_category,
-            'price_range': price_range
+            'category': match['categories'][0] if match['categories'] else None,
+            'price_range': match['price_range'],
+            'categories': match['categories'],
+            'intents': match['intents']
         }
     
     def get_fallback_response(self, message, relevant_products):
@@ -194,99 +167,305 @@ class EcommerceChatbot:
         # Default response
         return "I'd be happy to help you find what you're looking for! We have products in Electronics, Clothing, Books, Home & Garden, and Sports. What are you interested in?"
     
+    def find_products(self, filters):
+        """Load the products matching extracted filters"""
+        return self.get_products_context(
+            search_query=filters['search_query'],
+            category=filters['category'],
+            price_range=filters['price_range']
+        )
+    
+    def build_messages(self, message, relevant_products, history=()):
+        """Build the OpenAI chat messages for a customer message after its history"""
+        # Prepare context for OpenAI from pre-built product lines
+        if relevant_products:
+            product_lines, _ = prompt_snippets.context(relevant_products)
+            products_context = "Here are some relevant products from our inventory:\n" + product_lines
+        else:
+            products_context = "No specific products found matching the query, but we have Electronics, Clothing, Books, Home & Garden, and Sports categories available."
+        
+        # Create OpenAI prompt
+        user_prompt = f"""
+        Customer message: "{message}"
+        
+        Available products context:
+        {products_context}
+        
+        Please respond as a helpful ecommerce chatbot. If relevant products are available, mention them specifically. If not, suggest alternatives or ask clarifying questions to help the customer find what they need.
+        """
+        
+        return [
+            {"role": "system", "content": self.system_prompt},
+            *history,
+            {"role": "user", "content": user_prompt}
+        ]
+    
     def process_message(self, message, session_id=None):
         """Process user message using OpenAI GPT or fallback"""
         try:
-            # Extract filters and get relevant products
+            # Extract filters and answer repeated questions from the cache
             filters = self.extract_intent_and_filters(message)
-            relevant_products = self.get_products_context(
-                search_query=filters['search_query'],
-                category=filters['category'],
-                price_range=filters['price_range']
-            )
+            history = self.load_history(session_id)
+            cached = self.cached_result(message, filters, history)
+            if cached is not None:
+                return self.remember(session_id, message, cached)
+            
+            started = time.perf_counter()
+            relevant_products = self.find_products(filters)
             
-            # Try OpenAI if available
-            if client:
+            # Try the LLM if available
+            if llm:
                 try:
-                    # Prepare context for OpenAI
-                    products_context = ""
-                    if relevant_products:
-                        products_context = "Here are some relevant products from our inventory:\n"
-                        for product in relevant_products[:5]:  # Limit to top 5 products
-                            products_context += f"- {product['name']}: ${product['price']} - {product['description'][:100]}...\n"
-                    else:
-                        products_context = "No specific products found matching the query, but we have Electronics, Clothing, Books, Home & Garden, and Sports categories available."
-                    
-                    # Create OpenAI prompt
-                    user_prompt = f"""
-                    Customer message: "{message}"
-                    
-                    Available products context:
-                    {products_context}
-                    
-                    Please respond as a helpful ecommerce chatbot. If relevant products are available, mention them specifically. If not, suggest alternatives or ask clarifying questions to help the customer find what they need.
-                    """
-                    
-                    # Call OpenAI API
-                    response = client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
-                            {"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": user_prompt}
-                        ],
+                    reply = llm.complete_hedged(
+                        self.build_messages(message, relevant_products, history),
                         max_tokens=300,
-                        temperature=0.7
+                        temperature=0.7,
+                        on_late_reply=self.late_reply_handler(message, filters, relevant_products,
+                                                              started, cacheable=not history)
                     )
+                    if reply is not None:
+                        result = self.ai_result(message, filters, relevant_products, reply, started,
+                                                cacheable=not history)
+                        return self.remember(session_id, message, result)
                     
-                    bot_response = response.choices[0].message.content.strip()
-                    
-                    return {
-                        "reply": bot_response,
-                        "products": relevant_products,
-                        "intent": "ai_processed",
-                        "filters_applied": filters
-                    }
-                    
-                except Exception as openai_error:
-                    logger.error(f"OpenAI API Error: {openai_error}")
+                except CircuitOpenError:
+                    pass  # Breaker open: answer with the fallback right away
+                except Exception as llm_error:
+                    logger.error(f"LLM backend error: {llm_error}")
                     # Fall through to fallback response
             
-            # Use fallback response
-            fallback_response = self.get_fallback_response(message, relevant_products)
+            return self.remember(session_id, message, self.fallback_result(message, filters, relevant_products))
             
-            return {
-                "reply": fallback_response,
-                "products": relevant_products,
-                "intent": "fallback_processed",
-                "filters_applied": filters
-            }
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            return dict(ERROR_RESPONSE)
+    
+    async def process_message_async(self, message, session_id=None):
+        """Async process_message, run on chat_loop: history and products load together, the LLM call is awaited"""
+        try:
+            filters = self.extract_intent_and_filters(message)
+            
+            # History and retrieval run at the same time; a cache hit (decided by history) drops the products
+            started = time.perf_counter()
+            products_task = asyncio.ensure_future(
+                asyncio.to_thread(self.in_app_context, self.find_products, filters)
+            )
+            try:
+                history = await asyncio.to_thread(self.in_app_context, self.load_history, session_id)
+                cached = self.cached_result(message, filters, history)
+            except Exception:
+                products_task.cancel()
+                raise
+            if cached is not None:
+                products_task.cancel()
+                return self.remember(session_id, message, cached)
+            
+            relevant_products = await products_task
+            
+            if llm:
+                try:
+                    reply = await llm.complete_hedged_async(
+                        self.build_messages(message, relevant_products, history),
+                        max_tokens=300,
+                        temperature=0.7,
+                        on_late_reply=self.late_reply_handler(message, filters, relevant_products,
+                                                              started, cacheable=not history)
+                    )
+                    if reply is not None:
+                        result = self.ai_result(message, filters, relevant_products, reply, started,
+                                                cacheable=not history)
+                        return self.remember(session_id, message, result)
+                    
+                except CircuitOpenError:
+                    pass  # Breaker open: answer with the fallback right away
+                except Exception as llm_error:
+                    logger.error(f"LLM backend error: {llm_error}")
+            
+            return self.remember(session_id, message, self.fallback_result(message, filters, relevant_products))
             
         except Exception as e:
             logger.error(f"Error processing message: {e}")
-            return {
-                "reply": "I'm having trouble processing your request right now. Could you please try again or contact our support team?",
-                "products": [],
-                "intent": "error"
-            }
+            return dict(ERROR_RESPONSE)
+    
+    def in_app_context(self, func, *args):
+        """Run func for a worker thread, with its own app context and session"""
+        with app.app_context():
+            return func(*args)
+    
+    def load_history(self, session_id):
+        """Prompt messages for the session's earlier turns, within the memory's token budget"""
+        return conversation_memory.messages(session_id) if session_id else []
+    
+    def remember(self, session_id, message, result):
+        if session_id:
+            conversation_memory.record(session_id, message, result["reply"])
+        return result
+    
+    def cached_result(self, message, filters, history):
+        # A follow-up's answer depends on the turns before it, so only first messages use the cache
+        if history:
+            return None
+        cached = response_cache.get(message, filters)
+        if cached is not None:
+            cached["filters_applied"] = filters
+        return cached
+    
+    def ai_result(self, message, filters, relevant_products, reply, started, cacheable=True):
+        """Build the response for an LLM reply and cache it"""
+        result = {
+            "reply": reply,
+            "products": relevant_products,
+            "intent": "ai_processed",
+            "filters_applied": filters
+        }
+        if cacheable:
+            response_cache.put(
+                message, filters, result,
+                product_ids=[product['id'] for product in relevant_products],
+                latency_ms=(time.perf_counter() - started) * 1000
+            )
+        return result
+    
+    def late_reply_handler(self, message, filters, relevant_products, started, cacheable):
+        """Cache an LLM reply that arrived after the hedged fallback was already returned"""
+        if not cacheable:
+            return None
+        return lambda reply: self.ai_result(message, filters, relevant_products, reply, started)
+    
+    def fallback_result(self, message, filters, relevant_products):
+        return {
+            "reply": self.get_fallback_response(message, relevant_products),
+            "products": relevant_products,
+            "intent": "fallback_processed",
+            "filters_applied": filters
+        }
+    
+    def stream_message(self, message, session_id=None):
+        """Yield (event, data) pairs: reply 'token' chunks, then one 'done' event
+        
+        The 'done' payload matches process_message's response plus the full reply.
+        """
+        try:
+            filters = self.extract_intent_and_filters(message)
+            history = self.load_history(session_id)
+            cached = self.cached_result(message, filters, history)
+            if cached is not None:
+                self.remember(session_id, message, cached)
+                yield "token", {"token": cached["reply"]}
+                yield "done", cached
+                return
+            
+            started = time.perf_counter()
+            relevant_products = self.find_products(filters)
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            yield "done", dict(ERROR_RESPONSE)
+            return
+        
+        reply_parts = []
+        intent = "fallback_processed"
+        # Only a reply the LLM finished is cached; a cut-off one is sent to this user alone
+        completed = False
+        
+        if llm:
+            try:
+                for token in llm.stream(
+                    self.build_messages(message, relevant_products, history),
+                    max_tokens=300,
+                    temperature=0.7
+                ):
+                    reply_parts.append(token)
+                    yield "token", {"token": token}
+                intent = "ai_processed"
+                completed = True
+            except CircuitOpenError:
+                pass  # Breaker open: answer with the fallback right away
+            except Exception as llm_error:
+                # Tokens already sent can't be taken back; only fall back if none were
+                logger.error(f"LLM backend error: {llm_error}")
+                if reply_parts:
+                    intent = "ai_processed"
+        
+        if not reply_parts:
+            fallback_response = self.get_fallback_response(message, relevant_products)
+            reply_parts.append(fallback_response)
+            yield "token", {"token": fallback_response}
+        
+        result = {
+            "reply": "".join(reply_parts).strip(),
+            "products": relevant_products,
+            "intent": intent,
+            "filters_applied": filters
+        }
+        self.remember(session_id, message, result)
+        if completed and not history:
+            response_cache.put(
+                message, filters, result,
+                product_ids=[product['id'] for product in relevant_products],
+                latency_ms=(time.perf_counter() - started) * 1000
+            )
+        yield "done", dict(result)
+
+# Cache of AI responses, dropped when a cited product changes
+response_cache = ResponseCache()
+
+# Product dict and prompt line per product, rebuilt when the product changes
+prompt_snippets = PromptSnippetCache()
+
+# In-memory lexical + TF-IDF retrieval of chatbot product context; the row count
+# and newest updated_at show writes from other workers (no data_versions table here)
+product_retriever = ProductRetriever(Product, Category,
+                                     version=CatalogVersion(Product, Product.updated_at, data_version=False))
+
+# Serialized /api/products/<id> bodies; product JSON embeds the category name
+product_cache = create_product_cache('app')
+
+def _invalidate_product_caches(op, model, values):
+    response_cache.invalidate_product(values['id'])
+    prompt_snippets.invalidate(values['id'])
+    product_retriever.product_changed(op, values)
+    product_cache.invalidate(values['id'])
+
+catalog_events.subscribe(Product, _invalidate_product_caches)
+
+def _invalidate_category_products(op, model, values):
+    product_cache.invalidate_category(values['id'])
+    prompt_snippets.invalidate_category(values['id'])
+    # Category names are indexed
+    product_retriever.mark_dirty()
+
+catalog_events.subscribe(Category, _invalidate_category_products)
+
+# Recent turns per chat session, summarized to stay under a prompt token budget
+conversation_memory = ConversationMemory(ChatSession, ChatSession.created_at)
 
 # Initialize chatbot
 chatbot = EcommerceChatbot()
 
+# Chat sessions are written in batches off the request path
+chat_log_sink = LogSink(db, name='chat-log-sink')
+
 # Routes
 @app.route('/')
 def home():
     return jsonify({
         "message": "Ecommerce Chatbot Backend is running!",
         "version": "2.0",
-        "ai_powered": client is not None,
+        "ai_powered": llm is not None,
+        "llm_backend": llm.name if llm else None,
         "endpoints": {
             "chat": "/api/chat",
+            "chat_stream": "/api/chat/stream",
             "products": "/api/products",
             "categories": "/api/categories",
             "search": "/api/search"
         }
     })
 
+# Chat coroutines from every request thread share one loop and one LLM client
+chat_loop = BackgroundEventLoop(name='chat-loop')
+
+# The request thread waits on chat_loop; the LLM calls themselves are awaited there
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
@@ -308,7 +487,7 @@ def chat():
         
         # Process message with chatbot
         try:
-            response = chatbot.process_message(user_message, session_id)
+            response = chat_loop.run(chatbot.process_message_async(user_message, session_id))
         except Exception as e:
             app.logger.error(f"Error processing message: {str(e)}")
             return jsonify({
@@ -316,19 +495,14 @@ def chat():
                 "details": str(e) if app.debug else "Internal server error"
             }), 500
         
-        # Save chat session to database
-        try:
-            chat_session = ChatSession(
-                session_id=session_id,
-                user_message=user_message,
-                bot_response=response['reply']
-            )
-            db.session.add(chat_session)
-            db.session.commit()
-        except Exception as e:
-            app.logger.error(f"Failed to save chat session: {str(e)}")
-            db.session.rollback()
-            # Continue with the response even if saving fails
+        # Queue chat session for the background writer; it is written after the response
+        if not chat_log_sink.submit(ChatSession, {
+            'session_id': session_id,
+            'user_message': user_message,
+            'bot_response': response['reply'],
+            'created_at': datetime.utcnow()
+        }):
+            app.logger.warning(f"Chat log queue full, dropped message for session {session_id}")
         
         return jsonify(response)
         
@@ -339,6 +513,50 @@ def chat():
             "details": str(e) if app.debug else "An unexpected error occurred"
         }), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream the chatbot reply as Server-Sent Events"""
+    data = request.json
+    if not data or 'message' not in data:
+        return jsonify({"error": "Message is required"}), 400
+    
+    user_message = data.get('message', '').strip()
+    session_id = data.get('session_id', str(uuid.uuid4()))
+    
+    if not user_message:
+        return jsonify({"error": "Message cannot be empty"}), 400
+    
+    try:
+        uuid.UUID(session_id)
+    except ValueError:
+        return jsonify({"error": "Invalid session ID format"}), 400
+    
+    def generate():
+        # Flush headers and a first event before any database or OpenAI work
+        yield sse_event("start", {"session_id": session_id})
+        
+        for event, payload in chatbot.stream_message(user_message, session_id):
+            if event == "done":
+                payload["session_id"] = session_id
+                # Persist only once the full reply exists
+                chat_log_sink.submit(ChatSession, {
+                    'session_id': session_id,
+                    'user_message': user_message,
+                    'bot_response': payload['reply'],
+                    'created_at': datetime.utcnow()
+                })
+            yield sse_event(event, payload)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/products', methods=['GET'])
 def get_products():
     try:
@@ -346,7 +564,8 @@ def get_products():
         per_page = request.args.get('per_page', 10, type=int)
         category_id = request.args.get('category_id', type=int)
         
-        query = Product.query.filter(Product.is_active == True)
+        query = Product.query.options(selectinload(Product.category))\
+                             .filter(Product.is_active == True)
         
         if category_id:
             query = query.filter(Product.category_id == category_id)
@@ -364,11 +583,21 @@ def get_products():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def load_product_payload(product_id):
+    product = Product.query.options(selectinload(Product.category))\
+                           .filter(Product.id == product_id, Product.is_active == True)\
+                           .first()
+    if product is None:
+        return None
+    return product.category_id, app.json.dumps(product.to_dict()).encode('utf-8')
+
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     try:
-        product = Product.query.get_or_404(product_id)
-        return jsonify(product.to_dict())
+        payload = product_cache.get_or_load(product_id, load_product_payload)
+        if payload is None:
+            return jsonify({"error": "Product not found"}), 404
+        return Response(payload, mimetype='application/json')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -388,7 +617,8 @@ def search_products():
         max_price = request.args.get('max_price', type=float)
         category_id = request.args.get('category_id', type=int)
         
-        query = Product.query.filter(Product.is_active == True)
+        query = Product.query.options(selectinload(Product.category))\
+                             .filter(Product.is_active == True)
         
         if query_param:
             query = query.filter(
@@ -414,14 +644,62 @@ def search_products():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+HISTORY_COLUMNS = (ChatSession.id, ChatSession.session_id, ChatSession.user_message,
+                   ChatSession.bot_response, ChatSession.created_at)
+
+def serialize_chat_row(row):
+    return {
+        'id': row.id,
+        'session_id': row.session_id,
+        'user_message': row.user_message,
+        'bot_response': row.bot_response,
+        'created_at': row.created_at.isoformat() if row.created_at else None
+    }
+
 @app.route('/api/chat/history/<session_id>', methods=['GET'])
 def get_chat_history(session_id):
+    """Whole session streamed as a JSON list, or one page with ?limit= and ?before= / ?after= cursors"""
+    try:
+        limit, before, after = parse_history_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     try:
-        chats = ChatSession.query.filter_by(session_id=session_id).order_by(ChatSession.created_at).all()
-        return jsonify([chat.to_dict() for chat in chats])
+        if limit is None:
+            # Start the query here so database errors still get a 500
+            rows = iter(stream_history(ChatSession, ChatSession.created_at, session_id, HISTORY_COLUMNS))
+            return Response(stream_with_context(json_array_chunks(rows, serialize_chat_row)),
+                            mimetype='application/json')
+        
+        rows, has_more = page_history(ChatSession, ChatSession.created_at, session_id,
+                                      HISTORY_COLUMNS, limit, before, after)
+        before_cursor, after_cursor = history_cursors(rows, 'created_at')
+        return jsonify({
+            "session_id": session_id,
+            "messages": [serialize_chat_row(row) for row in rows],
+            "pagination": {
+                "limit": limit,
+                "direction": "newer" if after else "older",
+                "has_more": has_more,
+                "before_cursor": before_cursor,
+                "after_cursor": after_cursor
+            }
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        "chat_log_sink": chat_log_sink.stats(),
+        "response_cache": response_cache.stats(),
+        "conversation_memory": conversation_memory.stats(),
+        "prompt_snippets": prompt_snippets.stats(),
+        "product_retriever": product_retriever.stats(),
+        "product_cache": product_cache.stats(),
+        "llm": llm.stats() if llm else None
+    })
+
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -431,7 +709,8 @@ def health_check():
         return jsonify({
             "status": "healthy",
             "database": "connected",
-            "openai": "configured" if client else "not configured"
+            "openai": "configured" if llm and llm.name == 'openai' else "not configured",
+            "llm_backend": llm.name if llm else "none"
         })
     except Exception as e:
         return jsonify({
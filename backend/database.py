@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from sqlalchemy import Index
+from sqlalchemy import Index, insert
+from sqlalchemy.orm import selectinload
 from flask_migrate import Migrate
 
 # Initialize SQLAlchemy
@@ -151,40 +152,45 @@ def init_database(app):
             
             # Insert sample products
             products_data = [
-                ("iPhone 15 Pro", "Latest Apple smartphone with advanced camera system", 999.99, 50, 1, "https://example.com/iphone15.jpg"),
-                ("Samsung Galaxy S24", "Android flagship with AI features", 899.99, 30, 1, None),
-                ("MacBook Air M3", "Lightweight laptop with Apple Silicon", 1299.99, 20, 1, None),
-                ("Sony WH-1000XM5", "Noise-canceling wireless headphones", 399.99, 40, 1, None),
+                ("iPhone 15 Pro", "Latest Apple smartphone with advanced camera system", 999.99, 50, "Electronics", "https://example.com/iphone15.jpg"),
+                ("Samsung Galaxy S24", "Android flagship with AI features", 899.99, 30, "Electronics", None),
+                ("MacBook Air M3", "Lightweight laptop with Apple Silicon", 1299.99, 20, "Electronics", None),
+                ("Sony WH-1000XM5", "Noise-canceling wireless headphones", 399.99, 40, "Electronics", None),
                 
-                ("Levi's 501 Jeans", "Classic straight-leg denim jeans", 89.99, 100, 2, None),
-                ("Nike Air Max 90", "Iconic running shoes with air cushioning", 129.99, 75, 2, None),
-                ("Adidas Hoodie", "Comfortable cotton blend hoodie", 59.99, 60, 2, None),
+                ("Levi's 501 Jeans", "Classic straight-leg denim jeans", 89.99, 100, "Clothing", None),
+                ("Nike Air Max 90", "Iconic running shoes with air cushioning", 129.99, 75, "Clothing", None),
+                ("Adidas Hoodie", "Comfortable cotton blend hoodie", 59.99, 60, "Clothing", None),
                 
-                ("The Great Gatsby", "Classic American novel by F. Scott Fitzgerald", 12.99, 200, 3, None),
-                ("Python Programming Guide", "Comprehensive guide to Python development", 49.99, 80, 3, None),
+                ("The Great Gatsby", "Classic American novel by F. Scott Fitzgerald", 12.99, 200, "Books", None),
+                ("Python Programming Guide", "Comprehensive guide to Python development", 49.99, 80, "Books", None),
                 
-                ("IKEA Coffee Table", "Modern minimalist coffee table", 199.99, 25, 4, None),
-                ("Philips LED Bulbs", "Energy-efficient smart LED bulbs pack of 4", 39.99, 150, 4, None),
+                ("IKEA Coffee Table", "Modern minimalist coffee table", 199.99, 25, "Home & Garden", None),
+                ("Philips LED Bulbs", "Energy-efficient smart LED bulbs pack of 4", 39.99, 150, "Home & Garden", None),
                 
-                ("Wilson Tennis Racket", "Professional grade tennis racket", 159.99, 35, 5, None),
-                ("Nike Basketball", "Official size basketball", 29.99, 90, 5, None),
+                ("Wilson Tennis Racket", "Professional grade tennis racket", 159.99, 35, "Sports", None),
+                ("Nike Basketball", "Official size basketball", 29.99, 90, "Sports", None),
             ]
             
-            for name, description, price, stock, category_id, image_url in products_data:
-                try:
-                    product = Product(
-                        name=name,
-                        description=description,
-                        price=price,
-                        stock_quantity=stock,
-                        category_id=category_id,
-                        image_url=image_url,
-                        is_active=True
-                    )
-                    db.session.add(product)
-                except Exception as e:
-                    app.logger.error(f"Error adding product {name}: {str(e)}")
+            # Resolve category ids with one query instead of assuming insertion order
+            category_ids = {name: category_id for category_id, name in db.session.query(Category.id, Category.name)}
+            
+            product_rows = []
+            for name, description, price, stock, category_name, image_url in products_data:
+                if category_name not in category_ids:
+                    app.logger.error(f"Skipping product {name}: unknown category {category_name}")
                     continue
+                product_rows.append({
+                    'name': name,
+                    'description': description,
+                    'price': price,
+                    'stock_quantity': stock,
+                    'category_id': category_ids[category_name],
+                    'image_url': image_url,
+                    'is_active': True
+                })
+            
+            # One executemany INSERT instead of one ORM object per product
+            db.session.execute(insert(Product), product_rows)
             
             # Commit all changes
             try:
@@ -212,7 +218,8 @@ def fetch_all_categories():
 def fetch_products_by_category(category_id):
     """Fetch products by category as dictionaries"""
     try:
-        products = Product.query.filter_by(category_id=category_id, is_active=True).all()
+        products = Product.query.options(selectinload(Product.category))\
+                                .filter_by(category_id=category_id, is_active=True).all()
         return [product.to_dict() for product in products]
     except Exception as e:
         app.logger.error(f"Error fetching products for category {category_id}: {str(e)}")
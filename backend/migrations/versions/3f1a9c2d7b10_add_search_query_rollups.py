@@ -0,0 +1,32 @@
+"""add search query rollups
+
+Revision ID: 3f1a9c2d7b10
+Revises: 
+Create Date: 2026-10-17 09:12:41.207315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_query_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(length=10), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('query_text', sa.String(length=255), nullable=False),
+    sa.Column('search_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('granularity', 'bucket_start', 'query_text', name='uq_search_rollup_bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('search_query_rollups')
@@ -0,0 +1,53 @@
+"""add composite indexes for listing endpoints
+
+Revision ID: 8b4e2f6a1c93
+Revises: 3f1a9c2d7b10
+Create Date: 2026-10-17 09:31:05.584102
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e2f6a1c93'
+down_revision = '3f1a9c2d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('idx_product_active_name', ['is_active', 'name'], unique=False)
+        batch_op.create_index('idx_product_active_price', ['is_active', 'price'], unique=False)
+        batch_op.create_index('idx_product_active_rating', ['is_active', 'rating'], unique=False)
+        batch_op.create_index('idx_product_active_created', ['is_active', 'created_at'], unique=False)
+        batch_op.create_index('idx_product_active_featured_rating', ['is_active', 'is_featured', 'rating'], unique=False)
+        batch_op.create_index('idx_product_active_rating_reviews', ['is_active', 'rating', 'review_count'], unique=False)
+        batch_op.create_index('idx_product_category_active_name', ['category_id', 'is_active', 'name'], unique=False)
+        batch_op.create_index('idx_product_category_active_rating_reviews', ['category_id', 'is_active', 'rating', 'review_count'], unique=False)
+        batch_op.create_index('idx_product_brand', ['brand'], unique=False)
+
+    with op.batch_alter_table('search_logs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_logs_timestamp'), ['timestamp'], unique=False)
+
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.create_index('idx_chat_session_timestamp', ['session_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.drop_index('idx_chat_session_timestamp')
+
+    with op.batch_alter_table('search_logs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_logs_timestamp'))
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('idx_product_brand')
+        batch_op.drop_index('idx_product_category_active_rating_reviews')
+        batch_op.drop_index('idx_product_category_active_name')
+        batch_op.drop_index('idx_product_active_rating_reviews')
+        batch_op.drop_index('idx_product_active_featured_rating')
+        batch_op.drop_index('idx_product_active_created')
+        batch_op.drop_index('idx_product_active_rating')
+        batch_op.drop_index('idx_product_active_price')
+        batch_op.drop_index('idx_product_active_name')
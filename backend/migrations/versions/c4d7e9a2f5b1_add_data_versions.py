@@ -0,0 +1,38 @@
+"""add data versions and products.updated_at index
+
+Revision ID: c4d7e9a2f5b1
+Revises: 8b4e2f6a1c93
+Create Date: 2026-10-17 14:02:47.318265
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7e9a2f5b1'
+down_revision = '8b4e2f6a1c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    data_versions = op.create_table('data_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(data_versions, [{'name': 'products', 'version': 0, 'updated_at': datetime.utcnow()}])
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('idx_product_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('idx_product_updated_at')
+
+    op.drop_table('data_versions')
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 from datetime import datetime, timezone
 import json
 
 db = SQLAlchemy()
+migrate = Migrate()
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -60,6 +62,22 @@ class Product(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Composite indexes matching the listing endpoints' filter + ORDER BY shapes
+    # (InnoDB appends the primary key, which covers the id tie-breaker)
+    __table_args__ = (
+        db.Index('idx_product_active_name', 'is_active', 'name'),
+        db.Index('idx_product_active_price', 'is_active', 'price'),
+        db.Index('idx_product_active_rating', 'is_active', 'rating'),
+        db.Index('idx_product_active_created', 'is_active', 'created_at'),
+        db.Index('idx_product_active_featured_rating', 'is_active', 'is_featured', 'rating'),
+        db.Index('idx_product_active_rating_reviews', 'is_active', 'rating', 'review_count'),
+        db.Index('idx_product_category_active_name', 'category_id', 'is_active', 'name'),
+        db.Index('idx_product_category_active_rating_reviews', 'category_id', 'is_active', 'rating', 'review_count'),
+        db.Index('idx_product_brand', 'brand'),
+        # MAX(updated_at) for catalog ETags and the snapshot's incremental reads
+        db.Index('idx_product_updated_at', 'updated_at'),
+    )
+    
     def to_dict(self, include_category=False):
         data = {
             'id': self.id,
@@ -99,6 +117,10 @@ class ChatSession(db.Model):
     context_data = db.Column(db.Text)  # JSON string for additional context
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_chat_session_timestamp', 'session_id', 'timestamp'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -118,4 +140,25 @@ class SearchLog(db.Model):
     results_count = db.Column(db.Integer, default=0)
     session_id = db.Column(db.String(36))
     ip_address = db.Column(db.String(45))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class SearchQueryRollup(db.Model):
+    __tablename__ = 'search_query_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    query_text = db.Column(db.String(255), nullable=False)  # normalized search query
+    search_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket_start', 'query_text', name='uq_search_rollup_bucket'),
+    )
+
+class DataVersion(db.Model):
+    """Counter bumped after every committed transaction that writes a tracked table"""
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)  # table name
+    version = db.Column(db.BigInteger, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -1,21 +1,25 @@
-import openai
 import json
 from config import Config
+from services.intent_matcher import IntentMatcher
+from services.llm_backend import create_backend
+from services.resilience import wrap_backend
 
 class AIService:
     def __init__(self):
-        if Config.OPENAI_API_KEY:
-            openai.api_key = Config.OPENAI_API_KEY
+        # Deadline, circuit breaker and hedged fallback around the LLM
+        self.llm = wrap_backend(create_backend(api_key=Config.OPENAI_API_KEY, model=Config.AI_MODEL))
+        self.matcher = IntentMatcher()
     
-    def generate_response(self, user_message, context=None):
-        """Generate AI response for user message"""
+    def generate_response(self, user_message, context=None, history=()):
+        """Generate AI response for user message, after the conversation's history messages"""
         try:
-            if not Config.OPENAI_API_KEY:
+            if not self.llm:
                 return self._fallback_response(user_message, context)
             
             system_prompt = self._get_system_prompt()
             messages = [
                 {"role": "system", "content": system_prompt},
+                *history,
                 {"role": "user", "content": user_message}
             ]
             
@@ -23,14 +27,11 @@ class AIService:
                 context_msg = f"Context: {json.dumps(context)}"
                 messages.insert(-1, {"role": "assistant", "content": context_msg})
             
-            response = openai.ChatCompletion.create(
-                model=Config.AI_MODEL,
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content.strip()
+            reply = self.llm.complete_hedged(messages, max_tokens=500, temperature=0.7)
+            if reply is None:
+                # No answer within the latency SLO
+                return self._fallback_response(user_message, context)
+            return reply
             
         except Exception as e:
             print(f"AI Service Error: {e}")
@@ -59,17 +60,10 @@ class AIService:
         else:
             return "Thank you for your message! How can I help you with your shopping today?"
     
-    def extract_intent(self, user_message):
+    def analyze_message(self, user_message):
+        """Categories, intents, brands and price range from one matcher pass"""
+        return self.matcher.match(user_message)
+    
+    def extract_intent(self, user_message, analysis=None):
         """Extract intent from user message"""
-        message_lower = user_message.lower()
-        
-        if any(word in message_lower for word in ['search', 'find', 'looking for', 'show me']):
-            return 'search'
-        elif any(word in message_lower for word in ['recommend', 'suggest', 'best', 'popular']):
-            return 'recommendation'
-        elif any(word in message_lower for word in ['price', 'cost', 'cheap', 'expensive', 'budget']):
-            return 'price_inquiry'
-        elif any(word in message_lower for word in ['available', 'stock', 'in stock']):
-            return 'availability'
-        else:
-            return 'general'
\ No newline at end of file
+        return self.matcher.primary_intent(analysis or self.analyze_message(user_message))
@@ -0,0 +1,242 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import heapq
+import logging
+import math
+import re
+import threading
+
+from sqlalchemy import func, desc
+from models import db, Product, SearchLog
+from services import catalog_events
+
+logger = logging.getLogger(__name__)
+
+WORD_START_PATTERN = re.compile(r'(?:^|\s)(?=\S)')
+
+# Completions precomputed at every trie node
+COMPLETIONS_PER_NODE = 20
+
+# Popular queries are loaded from the last N days of search logs
+QUERY_LOOKBACK_DAYS = 30
+MAX_SEED_QUERIES = 1000
+
+# A query needs this many searches before it is suggested to others
+MIN_QUERY_COUNT = 2
+
+# Distinct queries counted at once; the least recently searched are forgotten
+MAX_TRACKED_QUERIES = 50000
+QUERY_WEIGHT = 1.0
+BRAND_WEIGHT = 1.0
+
+
+def normalize(text):
+    return ' '.join(text.lower().split()) if text else ''
+
+
+class _Node:
+    __slots__ = ('children', 'phrases', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.phrases = set()  # phrases whose key ends at this node
+        self.top = []  # [(weight, phrase)] best completions below this node
+
+
+class AutocompleteTrie:
+    """Prefix trie with top-N completions precomputed at every node
+
+    Each phrase is reachable from the start of every word in it, so "air"
+    completes to "MacBook Air M3".
+    """
+
+    def __init__(self, completions_per_node=COMPLETIONS_PER_NODE):
+        self.completions_per_node = completions_per_node
+        self.is_built = False
+        self.lock = threading.RLock()
+        self._root = _Node()
+        self._weights = {}  # phrase -> accumulated weight
+        self._display = {}  # phrase -> text shown to the user
+
+    def clear(self):
+        with self.lock:
+            self._root = _Node()
+            self._weights = {}
+            self._display = {}
+            self.is_built = False
+
+    def add_weight(self, text, delta):
+        """Adjust a phrase's weight, inserting or removing it as needed"""
+        phrase = normalize(text)
+        if not phrase or not delta:
+            return
+
+        with self.lock:
+            weight = self._weights.get(phrase, 0.0) + delta
+            if weight <= 1e-9:
+                self._weights.pop(phrase, None)
+                self._display.pop(phrase, None)
+            else:
+                self._weights[phrase] = weight
+                self._display.setdefault(phrase, text.strip())
+
+            for start in WORD_START_PATTERN.finditer(phrase):
+                self._update_path(phrase[start.end():], phrase)
+
+    def complete(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        with self.lock:
+            node = self._root
+            for char in prefix:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            return [self._display[phrase] for _, phrase in node.top[:limit]]
+
+    def _update_path(self, key, phrase):
+        path = [self._root]
+        for char in key:
+            path.append(path[-1].children.setdefault(char, _Node()))
+
+        if phrase in self._weights:
+            path[-1].phrases.add(phrase)
+        else:
+            path[-1].phrases.discard(phrase)
+
+        # Recompute completions bottom-up; children already hold their best N
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            candidates = {phrase: self._weights[phrase] for phrase in node.phrases}
+            for child in node.children.values():
+                for weight, child_phrase in child.top:
+                    candidates[child_phrase] = weight
+            node.top = [
+                (weight, candidate) for candidate, weight in heapq.nsmallest(
+                    self.completions_per_node, candidates.items(),
+                    key=lambda item: (-item[1], item[0])
+                )
+            ]
+
+            if depth and not node.top and not node.children:
+                del path[depth - 1].children[key[depth - 1]]
+
+
+def _product_weight(review_count):
+    return 1.0 + math.log1p(review_count or 0)
+
+
+class SearchSuggester:
+    """Keeps an AutocompleteTrie in sync with products, brands and search logs"""
+
+    def __init__(self):
+        self.trie = AutocompleteTrie()
+        self._product_entries = {}  # product_id -> [(text, weight)]
+        self._query_counts = OrderedDict()  # phrase -> count, least recently searched first
+        self._build_lock = threading.Lock()
+
+    @property
+    def is_built(self):
+        return self.trie.is_built
+
+    def ensure_built(self):
+        if self.trie.is_built:
+            return self
+
+        with self._build_lock:
+            if self.trie.is_built:
+                return self
+
+            self.trie.clear()
+            self._product_entries = {}
+            self._query_counts = OrderedDict()
+
+            rows = db.session.query(Product.id, Product.name, Product.brand, Product.review_count)\
+                             .filter(Product.is_active == True)\
+                             .yield_per(1000)
+            for row in rows:
+                self.set_product(row.id, row.name, row.brand, row.review_count)
+
+            since_date = datetime.utcnow() - timedelta(days=QUERY_LOOKBACK_DAYS)
+            popular_queries = db.session.query(
+                SearchLog.query,
+                func.count(SearchLog.id).label('search_count')
+            ).filter(SearchLog.timestamp >= since_date, SearchLog.results_count > 0)\
+             .group_by(SearchLog.query)\
+             .order_by(desc('search_count'))\
+             .limit(MAX_SEED_QUERIES).all()
+            for search in popular_queries:
+                self.record_query(search.query, count=search.search_count)
+
+            self.trie.is_built = True
+            logger.info(f"Built search suggestions for {len(self._product_entries)} products")
+
+        return self
+
+    def set_product(self, product_id, name=None, brand=None, review_count=0):
+        """Replace a product's contribution to the trie (name=None removes it)"""
+        with self.trie.lock:
+            for text, weight in self._product_entries.pop(product_id, ()):
+                self.trie.add_weight(text, -weight)
+
+            if name is None:
+                return
+
+            entries = [(name, _product_weight(review_count))]
+            if brand:
+                entries.append((brand, BRAND_WEIGHT))
+            for text, weight in entries:
+                self.trie.add_weight(text, weight)
+            self._product_entries[product_id] = entries
+
+    def record_query(self, query, count=1):
+        """Count a search; queries are suggested once they reach MIN_QUERY_COUNT"""
+        self._add_counts({normalize(query): (query, count)})
+
+    def record_queries(self, queries):
+        """Count a batch of searches, updating each distinct query's trie path once"""
+        batch = {}
+        for query in queries:
+            phrase = normalize(query)
+            text, count = batch.get(phrase, (query, 0))
+            batch[phrase] = (text, count + 1)
+        self._add_counts(batch)
+
+    def _add_counts(self, batch):
+        batch.pop('', None)
+        if not batch:
+            return
+
+        with self.trie.lock:
+            for phrase, (text, count) in batch.items():
+                previous = self._query_counts.pop(phrase, 0)
+                total = previous + count
+                self._query_counts[phrase] = total
+
+                if total >= MIN_QUERY_COUNT:
+                    delta = total if previous < MIN_QUERY_COUNT else count
+                    self.trie.add_weight(text, delta * QUERY_WEIGHT)
+
+            while len(self._query_counts) > MAX_TRACKED_QUERIES:
+                phrase, total = self._query_counts.popitem(last=False)
+                if total >= MIN_QUERY_COUNT:
+                    self.trie.add_weight(phrase, -total * QUERY_WEIGHT)
+
+    def suggest(self, prefix, limit=10):
+        return self.trie.complete(prefix, limit)
+
+
+search_suggester = SearchSuggester()
+
+
+def _on_product_change(op, model, values):
+    if not search_suggester.is_built:
+        return
+
+    if op == 'delete' or not values.get('is_active'):
+        search_suggester.set_product(values['id'])
+    else:
+        search_suggester.set_product(values['id'], values.get('name'), values.get('brand'),
+                                     values.get('review_count'))
+
+
+catalog_events.subscribe(Product, _on_product_change)
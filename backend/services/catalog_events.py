@@ -0,0 +1,65 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+import logging
+
+logger = logging.getLogger(__name__)
+
+# model class -> list of callbacks(op, model, values)
+_subscribers = {}
+_session_hooks_installed = False
+
+PENDING_KEY = 'catalog_changes'
+
+
+def subscribe(model, callback):
+    """Call ``callback(op, model, values)`` after a commit that wrote ``model`` rows.
+
+    ``op`` is one of 'insert', 'update' or 'delete' and ``values`` is a plain
+    dict of the row's column values captured at flush time, so subscribers
+    never touch expired instances after the commit.
+    """
+    _install_session_hooks()
+
+    if model not in _subscribers:
+        _subscribers[model] = []
+        for op in ('insert', 'update', 'delete'):
+            event.listen(model, f'after_{op}', _make_mapper_listener(op))
+
+    _subscribers[model].append(callback)
+
+
+def _make_mapper_listener(op):
+    def listener(mapper, connection, target):
+        values = {attr.key: getattr(target, attr.key) for attr in mapper.column_attrs}
+        session = inspect(target).session
+        if session is None:
+            return
+        session.info.setdefault(PENDING_KEY, []).append((op, mapper.class_, values))
+    return listener
+
+
+def _install_session_hooks():
+    global _session_hooks_installed
+    if _session_hooks_installed:
+        return
+
+    event.listen(Session, 'after_commit', _dispatch_pending)
+    event.listen(Session, 'after_rollback', _discard_pending)
+    _session_hooks_installed = True
+
+
+def _dispatch_pending(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if not changes:
+        return
+
+    for op, model, values in changes:
+        for callback in _subscribers.get(model, ()):
+            try:
+                callback(op, model, values)
+            except Exception as e:
+                logger.error(f"Catalog change subscriber failed: {e}")
+
+
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,318 @@
+import copy
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+from models import Product
+from services.catalog_version import product_version
+
+logger = logging.getLogger(__name__)
+
+# Catch up on hard deletes made by other processes at least this often
+FULL_REBUILD_INTERVAL = 3600
+
+# Incremental reads start this far behind the newest updated_at seen, for
+# transactions that stamped their rows before an earlier one committed
+WATERMARK_LOOKBACK = timedelta(minutes=5)
+
+LOAD_BATCH_SIZE = 5000
+
+EPOCH = datetime(1970, 1, 1)
+# Sorts first ascending, like a NULL in MySQL, and can still be negated
+MISSING_TIME = np.iinfo(np.int64).min + 1
+
+NUMERIC_COLUMNS = ('price', 'discount_price', 'rating', 'review_count', 'stock',
+                   'category_ids', 'is_active', 'is_featured', 'created_at', 'updated_at')
+
+# Sort keys of the listing endpoint that the snapshot can order by
+SORT_COLUMNS = {'price': 'price', 'rating': 'rating', 'created_at': 'created_at', 'name': 'name_rank'}
+
+
+def _micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1) if value else MISSING_TIME
+
+
+class CatalogSnapshot:
+    """Every product as NumPy columns, sorted by id
+
+    Prices, rating, review count and stock are numeric arrays; brands are
+    dictionary-encoded (``brand_codes`` index ``brands``); ``is_active``
+    and ``is_featured`` are boolean masks. Inactive rows are kept so
+    updates apply in place; filters always exclude them. Names are only
+    kept as a rank, in (name, id) order, for the name sort.
+
+    Snapshots are never modified: ``merged`` returns a new one, so a
+    request keeps a consistent view while a refresh runs.
+    """
+
+    def __init__(self, ids, columns, names, brands, token, watermark):
+        self.ids = ids
+        self.columns = columns
+        self.names = names
+        self.brands = brands
+        self.brand_lookup = {brand: code for code, brand in enumerate(brands)}
+        self.token = token
+        self.watermark = watermark
+        self.built_at = time.monotonic()
+
+        order = sorted(range(len(ids)), key=lambda row: (names[row], ids[row]))
+        name_rank = np.empty(len(ids), dtype=np.int32)
+        name_rank[order] = np.arange(len(ids), dtype=np.int32)
+        self.columns['name_rank'] = name_rank
+
+    @staticmethod
+    def _encode(rows, brands, brand_lookup):
+        """(ids, columns, names, watermark) for loaded rows, extending the brand dictionary in place"""
+        ids, names = [], []
+        values = {name: [] for name in NUMERIC_COLUMNS + ('brand_codes',)}
+        watermark = None
+
+        for row in rows:
+            ids.append(row.id)
+            names.append((row.name or '').casefold())
+            values['price'].append(float(row.price) if row.price is not None else np.nan)
+            values['discount_price'].append(float(row.discount_price) if row.discount_price is not None else np.nan)
+            # NULL ratings sort first ascending, as in MySQL
+            values['rating'].append(row.rating if row.rating is not None else -np.inf)
+            values['review_count'].append(row.review_count or 0)
+            values['stock'].append(row.stock_quantity or 0)
+            values['category_ids'].append(row.category_id or 0)
+            values['is_active'].append(bool(row.is_active))
+            values['is_featured'].append(bool(row.is_featured))
+            values['created_at'].append(_micros(row.created_at))
+            values['updated_at'].append(_micros(row.updated_at))
+
+            brand = (row.brand or '').lower()
+            code = brand_lookup.get(brand)
+            if code is None:
+                code = brand_lookup[brand] = len(brands)
+                brands.append(brand)
+            values['brand_codes'].append(code)
+
+            if row.updated_at and (watermark is None or row.updated_at > watermark):
+                watermark = row.updated_at
+
+        columns = {
+            'price': np.array(values['price'], dtype=np.float64),
+            'discount_price': np.array(values['discount_price'], dtype=np.float64),
+            'rating': np.array(values['rating'], dtype=np.float64),
+            'review_count': np.array(values['review_count'], dtype=np.int32),
+            'stock': np.array(values['stock'], dtype=np.int32),
+            'category_ids': np.array(values['category_ids'], dtype=np.int32),
+            'brand_codes': np.array(values['brand_codes'], dtype=np.int32),
+            'is_active': np.array(values['is_active'], dtype=bool),
+            'is_featured': np.array(values['is_featured'], dtype=bool),
+            'created_at': np.array(values['created_at'], dtype=np.int64),
+            'updated_at': np.array(values['updated_at'], dtype=np.int64)
+        }
+        return np.array(ids, dtype=np.int64), columns, names, watermark
+
+    @classmethod
+    def from_rows(cls, rows, token):
+        brands = []
+        ids, columns, names, watermark = cls._encode(rows, brands, {})
+        order = np.argsort(ids, kind='stable')
+        return cls(ids[order], {name: array[order] for name, array in columns.items()},
+                   [names[row] for row in order], brands, token, watermark)
+
+    def merged(self, rows, token):
+        """A new snapshot with ``rows`` (changed since ``watermark``) applied"""
+        brands = list(self.brands)
+        changed_ids, changed, changed_names, watermark = self._encode(rows, brands, dict(self.brand_lookup))
+        if not len(changed_ids):
+            snapshot = copy.copy(self)
+            snapshot.token = token
+            snapshot.built_at = time.monotonic()
+            return snapshot
+
+        positions = np.searchsorted(self.ids, changed_ids)
+        positions = np.minimum(positions, max(len(self.ids) - 1, 0))
+        existing = (self.ids[positions] == changed_ids) if len(self.ids) else np.zeros(len(changed_ids), bool)
+
+        columns = {name: self.columns[name].copy() for name in changed}
+        names = list(self.names)
+        for name, array in changed.items():
+            columns[name][positions[existing]] = array[existing]
+        for row, position in zip(np.flatnonzero(existing).tolist(), positions[existing].tolist()):
+            names[position] = changed_names[row]
+
+        added = ~existing
+        ids = np.concatenate([self.ids, changed_ids[added]])
+        columns = {name: np.concatenate([array, changed[name][added]]) for name, array in columns.items()}
+        names.extend(changed_names[row] for row in np.flatnonzero(added).tolist())
+
+        order = np.argsort(ids, kind='stable')
+        return CatalogSnapshot(ids[order], {name: array[order] for name, array in columns.items()},
+                               [names[row] for row in order], brands, token,
+                               max(filter(None, (self.watermark, watermark))))
+
+    def mask(self, category_id=None, brand=None, min_price=None, max_price=None,
+             min_rating=None, in_stock=False, featured=False, rows=None):
+        """Boolean mask over ``rows`` (default: every row) of active products passing the filters"""
+        columns = self.columns
+
+        def column(name):
+            return columns[name] if rows is None else columns[name][rows]
+
+        mask = column('is_active').copy()
+        if category_id:
+            mask &= column('category_ids') == category_id
+        if brand:
+            brand = brand.lower()
+            codes = [code for code, name in enumerate(self.brands) if brand in name]
+            mask &= np.isin(column('brand_codes'), codes)
+        if min_price is not None:
+            mask &= column('price') >= min_price
+        if max_price is not None:
+            mask &= column('price') <= max_price
+        if min_rating is not None:
+            mask &= column('rating') >= min_rating
+        if in_stock:
+            mask &= column('stock') > 0
+        if featured:
+            mask &= column('is_featured')
+        return mask
+
+    def top(self, mask, sort_by, descending, k):
+        """Ids of the first ``k`` masked rows ordered by ``sort_by`` then id, like the SQL listing"""
+        rows = np.flatnonzero(mask)
+        values = self.columns[SORT_COLUMNS[sort_by]][rows]
+        ids = self.ids[rows]
+        if descending:
+            values, ids = -values, -ids
+
+        if k < len(rows):
+            # Everything up to the k-th value, ties included, then an exact sort of that part
+            kth = np.partition(values, k - 1)[k - 1]
+            candidates = np.flatnonzero(values <= kth)
+            values, ids, rows = values[candidates], ids[candidates], rows[candidates]
+
+        order = np.lexsort((ids, values))[:k]
+        return self.ids[rows[order]]
+
+    def filter_ids(self, doc_ids, **filters):
+        """The ids from ``doc_ids`` that are active and pass ``filters``, in their original order"""
+        doc_ids = np.fromiter(doc_ids, dtype=np.int64)
+        if not len(doc_ids) or not len(self.ids):
+            return []
+        positions = np.minimum(np.searchsorted(self.ids, doc_ids), len(self.ids) - 1)
+        found = self.ids[positions] == doc_ids
+        keep = found.copy()
+        keep[found] = self.mask(rows=positions[found], **filters)
+        return doc_ids[keep].tolist()
+
+    def versions(self, product_ids):
+        """{id: updated_at in microseconds} for the ``product_ids`` in the snapshot"""
+        product_ids = np.fromiter(product_ids, dtype=np.int64)
+        if not len(product_ids) or not len(self.ids):
+            return {}
+        positions = np.minimum(np.searchsorted(self.ids, product_ids), len(self.ids) - 1)
+        found = self.ids[positions] == product_ids
+        return dict(zip(product_ids[found].tolist(), self.columns['updated_at'][positions[found]].tolist()))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class CatalogSnapshotCache:
+    """Keeps a CatalogSnapshot in step with the catalog version
+
+    ``current()`` returns the snapshot only while its token matches
+    ``version.current()``, the same token the listing ETags use, so a
+    cached response never outlives the data it was built from. Otherwise
+    it starts a background refresh and returns None, and the caller
+    queries the database as before. A refresh reads only the rows whose
+    ``updated_at`` is within ``WATERMARK_LOOKBACK`` of the snapshot's
+    newest one or later, so a row stamped early but committed late is
+    still picked up. It rebuilds in full when the row count shows a hard
+    delete, or every ``full_rebuild_interval`` seconds.
+    """
+
+    def __init__(self, model, version, full_rebuild_interval=FULL_REBUILD_INTERVAL):
+        self.model = model
+        self.version = version
+        self.full_rebuild_interval = full_rebuild_interval
+        self._snapshot = None
+        self._full_built_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self.full_builds = 0
+        self.incremental_refreshes = 0
+
+    def _load_rows(self, since=None):
+        model = self.model
+        query = model.query.with_entities(
+            model.id, model.name, model.price, model.discount_price, model.rating, model.review_count,
+            model.stock_quantity, model.category_id, model.brand, model.is_active, model.is_featured,
+            model.created_at, model.updated_at
+        )
+        if since is not None:
+            query = query.filter(model.updated_at >= since)
+        return query.yield_per(LOAD_BATCH_SIZE)
+
+    def current(self):
+        snapshot = self._snapshot
+        token, _ = self.version.current()
+        if snapshot is not None and snapshot.token == token:
+            return snapshot
+        self._start_refresh()
+        return None
+
+    def _start_refresh(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            app = current_app._get_current_object()
+            threading.Thread(target=self._refresh, args=(app,), name='catalog-snapshot-refresh',
+                             daemon=True).start()
+        except Exception:
+            self._refresh_lock.release()
+            raise
+
+    def _refresh(self, app):
+        try:
+            with app.app_context():
+                self.refresh()
+        except Exception as e:
+            logger.error(f"Catalog snapshot refresh failed: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def refresh(self):
+        started = time.perf_counter()
+        # Read the version first: rows changed after this only make the token older
+        token, _, count = self.version.read()
+        snapshot = self._snapshot
+
+        if snapshot is not None and snapshot.watermark is not None \
+                and time.monotonic() - self._full_built_at < self.full_rebuild_interval:
+            merged = snapshot.merged(self._load_rows(since=snapshot.watermark - WATERMARK_LOOKBACK), token)
+            if len(merged) == count:
+                self._snapshot = merged
+                self.incremental_refreshes += 1
+                return merged
+
+        snapshot = CatalogSnapshot.from_rows(self._load_rows(), token)
+        self._snapshot = snapshot
+        self._full_built_at = time.monotonic()
+        self.full_builds += 1
+        logger.info(f"Built catalog snapshot: {len(snapshot)} products "
+                    f"in {time.perf_counter() - started:.1f}s")
+        return snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'built': snapshot is not None,
+            'products': len(snapshot) if snapshot is not None else 0,
+            'brands': len(snapshot.brands) if snapshot is not None else 0,
+            'token': snapshot.token if snapshot is not None else None,
+            'full_builds': self.full_builds,
+            'incremental_refreshes': self.incremental_refreshes,
+            'age_seconds': round(time.monotonic() - snapshot.built_at, 1) if snapshot is not None else None
+        }
+
+
+catalog_snapshots = CatalogSnapshotCache(Product, product_version)
@@ -0,0 +1,167 @@
+from datetime import datetime
+import logging
+import threading
+import time
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from models import DataVersion, Product
+from services import catalog_events
+
+logger = logging.getLogger(__name__)
+
+# Writes by other processes are noticed within this many seconds
+CATALOG_VERSION_TTL = 5
+
+# session.info key: data_versions rows to bump once the open transaction commits
+WRITTEN_KEY = 'written_data_versions'
+
+
+def bump_version(connection, name):
+    """Increment ``data_versions[name]`` on ``connection``, inside the caller's transaction"""
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    result = connection.execute(
+        table.update().where(table.c.name == name).values(version=table.c.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(name=name, version=1, updated_at=now))
+
+
+def track_writes(model):
+    """Bump the model's data version after every committed ORM write to it
+
+    The counter moves for writes ``MAX(updated_at)`` misses: a transaction
+    that stamped its rows early and committed late. It is bumped in a short
+    transaction of its own once the write commits, so writers never hold
+    the shared row while their own transaction runs.
+    """
+    name = model.__tablename__
+
+    def listener(mapper, connection, target):
+        session = inspect(target).session
+        if session is not None:
+            session.info.setdefault(WRITTEN_KEY, set()).add(name)
+
+    for op in ('insert', 'update', 'delete'):
+        event.listen(model, f'after_{op}', listener)
+
+
+def _bump_written(session):
+    names = session.info.pop(WRITTEN_KEY, None)
+    if not names:
+        return
+    try:
+        with session.get_bind().begin() as connection:
+            for name in sorted(names):
+                bump_version(connection, name)
+    except Exception as e:
+        # The write is committed; the row count and MAX(updated_at) still move for most writes
+        logger.warning(f"Data version bump for {', '.join(sorted(names))} failed: {e}")
+
+
+def _discard_written(session, *args):
+    session.info.pop(WRITTEN_KEY, None)
+
+
+# Ahead of catalog_events' hook, so subscribers that re-read the version see the bump
+event.listen(Session, 'after_commit', _bump_written, insert=True)
+event.listen(Session, 'after_rollback', _discard_written)
+
+
+class CatalogVersion:
+    """Data version, row count and newest write of a table, the input to catalog ETags
+
+    The version counter moves right after every committed ORM write; the row
+    count and ``MAX(updated_at)`` also catch bulk inserts made outside the
+    ORM. ``last_modified`` is the later of the newest row and the counter's
+    own timestamp, so a hard delete moves it too.
+
+    The values are re-read at most every ``ttl`` seconds, or on the next
+    call after ``invalidate()``, by one thread at a time; the others keep
+    getting the previous values meanwhile. They come from the database,
+    so every worker derives the same ETag for the same data.
+
+    With ``data_version=False`` only the row count and ``MAX(updated_at)``
+    are read, for tables in a database without ``data_versions``.
+    """
+
+    def __init__(self, model, time_column, ttl=CATALOG_VERSION_TTL, data_version=True):
+        self.model = model
+        self.time_column = time_column
+        self.name = model.__tablename__
+        self.ttl = ttl
+        self.use_data_version = data_version
+        self.version = 0
+        self._current = None
+        self._current_version = None
+        self._read_at = 0.0
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    @staticmethod
+    def token(data_version, count, last_modified):
+        return f"{data_version}:{count}:{last_modified.isoformat() if last_modified else ''}"
+
+    def read(self):
+        """(token, last_modified, row count) straight from the database"""
+        count, newest_row = self.model.query.with_entities(
+            func.count(self.model.id), func.max(self.time_column)
+        ).one()
+        data_version = DataVersion.query.filter_by(name=self.name).first() if self.use_data_version else None
+
+        last_modified = newest_row
+        if data_version is not None and (last_modified is None or data_version.updated_at > last_modified):
+            last_modified = data_version.updated_at
+        version = data_version.version if data_version is not None else 0
+        return self.token(version, count, last_modified), last_modified, count
+
+    def _fresh(self):
+        current = self._current
+        if (current is not None and self._current_version == self.version
+                and time.monotonic() - self._read_at < self.ttl):
+            return current
+        return None
+
+    def current(self):
+        """(token, last_modified) where last_modified is a naive UTC datetime or None"""
+        current = self._fresh()
+        if current is not None:
+            return current
+
+        # Only the first read waits; later ones serve the old values while one thread re-reads
+        stale = self._current
+        if not self._read_lock.acquire(blocking=stale is None):
+            return stale
+        try:
+            current = self._fresh()
+            if current is not None:
+                return current
+
+            with self._lock:
+                version = self.version
+            token, last_modified, _ = self.read()
+            current = (token, last_modified)
+
+            with self._lock:
+                self._current = current
+                self._current_version = version
+                self._read_at = time.monotonic()
+            return current
+        finally:
+            self._read_lock.release()
+
+
+track_writes(Product)
+product_version = CatalogVersion(Product, Product.updated_at)
+
+
+def _on_product_change(op, model, values):
+    product_version.invalidate()
+
+
+catalog_events.subscribe(Product, _on_product_change)
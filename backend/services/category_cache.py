@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+
+from flask import current_app
+from models import Category, Product
+from services import catalog_events
+
+# Safety net for writes made by other processes, which never bump our version
+CATEGORY_CACHE_TTL = 300  # seconds
+
+
+class CategorySnapshot:
+    """All categories fetched in one query and assembled in memory"""
+
+    def __init__(self, categories):
+        self.by_id = {}
+        self.children = {}  # parent_id -> [category ids ordered by name]
+
+        for category in categories:
+            self.by_id[category.id] = category.to_dict()
+            self.children.setdefault(category.parent_id, []).append(category.id)
+
+        # Content hash of every category, the ETag input for category endpoints
+        self.digest = hashlib.sha1(
+            current_app.json.dumps(list(self.by_id.values())).encode('utf-8')
+        ).hexdigest()
+
+        self.tree = self._build_tree(None)
+        self.tree_json = current_app.json.dumps({
+            'success': True,
+            'category_tree': self.tree
+        }).encode('utf-8')
+
+    def _build_tree(self, parent_id):
+        tree = []
+        for category_id in self.children.get(parent_id, ()):
+            cat_dict = self.by_id[category_id]
+            if not cat_dict['is_active']:
+                continue
+            tree.append(dict(cat_dict, children=self._build_tree(category_id)))
+        return tree
+
+    def list_children(self, parent_id, active_only=True):
+        return [
+            self.by_id[category_id] for category_id in self.children.get(parent_id, ())
+            if not active_only or self.by_id[category_id]['is_active']
+        ]
+
+    def serialize(self, categories, include_children=False, include_products=False):
+        """Serialize like Category.to_dict(include_children, include_products)"""
+        products_by_category = {}
+        if include_products and categories:
+            products = Product.query.filter(
+                Product.category_id.in_([cat['id'] for cat in categories]),
+                Product.is_active == True
+            ).order_by(Product.id).all()
+            for product in products:
+                products_by_category.setdefault(product.category_id, []).append(product.to_dict())
+
+        serialized = []
+        for cat in categories:
+            data = dict(cat)
+            if include_children:
+                data['children'] = self.list_children(cat['id'])
+            if include_products:
+                data['products'] = products_by_category.get(cat['id'], [])
+            serialized.append(data)
+
+        return serialized
+
+
+class CategoryTreeCache:
+    """Caches a CategorySnapshot until a Category row is written"""
+
+    def __init__(self, ttl=CATEGORY_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot = None
+        self._snapshot_version = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if (snapshot is not None and self._snapshot_version == self.version
+                and time.monotonic() - self._built_at < self.ttl):
+            return snapshot
+
+        with self._lock:
+            version = self.version
+        snapshot = CategorySnapshot(Category.query.order_by(Category.name).all())
+
+        with self._lock:
+            # Keep the stamp we started from so a write during the build forces a rebuild
+            self._snapshot = snapshot
+            self._snapshot_version = version
+            self._built_at = time.monotonic()
+
+        return snapshot
+
+
+category_cache = CategoryTreeCache()
+
+
+def _on_category_change(op, model, values):
+    category_cache.invalidate()
+
+
+catalog_events.subscribe(Category, _on_category_change)
@@ -0,0 +1,211 @@
+from collections import OrderedDict, deque
+import re
+import threading
+
+from sqlalchemy import func
+
+MAX_TURNS = 10
+MAX_SESSIONS = 10000
+
+# Prompt tokens allowed for recent turns plus the summary of older ones
+TOKEN_BUDGET = 800
+SUMMARY_TOKEN_BUDGET = 200
+
+# Longest single message kept verbatim, in tokens
+MAX_MESSAGE_TOKENS = 250
+
+# Approximate per-message overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text):
+    """Cheap local token estimate (about four characters per token for English)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def clip_to_tokens(text, max_tokens):
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max_tokens * 4 - 3].rstrip() + '...'
+
+
+def first_sentence(text, max_tokens):
+    return clip_to_tokens(SENTENCE_END.split(text.strip(), 1)[0], max_tokens)
+
+
+class _Turn:
+    __slots__ = ('user_message', 'bot_response', 'tokens')
+
+    def __init__(self, user_message, bot_response):
+        self.user_message = clip_to_tokens(user_message, MAX_MESSAGE_TOKENS)
+        self.bot_response = clip_to_tokens(bot_response, MAX_MESSAGE_TOKENS)
+        self.tokens = estimate_tokens(self.user_message) + estimate_tokens(self.bot_response) \
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+
+
+class _Session:
+    __slots__ = ('turns', 'turn_tokens', 'summary', 'summary_tokens', 'stored', 'unsaved')
+
+    def __init__(self, max_turns, stored=0):
+        self.turns = deque(maxlen=max_turns)
+        self.turn_tokens = 0
+        self.summary = deque()  # one short line per folded turn, oldest first
+        self.summary_tokens = 0
+        self.stored = stored  # the session's rows in the database, as of the last check
+        self.unsaved = deque(maxlen=max_turns)  # (user, bot) recorded here, not yet counted there
+
+
+class ConversationMemory:
+    """Recent chat turns per session, kept under a fixed prompt token budget
+
+    Each session holds at most ``max_turns`` turns in a ring buffer. When
+    the turns and summary together go over ``token_budget``, the oldest
+    turns are folded into a rolling summary (one line per turn, built from
+    the first sentence of each side). The oldest summary lines are dropped
+    to stay under ``summary_token_budget``. The history sent to the model
+    therefore stays about the same size however long the conversation
+    runs.
+
+    A session this process hasn't seen yet is loaded from the last
+    ``max_turns`` ChatSession rows, newest first along the
+    (session_id, time) index. Before cached turns are used, the session's
+    row count is checked against the turns this process knows of: if
+    another worker answered (or cleared) the session meanwhile, it is
+    reloaded. Turns recorded here that the log sink hasn't written yet are
+    kept on top of a reload. Sessions are evicted least recently used
+    first past ``max_sessions``.
+    """
+
+    def __init__(self, model, time_column, max_turns=MAX_TURNS, token_budget=TOKEN_BUDGET,
+                 summary_token_budget=SUMMARY_TOKEN_BUDGET, max_sessions=MAX_SESSIONS):
+        self.model = model
+        self.time_column = time_column
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, session_id):
+        return self.model.query.with_entities(func.count(self.model.id))\
+                               .filter(self.model.session_id == session_id)\
+                               .scalar()
+
+    def _load(self, session_id):
+        rows = self.model.query.with_entities(self.model.user_message, self.model.bot_response)\
+                               .filter(self.model.session_id == session_id)\
+                               .order_by(self.time_column.desc(), self.model.id.desc())\
+                               .limit(self.max_turns)\
+                               .all()
+        return [(row.user_message, row.bot_response) for row in reversed(rows)]
+
+    def _session(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+
+        unsaved = ()
+        if session is not None:
+            stored = self._count(session_id)
+            with self._lock:
+                if self._settle(session, stored):
+                    return session
+                # Rows this process didn't write: another worker answered or cleared the session
+                unsaved = list(session.unsaved)
+                if self._sessions.get(session_id) is session:
+                    del self._sessions[session_id]
+
+        # Query outside the lock; a concurrent load of the same session just loses the race
+        stored = self._count(session_id)
+        turns = self._load(session_id)
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session(self.max_turns, stored)
+                for user_message, bot_response in turns:
+                    self._append(session, _Turn(user_message, bot_response))
+                for pair in unsaved:
+                    if pair not in turns:
+                        self._append(session, _Turn(*pair))
+                        session.unsaved.append(pair)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            return session
+
+    @staticmethod
+    def _settle(session, stored):
+        """Account for ``stored`` rows; False if they aren't just this process's own turns"""
+        written = stored - session.stored
+        if written < 0 or written > len(session.unsaved):
+            return False
+        for _ in range(written):
+            session.unsaved.popleft()
+        session.stored = stored
+        return True
+
+    def messages(self, session_id):
+        """Chat messages for the session's history: summary first, then recent turns"""
+        session = self._session(session_id)
+
+        with self._lock:
+            messages = []
+            if session.summary:
+                messages.append({
+                    "role": "system",
+                    "content": "Earlier in this conversation:\n" + "\n".join(session.summary)
+                })
+            for turn in session.turns:
+                messages.append({"role": "user", "content": turn.user_message})
+                messages.append({"role": "assistant", "content": turn.bot_response})
+            return messages
+
+    def record(self, session_id, user_message, bot_response):
+        """Add a finished turn to the session's memory, before or after its row is written
+
+        A session no longer in memory is left alone; its next load reads
+        the turn from the database.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            self._append(session, _Turn(user_message, bot_response))
+            session.unsaved.append((user_message, bot_response))
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'token_budget': self.token_budget
+            }
+
+    def _append(self, session, turn):
+        if len(session.turns) == session.turns.maxlen:
+            self._fold(session, session.turns.popleft())
+        session.turns.append(turn)
+        session.turn_tokens += turn.tokens
+
+        # Keep the newest turn verbatim; fold older ones until the history fits
+        while len(session.turns) > 1 and session.turn_tokens + session.summary_tokens > self.token_budget:
+            self._fold(session, session.turns.popleft())
+
+    def _fold(self, session, turn):
+        session.turn_tokens -= turn.tokens
+        line = f"- Customer: {first_sentence(turn.user_message, 30)} " \
+               f"Assistant: {first_sentence(turn.bot_response, 30)}"
+        session.summary.append(line)
+        session.summary_tokens += estimate_tokens(line) + 1
+
+        while len(session.summary) > 1 and session.summary_tokens > self.summary_token_budget:
+            session.summary_tokens -= estimate_tokens(session.summary.popleft()) + 1
@@ -0,0 +1,301 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from models import db, ChatSession, Product, SearchLog
+from services.ranking import BM25Scorer
+from services.search_index import ensure_product_index, tokenize
+from services.search_rollup import normalize_query
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.getenv('RECOMMENDATIONS_PATH', 'instance/cooccurrence.npz')
+
+WINDOW_DAYS = 90
+TOP_K = 20
+MIN_SUPPORT = 2             # sessions a pair must share to count
+MAX_BASKET = 50             # products per session, so one long session can't dominate
+SEARCH_HITS_PER_QUERY = 3   # top results a logged search stands for
+READ_CHUNK_SIZE = 10000
+PAIR_REDUCE_SIZE = 5000000  # pending pair keys before they are folded into counts
+
+# How often the serving side checks the index file for a new build
+RELOAD_INTERVAL = 60
+
+
+def context_product_ids(context_data):
+    """Product ids a reply showed, from a ChatSession.context_data JSON string
+
+    Only ``product_ids`` counts. ``sample_products`` are whichever active
+    rows an unordered ``LIMIT 3`` returned for the prompt, the same few for
+    most messages, so they say nothing about what a session looked at.
+    """
+    try:
+        context = json.loads(context_data) if context_data else {}
+    except ValueError:
+        return []
+    if not isinstance(context, dict):
+        return []
+    ids = context.get('product_ids')
+    if not isinstance(ids, list):
+        return []
+    return [product_id for product_id in ids if isinstance(product_id, int)]
+
+
+def _chunks(columns, model, since, chunk_size, *criteria):
+    """Rows of ``model`` newer than ``since``, read in id-ordered chunks"""
+    last_id = 0
+    while True:
+        rows = db.session.query(model.id, *columns)\
+                         .filter(model.id > last_id, model.timestamp >= since, *criteria)\
+                         .order_by(model.id)\
+                         .limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def collect_baskets(since, chunk_size=READ_CHUNK_SIZE, echo=print):
+    """{session_id: set of product ids} from chat replies and searches since ``since``
+
+    Chat rows contribute the products their context says were shown. Search
+    logs only keep the query text, so each distinct query is resolved
+    once to its top hits in the search index.
+    """
+    baskets = defaultdict(set)
+
+    chat_rows = 0
+    for rows in _chunks((ChatSession.session_id, ChatSession.context_data), ChatSession, since,
+                        chunk_size, ChatSession.context_data != None):
+        for row in rows:
+            product_ids = context_product_ids(row.context_data)
+            if product_ids:
+                baskets[row.session_id].update(product_ids)
+        chat_rows += len(rows)
+    echo(f"Read {chat_rows} chat messages")
+
+    index = ensure_product_index()
+    scorer = BM25Scorer(index)
+    hits_by_query = {}
+    search_rows = 0
+    for rows in _chunks((SearchLog.session_id, SearchLog.query), SearchLog, since,
+                        chunk_size, SearchLog.session_id != None):
+        for row in rows:
+            query_text = normalize_query(row.query)
+            hits = hits_by_query.get(query_text)
+            if hits is None:
+                terms = tokenize(query_text)
+                ranked = scorer.top_k(terms, index.match(terms), SEARCH_HITS_PER_QUERY) if terms else []
+                hits = hits_by_query[query_text] = [doc_id for doc_id, _ in ranked]
+            baskets[row.session_id].update(hits)
+        search_rows += len(rows)
+    echo(f"Read {search_rows} searches ({len(hits_by_query)} distinct queries)")
+
+    return baskets
+
+
+def _fold_pairs(parts, keys, counts):
+    if not parts:
+        return keys, counts
+    new_keys, new_counts = np.unique(np.concatenate(parts), return_counts=True)
+    if keys is None:
+        return new_keys, new_counts
+    keys, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+    return keys, np.bincount(inverse, weights=np.concatenate([counts, new_counts])).astype(np.int64)
+
+
+def count_pairs(baskets, max_basket=MAX_BASKET):
+    """(item_ids, item_counts, pair_keys, pair_counts) over ordered pairs of distinct items
+
+    ``pair_keys`` encode (row, col) positions in ``item_ids`` as
+    row * len(item_ids) + col. Baskets are grouped by size so the pairs of
+    each group come from one broadcast instead of a loop per basket.
+    """
+    by_size = defaultdict(list)
+    for basket in baskets:
+        if len(basket) > 1:
+            items = sorted(basket)[:max_basket]
+            by_size[len(items)].append(items)
+    if not by_size:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+
+    groups = {size: np.array(group, dtype=np.int64) for size, group in by_size.items()}
+    item_ids = np.unique(np.concatenate([group.ravel() for group in groups.values()]))
+    n = len(item_ids)
+    item_counts = np.zeros(n, dtype=np.int64)
+
+    keys = counts = None
+    for size, group in groups.items():
+        codes = np.searchsorted(item_ids, group)
+        item_counts += np.bincount(codes.ravel(), minlength=n)
+        off_diagonal = ~np.eye(size, dtype=bool)
+        step = max(PAIR_REDUCE_SIZE // (size * size), 1)
+        for start in range(0, len(codes), step):
+            chunk = codes[start:start + step]
+            shape = (len(chunk), size, size)
+            left = np.broadcast_to(chunk[:, :, None], shape)[:, off_diagonal]
+            right = np.broadcast_to(chunk[:, None, :], shape)[:, off_diagonal]
+            keys, counts = _fold_pairs([(left * n + right).ravel()], keys, counts)
+
+    return item_ids, item_counts, keys, counts
+
+
+def _active_categories(item_ids):
+    """(is_active, category_id or -1) arrays aligned with the sorted ``item_ids``"""
+    active = np.zeros(len(item_ids), dtype=bool)
+    categories = np.full(len(item_ids), -1, dtype=np.int64)
+    for start in range(0, len(item_ids), READ_CHUNK_SIZE):
+        chunk = item_ids[start:start + READ_CHUNK_SIZE].tolist()
+        rows = db.session.query(Product.id, Product.category_id)\
+                         .filter(Product.id.in_(chunk), Product.is_active == True).all()
+        if not rows:
+            continue
+        positions = np.searchsorted(item_ids, [row.id for row in rows])
+        active[positions] = True
+        categories[positions] = [row.category_id if row.category_id is not None else -1 for row in rows]
+    return active, categories
+
+
+class CooccurrenceIndex:
+    """Top-k related products per product, stored CSR-style
+
+    ``product_ids`` is sorted; the neighbors of ``product_ids[i]`` are
+    ``neighbors[offsets[i]:offsets[i + 1]]``, best first, with their
+    categories alongside so category filters need no query.
+    """
+
+    ARRAYS = ('product_ids', 'offsets', 'neighbors', 'neighbor_categories', 'scores')
+
+    def __init__(self, product_ids, offsets, neighbors, neighbor_categories, scores, built_at=None):
+        self.product_ids = product_ids
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.neighbor_categories = neighbor_categories
+        self.scores = scores
+        self.built_at = built_at
+
+    @classmethod
+    def build(cls, baskets, top_k=TOP_K, min_support=MIN_SUPPORT, max_basket=MAX_BASKET):
+        item_ids, item_counts, keys, counts = count_pairs(baskets, max_basket)
+        n = len(item_ids)
+
+        # Only active products are recommended
+        active, categories = _active_categories(item_ids)
+
+        rows, cols = keys // max(n, 1), keys % max(n, 1)
+        keep = (counts >= min_support) & active[cols]
+        rows, cols, counts = rows[keep], cols[keep], counts[keep]
+
+        # Cosine similarity of the two products' session vectors
+        scores = counts / np.sqrt(item_counts[rows] * item_counts[cols])
+
+        order = np.lexsort((cols, -scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left')
+        keep = rank < top_k
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+        return cls(item_ids, offsets, item_ids[cols], categories[cols],
+                   scores.astype(np.float32), built_at=time.time())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS}
+            built_at = float(data['built_at'])
+        return cls(built_at=built_at, **arrays)
+
+    def save(self, path):
+        """Write the index next to ``path`` and rename it into place"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, built_at=np.float64(self.built_at or time.time()),
+                     **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(temp_path, path)
+
+    def related(self, product_id, k, category_id=None):
+        position = np.searchsorted(self.product_ids, product_id)
+        if position >= len(self.product_ids) or self.product_ids[position] != product_id:
+            return []
+        start, end = self.offsets[position], self.offsets[position + 1]
+        neighbors = self.neighbors[start:end].tolist()
+        if category_id:
+            categories = self.neighbor_categories[start:end].tolist()
+            neighbors = [pid for pid, cid in zip(neighbors, categories) if cid == category_id]
+        return neighbors[:k]
+
+    def __len__(self):
+        return len(self.product_ids)
+
+
+class RecommendationStore:
+    """Serves the index file written by ``flask build-recommendations``
+
+    The file is checked at most every ``reload_interval`` seconds and
+    reloaded when its modification time changes. Without a file every
+    lookup returns no related products.
+    """
+
+    def __init__(self, path=INDEX_PATH, reload_interval=RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._index = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        if time.monotonic() - self._checked_at >= self.reload_interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = time.monotonic()
+                mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+                if mtime != self._mtime:
+                    self._index = CooccurrenceIndex.load(self.path) if mtime else None
+                    self._mtime = mtime
+                    logger.info(f"Loaded recommendations for {len(self._index or ())} products")
+            except Exception as e:
+                logger.error(f"Failed to load recommendations from {self.path}: {e}")
+            finally:
+                self._lock.release()
+        return self._index
+
+    def related(self, product_id, k, category_id=None):
+        index = self.current()
+        return index.related(product_id, k, category_id) if index is not None else []
+
+    def stats(self):
+        index = self._index
+        return {
+            'loaded': index is not None,
+            'products': len(index) if index is not None else 0,
+            'pairs': len(index.neighbors) if index is not None else 0,
+            'built_at': datetime.fromtimestamp(index.built_at, timezone.utc).isoformat() if index is not None else None,
+            'path': self.path
+        }
+
+
+recommendation_store = RecommendationStore()
+
+
+def build_recommendations(path=INDEX_PATH, days=WINDOW_DAYS, top_k=TOP_K, min_support=MIN_SUPPORT,
+                          chunk_size=READ_CHUNK_SIZE, echo=print):
+    """Rebuild the co-occurrence index from the last ``days`` of chat and search logs"""
+    started = time.perf_counter()
+    baskets = collect_baskets(datetime.utcnow() - timedelta(days=days), chunk_size, echo)
+    index = CooccurrenceIndex.build(baskets.values(), top_k=top_k, min_support=min_support)
+    index.save(path)
+    echo(f"Wrote related products for {len(index)} products ({len(index.neighbors)} pairs) "
+         f"from {len(baskets)} sessions to {path} in {time.perf_counter() - started:.1f}s")
+    return index
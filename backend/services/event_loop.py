@@ -0,0 +1,35 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEventLoop:
+    """One asyncio loop running for the life of the process on a daemon thread
+
+    ``run(coro)`` schedules a coroutine on the loop and blocks the calling
+    (request) thread until it finishes. Every coroutine shares the loop,
+    so clients bound to it, like AsyncOpenAI's connection pool, are built
+    once and reused, and awaited LLM calls from all request threads are
+    multiplexed on one thread instead of each holding a loop of its own.
+    """
+
+    def __init__(self, name='event-loop'):
+        self.name = name
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                self._loop = loop
+                logger.info(f"Started event loop thread '{self.name}'")
+            return self._loop
+
+    def run(self, coro, timeout=None):
+        """Run ``coro`` on the loop and return its result (or raise its exception)"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+        return future.result(timeout)
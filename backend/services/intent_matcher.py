@@ -0,0 +1,172 @@
+import re
+import threading
+
+# Keyword tables compiled into the matcher's phrase table
+CATEGORY_KEYWORDS = {
+    'electronics': ['phone', 'smartphone', 'laptop', 'computer', 'headphone', 'tablet', 'electronics'],
+    'clothing': ['clothes', 'jeans', 'shoes', 'shirt', 'hoodie', 'dress', 'clothing', 'fashion'],
+    'books': ['book', 'novel', 'guide', 'manual', 'reading'],
+    'home & garden': ['furniture', 'table', 'chair', 'bulb', 'light', 'home', 'garden'],
+    'sports': ['sports', 'tennis', 'basketball', 'racket', 'ball', 'athletic', 'fitness']
+}
+
+# In priority order: the first one matched is the message's primary intent
+INTENT_KEYWORDS = {
+    'search': ['search', 'find', 'looking for', 'show me'],
+    'recommendation': ['recommend', 'suggest', 'best', 'popular'],
+    'price_inquiry': ['price', 'cost', 'cheap', 'expensive', 'budget'],
+    'availability': ['available', 'stock', 'in stock']
+}
+
+UPPER_BOUND_WORDS = ['under', 'below', 'less than']
+LOWER_BOUND_WORDS = ['over', 'above', 'more than']
+
+OPEN_PRICE_CEILING = 999999
+
+# Prices and words; messages and keyword phrases are split the same way
+TOKEN_PATTERN = re.compile(r"\$?\d+(?:\.\d{2})?|[a-z][a-z0-9']*")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class IntentMatcher:
+    """Keyword tables compiled once into a phrase -> meaning hash table
+
+    ``match`` tokenizes the message with one compiled regex, then walks the
+    tokens once, trying the longest phrase that starts at each word. Every
+    category, intent and brand mentioned is reported along with the price
+    bounds, and the cost per message does not grow with the number of
+    keywords or brands.
+    """
+
+    def __init__(self, category_keywords=None, intent_keywords=None, brands=()):
+        self.category_keywords = category_keywords or CATEGORY_KEYWORDS
+        self.intent_keywords = intent_keywords or INTENT_KEYWORDS
+        self.brands = set()
+        self._lock = threading.Lock()
+        self._compile(brands)
+
+    def _compile(self, brands):
+        phrases = {}  # space-joined tokens -> (kind, label)
+        phrase_spans = {}  # first token -> longest phrase length starting with it
+
+        def add(phrase, meaning):
+            tokens = tokenize(phrase)
+            if not tokens:
+                return
+            phrases.setdefault(' '.join(tokens), meaning)
+            if len(tokens) > 1:
+                phrase_spans[tokens[0]] = max(phrase_spans.get(tokens[0], 1), len(tokens))
+
+        for label, keywords in self.category_keywords.items():
+            for keyword in keywords:
+                add(keyword, ('category', label))
+        for label, keywords in self.intent_keywords.items():
+            for keyword in keywords:
+                add(keyword, ('intent', label))
+        for word in UPPER_BOUND_WORDS:
+            add(word, ('upper', None))
+        for word in LOWER_BOUND_WORDS:
+            add(word, ('lower', None))
+
+        brands = {brand for brand in brands if brand and brand.strip()}
+        for brand in sorted(brands):
+            add(brand, ('brand', brand))
+
+        # Swapped in as one tuple so concurrent match() calls see a consistent table
+        self._compiled = (phrases, phrase_spans)
+        self.brands = brands
+
+    def add_brands(self, brands):
+        """Recompile if any of ``brands`` is new; returns True when it did"""
+        with self._lock:
+            new_brands = {brand for brand in brands if brand} - self.brands
+            if not new_brands:
+                return False
+            self._compile(self.brands | new_brands)
+            return True
+
+    def match(self, message):
+        """Return categories, intents, brands (in order of first mention) and price bounds"""
+        phrases, phrase_spans = self._compiled
+        lookup = phrases.get
+        tokens = tokenize(message)
+        count = len(tokens)
+
+        category_hits = {}
+        intents = []
+        brands = []
+        prices = []
+        upper = lower = False
+
+        i = 0
+        while i < count:
+            token = tokens[i]
+            if token[0] == '$' or token[0].isdigit():
+                prices.append(float(token.lstrip('$')))
+                i += 1
+                continue
+
+            meaning, size = None, 1
+            longest = phrase_spans.get(token)
+            if longest:
+                for span in range(min(longest, count - i), 1, -1):
+                    meaning = lookup(' '.join(tokens[i:i + span]))
+                    if meaning:
+                        size = span
+                        break
+            if not meaning:
+                meaning = lookup(token)
+            if not meaning and token[-1] == 's':
+                # Plurals: "laptops", "dresses"
+                meaning = lookup(token[:-1]) or (token.endswith('es') and lookup(token[:-2]))
+            i += size
+
+            if not meaning:
+                continue
+            kind, label = meaning
+            if kind == 'category':
+                category_hits[label] = category_hits.get(label, 0) + 1
+            elif kind == 'intent':
+                if label not in intents:
+                    intents.append(label)
+            elif kind == 'brand':
+                if label not in brands:
+                    brands.append(label)
+            elif kind == 'upper':
+                upper = True
+            else:
+                lower = True
+
+        # Most mentioned category first; ties keep the order of first mention
+        categories = sorted(category_hits, key=lambda label: -category_hits[label])
+
+        return {
+            'categories': categories,
+            'intents': intents,
+            'brands': brands,
+            'price_range': self._price_range(prices, upper, lower)
+        }
+
+    @staticmethod
+    def _price_range(prices, upper, lower):
+        if len(prices) >= 2:
+            return (prices[0], prices[1])
+        if len(prices) == 1:
+            if upper:
+                return (0, prices[0])
+            if lower:
+                return (prices[0], OPEN_PRICE_CEILING)
+        return None
+
+    def primary_intent(self, match):
+        """Highest priority intent of a match() result, or 'general'"""
+        for label in self.intent_keywords:
+            if label in match['intents']:
+                return label
+        return 'general'
+
+
+intent_matcher = IntentMatcher()
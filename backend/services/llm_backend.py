@@ -0,0 +1,226 @@
+from abc import ABC, abstractmethod
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gpt-3.5-turbo'
+
+
+class LLMBackendError(Exception):
+    """Raised by a backend when a completion fails"""
+
+
+class LLMTimeoutError(LLMBackendError):
+    """Raised when a completion doesn't finish within its deadline"""
+
+
+class LLMBackend(ABC):
+    """Chat completion interface used by the chatbot
+
+    ``messages`` are OpenAI-style role/content dicts. ``complete`` returns the
+    reply text, ``stream`` yields it in pieces and ``complete_async`` is the
+    coroutine version of ``complete``. ``timeout`` is a per-call deadline in
+    seconds (for ``stream``, until the first token).
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def complete(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        """Return the reply text"""
+
+    def stream(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        yield self.complete(messages, max_tokens, temperature, timeout)
+
+    async def complete_async(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        return await asyncio.to_thread(self.complete, messages, max_tokens, temperature, timeout)
+
+
+class OpenAIBackend(LLMBackend):
+    name = 'openai'
+
+    def __init__(self, api_key, model=DEFAULT_MODEL):
+        from openai import OpenAI
+
+        self.api_key = api_key
+        self.model = model
+        self.client = OpenAI(api_key=api_key)
+        # An AsyncOpenAI client's connection pool belongs to the loop that first used it
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        self._async_clients_lock = threading.Lock()
+
+    def _async_client(self):
+        """The AsyncOpenAI client for the running event loop
+
+        The chat path runs every coroutine on one long-lived loop (see
+        services.event_loop), so in practice this is one client whose
+        connection pool every chat shares.
+        """
+        from openai import AsyncOpenAI
+
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = AsyncOpenAI(api_key=self.api_key)
+        return client
+
+    def complete(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout
+        )
+        return response.choices[0].message.content.strip()
+
+    def stream(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            timeout=timeout
+        )
+        for chunk in stream:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                yield token
+
+    async def complete_async(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        response = await self._async_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout
+        )
+        return response.choices[0].message.content.strip()
+
+
+class FakeLLMBackend(LLMBackend):
+    """In-process stand-in for load tests: no network, no quota
+
+    Each call waits ``latency_ms`` (+/- ``jitter_ms``) before the first token,
+    then emits words at ``tokens_per_second``. A ``failure_rate`` fraction of
+    calls raise LLMBackendError after the initial latency, like a timed out
+    or rejected request would.
+    """
+
+    name = 'fake'
+
+    PRODUCT_LINE = re.compile(r'^\s*- (.+?): \$', re.MULTILINE)
+
+    def __init__(self, latency_ms=400, jitter_ms=100, tokens_per_second=50,
+                 failure_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def _first_token_delay(self):
+        jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    def _should_fail(self):
+        return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
+    def _reply_tokens(self, messages, max_tokens):
+        prompt = messages[-1]['content'] if messages else ''
+        products = self.PRODUCT_LINE.findall(prompt)[:3]
+        if products:
+            reply = f"Here are some options you might like: {', '.join(products)}. " \
+                    "Let me know if you'd like more details on any of them."
+        else:
+            reply = "I couldn't find an exact match, but I'm happy to help. " \
+                    "Could you tell me more about what you're looking for?"
+        words = reply.split(' ')[:max_tokens]
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+    def _token_interval(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0
+
+    @staticmethod
+    def _check_deadline(delay, timeout):
+        """Like a client timeout: wait out the deadline, then fail"""
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise LLMTimeoutError(f'Fake LLM call exceeded {timeout}s')
+
+    def complete(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        tokens = self._reply_tokens(messages, max_tokens)
+        delay = self._first_token_delay()
+        self._check_deadline(delay + self._token_interval() * len(tokens), timeout)
+        time.sleep(delay)
+        if self._should_fail():
+            raise LLMBackendError('Injected fake LLM failure')
+        time.sleep(self._token_interval() * len(tokens))
+        return ''.join(tokens)
+
+    def stream(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        delay = self._first_token_delay()
+        self._check_deadline(delay, timeout)
+        time.sleep(delay)
+        if self._should_fail():
+            raise LLMBackendError('Injected fake LLM failure')
+        interval = self._token_interval()
+        for token in self._reply_tokens(messages, max_tokens):
+            yield token
+            time.sleep(interval)
+
+    async def complete_async(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        tokens = self._reply_tokens(messages, max_tokens)
+        delay = self._first_token_delay()
+        duration = delay + self._token_interval() * len(tokens)
+        if timeout is not None and duration > timeout:
+            await asyncio.sleep(timeout)
+            raise LLMTimeoutError(f'Fake LLM call exceeded {timeout}s')
+        await asyncio.sleep(delay)
+        if self._should_fail():
+            raise LLMBackendError('Injected fake LLM failure')
+        await asyncio.sleep(self._token_interval() * len(tokens))
+        return ''.join(tokens)
+
+
+def create_backend(name=None, api_key=None, model=None):
+    """Build the backend named by LLM_BACKEND: 'openai' (default), 'fake' or 'none'
+
+    Returns None for 'none' or when OpenAI can't be set up, which puts the
+    chatbot on its fallback responses.
+    """
+    name = (name or os.getenv('LLM_BACKEND', 'openai')).lower()
+
+    if name == 'none':
+        return None
+
+    if name == 'fake':
+        return FakeLLMBackend(
+            latency_ms=float(os.getenv('FAKE_LLM_LATENCY_MS', 400)),
+            jitter_ms=float(os.getenv('FAKE_LLM_JITTER_MS', 100)),
+            tokens_per_second=float(os.getenv('FAKE_LLM_TOKENS_PER_SECOND', 50)),
+            failure_rate=float(os.getenv('FAKE_LLM_FAILURE_RATE', 0))
+        )
+
+    if name != 'openai':
+        raise ValueError(f"Unknown LLM_BACKEND '{name}'; expected openai, fake or none")
+
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        logger.error("OPENAI_API_KEY not found in environment variables")
+        return None
+
+    try:
+        return OpenAIBackend(api_key, model=model or os.getenv('OPENAI_MODEL', DEFAULT_MODEL))
+    except Exception as e:
+        logger.error(f"Failed to initialize OpenAI client: {str(e)}")
+        return None
@@ -0,0 +1,264 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import String
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0  # seconds
+
+# A batch that fails with a connection or lock error is retried whole this many
+# times, the wait doubling from RETRY_BACKOFF, before rows are written one by one
+BATCH_RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds
+
+# How long stop() waits for the worker to write what is queued
+STOP_TIMEOUT = 30  # seconds
+
+# Queued by stop() to wake a worker waiting on an empty queue
+_STOP = object()
+
+
+class LogSink:
+    """Bounded queue of rows bulk-inserted by a background worker thread
+
+    Request handlers call ``submit(Model, values)`` and return immediately.
+    The worker writes rows in batches of up to ``batch_size`` or every
+    ``flush_interval`` seconds, whichever comes first. When the queue is
+    full new rows are dropped and counted rather than blocking requests.
+    ``stop()``, registered to run at exit, writes what is still queued.
+    """
+
+    def __init__(self, db, max_queue_size=MAX_QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, name='log-sink', batch_retries=BATCH_RETRIES,
+                 retry_backoff=RETRY_BACKOFF):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self.batch_retries = batch_retries
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._batch_hooks = {}  # model -> [hook(session, rows)]
+        self._commit_hooks = {}  # model -> [hook(rows)]
+        self._string_lengths = {}  # model -> {column: max length}
+        self._app = None
+        self._worker = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._counters = {
+            'submitted': 0,
+            'dropped': 0,
+            'written': 0,
+            'failed': 0,
+            'batches': 0,
+            'batch_retries': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+
+    def add_batch_hook(self, model, hook):
+        """Run ``hook(session, rows)`` in the same transaction as each batch of ``model`` rows"""
+        self._batch_hooks.setdefault(model, []).append(hook)
+
+    def add_commit_hook(self, model, hook):
+        """Run ``hook(rows)`` with the ``model`` rows of each batch once they are committed"""
+        self._commit_hooks.setdefault(model, []).append(hook)
+
+    def submit(self, model, values):
+        """Queue a row for insertion; returns False if it was dropped
+
+        Strings longer than their column are truncated here, so one long
+        value can't fail the batch it is written with.
+        """
+        self._ensure_started()
+        for column, length in self._column_lengths(model).items():
+            value = values.get(column)
+            if isinstance(value, str) and len(value) > length:
+                values = dict(values, **{column: value[:length]})
+        try:
+            self._queue.put_nowait((model, values))
+        except queue.Full:
+            self._count('dropped')
+            return False
+
+        self._count('submitted')
+        return True
+
+    def flush(self):
+        """Synchronously write everything currently queued"""
+        if self._app is None:
+            return
+
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Stop the worker once it has written everything queued"""
+        worker = self._worker
+        if worker is None or self._stopping.is_set():
+            return
+
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_STOP)
+        except queue.Full:
+            # The worker isn't waiting, and checks the flag after each batch
+            pass
+        worker.join(timeout)
+        if worker.is_alive():
+            logger.warning(f"{self.name}: worker still writing after {timeout}s, "
+                           f"{self._queue.qsize()} rows left queued")
+        else:
+            # Rows submitted while the worker was draining
+            self.flush()
+
+    def stats(self):
+        with self._stats_lock:
+            counters = dict(self._counters)
+
+        total_flush_ms = counters.pop('total_flush_ms')
+        counters['queue_depth'] = self._queue.qsize()
+        counters['avg_flush_ms'] = round(total_flush_ms / counters['batches'], 3) if counters['batches'] else 0.0
+        counters['worker_alive'] = bool(self._worker and self._worker.is_alive())
+        return counters
+
+    def _column_lengths(self, model):
+        lengths = self._string_lengths.get(model)
+        if lengths is None:
+            lengths = self._string_lengths[model] = {
+                column.key: column.type.length for column in model.__table__.columns
+                if isinstance(column.type, String) and column.type.length
+            }
+        return lengths
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._counters[key] += amount
+
+    def _ensure_started(self):
+        if self._worker is not None:
+            return
+
+        with self._start_lock:
+            if self._worker is not None:
+                return
+            self._app = current_app._get_current_object()
+            self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._worker.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+
+        # Drain the queue before the thread exits
+        self.flush()
+
+    def _write_batch(self, batch):
+        rows_by_model = {}
+        for model, values in batch:
+            rows_by_model.setdefault(model, []).append(values)
+
+        started = time.perf_counter()
+        with self._write_lock, self._app.app_context():
+            session = self.db.session
+            attempt = 0
+            while True:
+                try:
+                    self._insert(session, rows_by_model)
+                    session.commit()
+                    self._count('written', len(batch))
+                    self._committed(rows_by_model)
+                    break
+                except Exception as e:
+                    session.rollback()
+                    # Lost connections, deadlocks and lock timeouts fail every row alike
+                    if isinstance(e, OperationalError) and attempt < self.batch_retries:
+                        delay = self.retry_backoff * 2 ** attempt
+                        attempt += 1
+                        self._count('batch_retries')
+                        logger.warning(f"{self.name}: batch of {len(batch)} rows failed ({e}), "
+                                       f"retry {attempt} of {self.batch_retries} in {delay:.1f}s")
+                        time.sleep(delay)
+                        continue
+                    logger.warning(f"{self.name}: batch of {len(batch)} rows failed ({e}), retrying row by row")
+                    self._write_rows(session, batch)
+                    break
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._counters['batches'] += 1
+            self._counters['last_flush_ms'] = round(elapsed_ms, 3)
+            self._counters['max_flush_ms'] = max(self._counters['max_flush_ms'], round(elapsed_ms, 3))
+            self._counters['total_flush_ms'] += elapsed_ms
+
+    def _insert(self, session, rows_by_model):
+        for model, rows in rows_by_model.items():
+            session.execute(model.__table__.insert(), rows)
+            for hook in self._batch_hooks.get(model, ()):
+                hook(session, rows)
+
+    def _committed(self, rows_by_model):
+        for model, rows in rows_by_model.items():
+            for hook in self._commit_hooks.get(model, ()):
+                try:
+                    hook(rows)
+                except Exception as e:
+                    logger.error(f"{self.name}: commit hook for {model.__tablename__} failed: {e}")
+
+    def _write_rows(self, session, batch):
+        """Write a failed batch one row per transaction so only bad rows are lost"""
+        for model, values in batch:
+            try:
+                self._insert(session, {model: [values]})
+                session.commit()
+                self._count('written')
+                self._committed({model: [values]})
+            except Exception as e:
+                session.rollback()
+                self._count('failed')
+                logger.error(f"{self.name}: dropped {model.__tablename__} row: {e}")
@@ -0,0 +1,329 @@
+from collections import Counter, OrderedDict
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 5000
+MAX_BYTES = 64 * 1024 * 1024
+
+# How long a process trusts its own copy. Invalidations only reach the
+# process that made the change (and the shared store), so this bounds how
+# stale another worker can be.
+LOCAL_TTL_SECONDS = 60
+SHARED_LOCAL_TTL_SECONDS = 5
+SHARED_TTL_SECONDS = 300
+
+
+class SQLiteProductStore:
+    """Payload store in a local SQLite file, shared by the worker processes on a host
+
+    Invalidating a product leaves a tombstone (an empty payload) and
+    invalidating a category records when it happened, so ``put`` can
+    refuse a payload whose load started before either: another worker
+    may have read the old row just before the change committed. Rows
+    carry the catalog version they were stored for (see
+    ``ProductPayloadCache.get_many``).
+    """
+
+    def __init__(self, path, namespace, ttl=SHARED_TTL_SECONDS):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS product_payloads ('
+                ' namespace TEXT NOT NULL, product_id INTEGER NOT NULL, category_id INTEGER,'
+                ' payload BLOB NOT NULL, stored_at REAL NOT NULL,'
+                ' PRIMARY KEY (namespace, product_id))'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS invalidated_categories ('
+                ' namespace TEXT NOT NULL, category_id INTEGER NOT NULL, invalidated_at REAL NOT NULL,'
+                ' PRIMARY KEY (namespace, category_id))'
+            )
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(product_payloads)')]
+            if 'version' not in columns:
+                connection.execute('ALTER TABLE product_payloads ADD COLUMN version TEXT')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, product_id):
+        row = self._connection().execute(
+            'SELECT category_id, payload, version FROM product_payloads'
+            ' WHERE namespace = ? AND product_id = ? AND stored_at >= ? AND length(payload) > 0',
+            (self.namespace, product_id, time.time() - self.ttl)
+        ).fetchone()
+        return (row[0], bytes(row[1]), row[2]) if row else None
+
+    def put(self, product_id, category_id, payload, loaded_since, version=None):
+        """Store a payload read from the database at or after ``loaded_since`` (a time.time())
+
+        Skipped when the product or its category was invalidated, or a
+        newer load was stored, after ``loaded_since``.
+        """
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT INTO product_payloads (namespace, product_id, category_id, payload, stored_at, version)'
+                ' SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS ('
+                '  SELECT 1 FROM invalidated_categories'
+                '  WHERE namespace = ? AND category_id = ? AND invalidated_at > ?)'
+                ' ON CONFLICT (namespace, product_id) DO UPDATE SET'
+                '  category_id = excluded.category_id, payload = excluded.payload,'
+                '  stored_at = excluded.stored_at, version = excluded.version'
+                '  WHERE product_payloads.stored_at <= ?',
+                (self.namespace, product_id, category_id, payload, time.time(), version,
+                 self.namespace, category_id, loaded_since, loaded_since)
+            )
+
+    def delete(self, product_id):
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO product_payloads VALUES (?, ?, NULL, ?, ?, NULL)',
+                               (self.namespace, product_id, b'', time.time()))
+
+    def delete_category(self, category_id):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM product_payloads WHERE namespace = ? AND category_id = ?',
+                               (self.namespace, category_id))
+            connection.execute('INSERT OR REPLACE INTO invalidated_categories VALUES (?, ?, ?)',
+                               (self.namespace, category_id, time.time()))
+
+
+class _Entry:
+    __slots__ = ('category_id', 'payload', 'version', 'expires_at')
+
+    def __init__(self, category_id, payload, version, expires_at):
+        self.category_id = category_id
+        self.payload = payload
+        self.version = version
+        self.expires_at = expires_at
+
+
+class ProductPayloadCache:
+    """Read-through LRU of serialized product detail responses
+
+    ``get_or_load(product_id, loader)`` returns the cached bytes, or calls
+    ``loader(product_id)`` for a ``(category_id, payload_bytes)`` pair (or
+    None when there is no such product) and caches it. The cache is
+    bounded by entry count and total bytes. With ``shared_store``, misses
+    check a SQLiteProductStore before the database, so workers on one host
+    share their loads.
+
+    Callers drop entries through ``invalidate`` / ``invalidate_category``
+    from Product and Category change events. A load that overlaps an
+    invalidation is returned but not stored, locally or in the shared
+    store.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttl=None, shared_store=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared_store = shared_store
+        if ttl is None:
+            ttl = SHARED_LOCAL_TTL_SECONDS if shared_store else LOCAL_TTL_SECONDS
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def get_or_load(self, product_id, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(product_id)
+                self._counters['hits'] += 1
+                return entry.payload
+            invalidations = self._invalidations
+
+        loaded = self._shared_get(product_id)
+        if loaded is not None:
+            with self._lock:
+                self._counters['shared_hits'] += 1
+        else:
+            loaded_since = time.time()
+            loaded = loader(product_id)
+            with self._lock:
+                self._counters['misses'] += 1
+            if loaded is None:
+                return None
+            self._shared_put({product_id: loaded}, loaded_since, invalidations)
+
+        category_id, payload = loaded
+        with self._lock:
+            if invalidations == self._invalidations:
+                self._store(product_id, _Entry(category_id, payload, None, time.monotonic() + self.ttl))
+        return payload
+
+    def get_many(self, product_ids, load_many, versions=None):
+        """Payloads for ``product_ids`` in order, skipping products that do not exist
+
+        Misses are loaded together with ``load_many(ids)``, which returns a
+        dict of id -> (category_id, payload_bytes).
+
+        ``versions`` maps product id -> the version (e.g. ``updated_at``) the
+        caller's response is for. An entry stored for any other version is
+        a miss, so a response never pairs a validator with older bodies.
+        """
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._entries.get(product_id)
+                if entry is not None and entry.expires_at > now \
+                        and (versions is None or entry.version == versions.get(product_id)):
+                    self._entries.move_to_end(product_id)
+                    found[product_id] = entry.payload
+                else:
+                    missing.append(product_id)
+            self._counters['hits'] += len(found)
+            invalidations = self._invalidations
+
+        loaded = {}
+        if missing and self.shared_store is not None:
+            for product_id in missing:
+                shared = self._shared_get(product_id, versions)
+                if shared is not None:
+                    loaded[product_id] = shared
+            with self._lock:
+                self._counters['shared_hits'] += len(loaded)
+            missing = [product_id for product_id in missing if product_id not in loaded]
+
+        if missing:
+            loaded_since = time.time()
+            from_loader = load_many(missing)
+            with self._lock:
+                self._counters['misses'] += len(missing)
+            self._shared_put(from_loader, loaded_since, invalidations, versions)
+            loaded.update(from_loader)
+
+        if loaded:
+            expires_at = time.monotonic() + self.ttl
+            with self._lock:
+                if invalidations == self._invalidations:
+                    for product_id, (category_id, payload) in loaded.items():
+                        version = versions.get(product_id) if versions is not None else None
+                        self._store(product_id, _Entry(category_id, payload, version, expires_at))
+            for product_id, (category_id, payload) in loaded.items():
+                found[product_id] = payload
+
+        return [found[product_id] for product_id in product_ids if product_id in found]
+
+    def _store(self, product_id, entry):
+        if len(entry.payload) > self.max_bytes:
+            return
+        self._remove(product_id)
+        self._entries[product_id] = entry
+        self._bytes += len(entry.payload)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.payload)
+            self._counters['evictions'] += 1
+
+    def _remove(self, product_id):
+        entry = self._entries.pop(product_id, None)
+        if entry is not None:
+            self._bytes -= len(entry.payload)
+
+    def invalidate(self, product_id):
+        with self._lock:
+            self._invalidations += 1
+            self._remove(product_id)
+            self._counters['invalidations'] += 1
+        self._shared_call('delete', product_id)
+
+    def invalidate_category(self, category_id):
+        """Drop every product embedding this category"""
+        with self._lock:
+            self._invalidations += 1
+            for product_id in [key for key, entry in self._entries.items() if entry.category_id == category_id]:
+                self._remove(product_id)
+                self._counters['invalidations'] += 1
+        self._shared_call('delete_category', category_id)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _shared_get(self, product_id, versions=None):
+        """(category_id, payload) from the shared store, if stored for the expected version"""
+        if self.shared_store is None:
+            return None
+        try:
+            row = self.shared_store.get(product_id)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared product cache read failed: {e}")
+            return None
+        if row is None or (versions is not None and row[2] != versions.get(product_id)):
+            return None
+        return row[:2]
+
+    def _shared_put(self, loaded, loaded_since, invalidations, versions=None):
+        """Share freshly loaded payloads unless this process invalidated anything meanwhile"""
+        if self.shared_store is None or invalidations != self._invalidations:
+            return
+        for product_id, (category_id, payload) in loaded.items():
+            version = versions.get(product_id) if versions is not None else None
+            self._shared_call('put', product_id, category_id, payload, loaded_since, version)
+
+    def _shared_call(self, method, *args):
+        if self.shared_store is None:
+            return
+        try:
+            getattr(self.shared_store, method)(*args)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared product cache {method} failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+            size_bytes = self._bytes
+
+        hits = counters.get('hits', 0) + counters.get('shared_hits', 0)
+        lookups = hits + counters.get('misses', 0)
+        return {
+            'size': size,
+            'bytes': size_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': counters.get('hits', 0),
+            'shared_hits': counters.get('shared_hits', 0),
+            'misses': counters.get('misses', 0),
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'evictions': counters.get('evictions', 0),
+            'invalidations': counters.get('invalidations', 0),
+            'shared_store': self.shared_store.path if self.shared_store else None
+        }
+
+
+def create_product_cache(namespace):
+    """ProductPayloadCache with a shared SQLite store if PRODUCT_CACHE_SQLITE_PATH is set"""
+    path = os.getenv('PRODUCT_CACHE_SQLITE_PATH')
+    shared_store = None
+    if path:
+        try:
+            shared_store = SQLiteProductStore(path, namespace)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared product cache disabled: {e}")
+    return ProductPayloadCache(
+        max_entries=int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', MAX_ENTRIES)),
+        max_bytes=int(os.getenv('PRODUCT_CACHE_MAX_BYTES', MAX_BYTES)),
+        shared_store=shared_store
+    )
@@ -0,0 +1,350 @@
+from collections import Counter
+from datetime import timedelta
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'[a-z][a-z0-9]*')
+
+# Conversational filler and price words that say nothing about the product
+STOPWORDS = frozenset("""
+a about above all also am an and any are around as at be below between but buy by can cheap
+cheaper cheapest could do does dollar dollars for from get give good great have help hello hey
+hi i i'm im in is it its just less like looking me more my need of on one or over please price
+priced range recommend search see sell show so some something suggest than thanks that the
+them there these this those to under up want we what which with would you your
+""".split())
+
+# Name words count this many times a description word does
+NAME_WEIGHT = 2
+
+# Per query term, only this many highest-weight postings are scored,
+# which bounds the work per query whatever the catalog size
+MAX_POSTINGS_PER_TERM = 2000
+
+# Rebuild at most this often after catalog changes
+REFRESH_INTERVAL = 60
+
+# Rows stamped this long before the build's newest write are re-checked after
+# the catalog version moves, for transactions that committed late
+CHANGE_LOOKBACK = timedelta(minutes=5)
+
+
+def normalize_token(token):
+    # Fold simple plurals so "laptops" finds "laptop"
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def content_terms(text):
+    """Tokens left after dropping stopwords and price tokens (numbers are never matched)"""
+    if not text:
+        return []
+    return [normalize_token(token) for token in TOKEN_PATTERN.findall(text.lower())
+            if token not in STOPWORDS]
+
+
+def index_fingerprint(name, description, price, category_id):
+    """Hash of the fields a build reads; writes that leave it unchanged never force a rebuild"""
+    return hash((name, description, float(price) if price is not None else 0.0, category_id))
+
+
+class _Snapshot:
+    """Immutable arrays for one build of the catalog
+
+    Postings are stored CSR-style by term: ``term_offsets[t]`` to
+    ``term_offsets[t + 1]`` index into ``post_rows`` / ``post_weights``,
+    sorted by weight descending. Weights are TF-IDF values divided by the
+    document's L2 norm, so summing weight * query idf ranks candidates by
+    cosine similarity.
+    """
+
+    def __init__(self, ids, fingerprints, prices, category_codes, category_names, vocabulary,
+                 idf, term_offsets, post_rows, post_weights):
+        self.ids = ids
+        self.fingerprints = fingerprints
+        self.prices = prices
+        self.category_codes = category_codes
+        self.category_names = category_names
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.term_offsets = term_offsets
+        self.post_rows = post_rows
+        self.post_weights = post_weights
+
+    def row_of(self, product_id):
+        # ids are in ascending order
+        row = int(np.searchsorted(self.ids, product_id))
+        return row if row < len(self.ids) and self.ids[row] == product_id else None
+
+    def is_current(self, product_id, is_active, fingerprint):
+        row = self.row_of(product_id)
+        if not is_active:
+            return row is None
+        return row is not None and self.fingerprints[row] == fingerprint
+
+    def category_mask(self, rows, category):
+        codes = [code for code, name in enumerate(self.category_names) if category in name]
+        return np.isin(self.category_codes[rows], codes)
+
+
+class ProductRetriever:
+    """Chatbot product retrieval without querying MySQL for candidates
+
+    Messages are reduced to content terms. Candidates come from in-memory
+    postings of the matched terms, capped per term, and are ranked by
+    TF-IDF cosine similarity with NumPy. Category and price filters are
+    applied as array masks. Only the final top-k ids are left for the
+    caller to load by primary key.
+
+    Only writes that change what a build reads (name, description, price,
+    category, active flag) mark the snapshot stale. With a ``version``
+    (a ``CatalogVersion``), writes from other processes are noticed too:
+    once it moves, rows stamped since the build are compared with the
+    snapshot and it is rebuilt only if one of them differs or the active
+    count changed.
+    """
+
+    def __init__(self, model, category_model, max_postings_per_term=MAX_POSTINGS_PER_TERM,
+                 refresh_interval=REFRESH_INTERVAL, version=None):
+        self.model = model
+        self.category_model = category_model
+        self.max_postings_per_term = max_postings_per_term
+        self.refresh_interval = refresh_interval
+        self.version = version
+        self._snapshot = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._version_token = None
+        self._watermark = None
+        self._dirty = False
+        self._build_lock = threading.Lock()
+
+    def _load_rows(self):
+        model, category_model = self.model, self.category_model
+        return model.query.with_entities(model.id, model.name, model.description,
+                                         model.price, model.category_id, category_model.name)\
+                          .outerjoin(category_model, model.category_id == category_model.id)\
+                          .filter(model.is_active == True)\
+                          .order_by(model.id)\
+                          .yield_per(5000)
+
+    def build(self):
+        started = time.perf_counter()
+        # Read before the rows, so a write landing during the build moves the version past it
+        version_token, watermark = self.version.current() if self.version is not None else (None, None)
+        ids, fingerprints, prices, category_codes = [], [], [], []
+        category_lookup = {}
+        term_lookup = {}
+        term_rows, term_tfs = [], []
+
+        for row_number, (product_id, name, description, price, category_id, category_name) \
+                in enumerate(self._load_rows()):
+            ids.append(product_id)
+            fingerprints.append(index_fingerprint(name, description, price, category_id))
+            prices.append(float(price) if price is not None else 0.0)
+            category_name = (category_name or '').lower()
+            category_codes.append(category_lookup.setdefault(category_name, len(category_lookup)))
+
+            counts = Counter()
+            for term in content_terms(name):
+                counts[term] += NAME_WEIGHT
+            counts.update(content_terms(description))
+
+            for term, tf in counts.items():
+                term_id = term_lookup.get(term)
+                if term_id is None:
+                    term_id = term_lookup[term] = len(term_rows)
+                    term_rows.append([])
+                    term_tfs.append([])
+                term_rows[term_id].append(row_number)
+                term_tfs[term_id].append(tf)
+
+        doc_count = len(ids)
+        doc_freqs = np.array([len(rows) for rows in term_rows], dtype=np.int64)
+        idf = np.log((1 + doc_count) / (1 + doc_freqs)) + 1
+
+        term_offsets = np.zeros(len(term_rows) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=term_offsets[1:])
+        post_rows = np.fromiter((row for rows in term_rows for row in rows),
+                                dtype=np.int32, count=int(term_offsets[-1]))
+        post_tfs = np.fromiter((tf for tfs in term_tfs for tf in tfs),
+                               dtype=np.float64, count=int(term_offsets[-1]))
+        post_terms = np.repeat(np.arange(len(term_rows)), doc_freqs)
+
+        weights = (1 + np.log(post_tfs)) * idf[post_terms]
+        norms = np.sqrt(np.bincount(post_rows, weights=weights * weights, minlength=doc_count))
+        weights /= norms[post_rows]
+
+        # Highest weight first within each term, so a capped slice keeps the best matches
+        order = np.lexsort((-weights, post_terms))
+        post_rows = post_rows[order]
+        post_weights = weights[order].astype(np.float32)
+
+        category_names = [None] * len(category_lookup)
+        for name, code in category_lookup.items():
+            category_names[code] = name
+
+        self._snapshot = _Snapshot(
+            ids=np.array(ids, dtype=np.int64),
+            fingerprints=np.array(fingerprints, dtype=np.int64),
+            prices=np.array(prices, dtype=np.float64),
+            category_codes=np.array(category_codes, dtype=np.int32),
+            category_names=category_names,
+            vocabulary=term_lookup,
+            idf=idf,
+            term_offsets=term_offsets,
+            post_rows=post_rows,
+            post_weights=post_weights
+        )
+        self._built_at = self._checked_at = time.monotonic()
+        self._version_token, self._watermark = version_token, watermark
+        logger.info(f"Built product retriever: {doc_count} products, {len(term_lookup)} terms "
+                    f"in {time.perf_counter() - started:.1f}s")
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def product_changed(self, op, values):
+        """Mark the snapshot stale if a committed write changed what it indexes"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        # A build in progress may have read the row before this write
+        if self._build_lock.locked():
+            self.mark_dirty()
+            return
+
+        is_active = op != 'delete' and values.get('is_active')
+        fingerprint = index_fingerprint(values.get('name'), values.get('description'),
+                                        values.get('price'), values.get('category_id'))
+        if not snapshot.is_current(values['id'], is_active, fingerprint):
+            self.mark_dirty()
+
+    def _changed_since_build(self, snapshot, watermark):
+        """Whether rows written since ``watermark``, or the active count, differ from ``snapshot``"""
+        model = self.model
+        active_count = model.query.with_entities(func.count(model.id))\
+                                  .filter(model.is_active == True)\
+                                  .scalar()
+        if active_count != len(snapshot.ids):
+            return True
+
+        query = model.query.with_entities(model.id, model.name, model.description,
+                                          model.price, model.category_id, model.is_active)
+        if watermark is not None:
+            query = query.filter(model.updated_at >= watermark - CHANGE_LOOKBACK)
+        for product_id, name, description, price, category_id, is_active in query.yield_per(5000):
+            if not snapshot.is_current(product_id, is_active,
+                                       index_fingerprint(name, description, price, category_id)):
+                return True
+        return False
+
+    def _ensure_fresh(self):
+        if self._snapshot is None:
+            with self._build_lock:
+                if self._snapshot is None:
+                    self._dirty = False
+                    self.build()
+            return
+
+        if time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        if self._dirty:
+            check = False
+        elif self.version is not None and self.version.current()[0] != self._version_token:
+            # Written since the build, maybe by another process; rebuild only if it matters
+            check = True
+        else:
+            return
+
+        if self._build_lock.acquire(blocking=False):
+            # Keep serving the current snapshot while a new one is built
+            self._dirty = False
+            try:
+                app = current_app._get_current_object()
+                threading.Thread(target=self._refresh, args=(app, check), name='product-retriever-refresh',
+                                 daemon=True).start()
+            except Exception:
+                self._dirty = self._dirty or not check
+                self._build_lock.release()
+                raise
+
+    def _refresh(self, app, check=False):
+        try:
+            with app.app_context():
+                if check:
+                    snapshot = self._snapshot
+                    version_token, watermark = self.version.current()
+                    if not self._changed_since_build(snapshot, self._watermark):
+                        self._version_token, self._watermark = version_token, watermark
+                        self._checked_at = time.monotonic()
+                        return
+                self.build()
+        except Exception as e:
+            logger.error(f"Product retriever refresh failed: {e}")
+            self._dirty = True
+        finally:
+            self._build_lock.release()
+
+    def retrieve(self, text, category=None, price_range=None, k=10):
+        """Ids of the top ``k`` active products for a message, best first"""
+        self._ensure_fresh()
+        snapshot = self._snapshot
+        terms = [term for term in dict.fromkeys(content_terms(text)) if term in snapshot.vocabulary]
+
+        if terms:
+            row_parts, score_parts = [], []
+            for term in terms:
+                term_id = snapshot.vocabulary[term]
+                start = snapshot.term_offsets[term_id]
+                end = min(snapshot.term_offsets[term_id + 1], start + self.max_postings_per_term)
+                row_parts.append(snapshot.post_rows[start:end])
+                score_parts.append(snapshot.post_weights[start:end] * snapshot.idf[term_id])
+
+            rows, inverse = np.unique(np.concatenate(row_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        elif category or price_range:
+            # Filters only: newest matching products
+            rows = np.arange(len(snapshot.ids))
+            scores = rows.astype(np.float64)
+        else:
+            return []
+
+        mask = np.ones(len(rows), dtype=bool)
+        if category:
+            mask &= snapshot.category_mask(rows, category.lower())
+        if price_range:
+            min_price, max_price = price_range
+            prices = snapshot.prices[rows]
+            if min_price is not None:
+                mask &= prices >= min_price
+            if max_price is not None:
+                mask &= prices <= max_price
+
+        rows, scores = rows[mask], scores[mask]
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+
+        # Best first; ties go to the newer product
+        order = np.lexsort((-rows, -scores))
+        return snapshot.ids[rows[order]].tolist()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'built': snapshot is not None,
+            'products': len(snapshot.ids) if snapshot is not None else 0,
+            'terms': len(snapshot.vocabulary) if snapshot is not None else 0,
+            'stale': self._dirty,
+            'age_seconds': round(time.monotonic() - self._built_at, 1) if snapshot is not None else None
+        }
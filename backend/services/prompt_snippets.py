@@ -0,0 +1,116 @@
+from collections import OrderedDict
+import threading
+
+from services.conversation_memory import estimate_tokens
+
+MAX_ENTRIES = 20000
+DESCRIPTION_CHARS = 100
+
+# Product lines per prompt are capped by count and by estimated tokens
+MAX_PRODUCTS = 5
+TOKEN_BUDGET = 250
+
+
+class _Entry:
+    __slots__ = ('updated_at', 'category_id', 'product', 'line', 'tokens')
+
+    def __init__(self, updated_at, product, line):
+        self.updated_at = updated_at
+        self.category_id = product.get('category_id')
+        self.product = product
+        self.line = line
+        self.tokens = estimate_tokens(line)
+
+
+class PromptSnippetCache:
+    """Product dicts and their pre-built, token-counted prompt lines
+
+    ``products(rows, load_many)`` takes (id, updated_at) pairs, which a
+    caller can read without loading whole rows, and only loads and
+    serializes (``Product.to_dict()``, category included) the products
+    whose ``updated_at`` differs from the cached one or that a catalog
+    event dropped. Building the products context is then a join of
+    ready-made strings.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, description_chars=DESCRIPTION_CHARS):
+        self.max_entries = max_entries
+        self.description_chars = description_chars
+        self._entries = OrderedDict()  # product id -> _Entry
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def build_line(self, product):
+        description = (product.get('description') or '')[:self.description_chars]
+        return f"- {product['name']}: ${product['price']} - {description}...\n"
+
+    def products(self, rows, load_many):
+        """Product dicts for ``rows`` of (id, updated_at), in order
+
+        Misses are loaded with ``load_many(ids)``, which returns a dict of
+        id -> product dict. Each call returns copies, so callers may change them.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for product_id, updated_at in rows:
+                entry = self._entries.get(product_id)
+                if entry is not None and entry.updated_at == updated_at:
+                    self._entries.move_to_end(product_id)
+                    found[product_id] = entry.product
+                else:
+                    missing.append(product_id)
+            self.hits += len(found)
+
+        if missing:
+            loaded = load_many(missing)
+            versions = dict(rows)
+            with self._lock:
+                for product_id, product in loaded.items():
+                    self._store(product_id, _Entry(versions.get(product_id), product, self.build_line(product)))
+            found.update(loaded)
+
+        return [dict(found[product_id]) for product_id, _ in rows if product_id in found]
+
+    def snippet(self, product):
+        """(line, tokens) for a product dict as returned by ``products``"""
+        with self._lock:
+            entry = self._entries.get(product['id'])
+            if entry is not None and entry.product['updated_at'] == product.get('updated_at'):
+                return entry.line, entry.tokens
+        line = self.build_line(product)
+        return line, estimate_tokens(line)
+
+    def _store(self, product_id, entry):
+        self._entries[product_id] = entry
+        self._entries.move_to_end(product_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.builds += 1
+
+    def context(self, products, max_products=MAX_PRODUCTS, token_budget=TOKEN_BUDGET):
+        """Join snippets for ``products`` in order, stopping at either limit; returns (text, tokens)"""
+        lines = []
+        total = 0
+        for product in products[:max_products]:
+            line, tokens = self.snippet(product)
+            if lines and total + tokens > token_budget:
+                break
+            lines.append(line)
+            total += tokens
+        return ''.join(lines), total
+
+    def invalidate(self, product_id):
+        with self._lock:
+            self._entries.pop(product_id, None)
+
+    def invalidate_category(self, category_id):
+        """Drop products embedding this category's name"""
+        with self._lock:
+            for product_id in [key for key, entry in self._entries.items() if entry.category_id == category_id]:
+                del self._entries[product_id]
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'builds': self.builds, 'hits': self.hits}
@@ -0,0 +1,80 @@
+import heapq
+import math
+
+# Per-field weights applied to term frequencies before saturation (BM25F)
+FIELD_BOOSTS = {
+    'name': 3.0,
+    'brand': 2.0,
+    'tags': 1.5,
+    'description': 1.0
+}
+
+# Query terms that only match an indexed term as a prefix count for less
+PREFIX_MATCH_WEIGHT = 0.5
+
+
+class BM25Scorer:
+    """BM25F relevance scoring over a SearchIndex"""
+
+    def __init__(self, index, field_boosts=None, k1=1.2, b=0.75):
+        self.index = index
+        self.field_boosts = field_boosts or FIELD_BOOSTS
+        self.k1 = k1
+        self.b = b
+
+    def idf(self, term):
+        doc_count = self.index.doc_count
+        doc_freq = len(self.index.postings(term))
+        return math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def _weighted_tf(self, doc_id, field_freqs):
+        weighted = 0.0
+        for field, tf in field_freqs.items():
+            avg_length = self.index.average_field_length(field) or 1.0
+            length_norm = 1 - self.b + self.b * self.index.field_length(doc_id, field) / avg_length
+            weighted += self.field_boosts.get(field, 1.0) * tf / length_norm
+        return weighted
+
+    def score(self, query_terms, doc_ids):
+        """Return {doc_id: score} for the given (already filtered) documents"""
+        with self.index.lock:
+            term_weights = []
+            for term in query_terms:
+                expansions = []
+                for expansion in self.index.expand(term):
+                    weight = 1.0 if expansion == term else PREFIX_MATCH_WEIGHT
+                    expansions.append((self.index.postings(expansion), self.idf(expansion) * weight))
+                term_weights.append(expansions)
+
+            scores = {}
+            for doc_id in doc_ids:
+                total = 0.0
+                for expansions in term_weights:
+                    best = 0.0
+                    for postings, weight in expansions:
+                        field_freqs = postings.get(doc_id)
+                        if not field_freqs:
+                            continue
+                        tf = self._weighted_tf(doc_id, field_freqs)
+                        best = max(best, weight * tf / (self.k1 + tf))
+                    total += best
+                scores[doc_id] = total
+
+            return scores
+
+    def top_k(self, query_terms, doc_ids, k, after=None):
+        """Return the ``k`` best (doc_id, score) pairs without sorting every candidate
+
+        ``after`` is a (score, doc_id) pair from a previous page; only
+        documents ranked strictly below it are returned.
+        """
+        if k <= 0:
+            return []
+
+        rank_key = lambda item: (item[1], -item[0])
+        candidates = self.score(query_terms, doc_ids).items()
+        if after is not None:
+            after_key = (after[0], -after[1])
+            candidates = [item for item in candidates if rank_key(item) < after_key]
+
+        return heapq.nlargest(k, candidates, key=rank_key)
@@ -0,0 +1,322 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import logging
+import os
+import threading
+import time
+
+from services.llm_backend import LLMBackend, LLMBackendError, LLMTimeoutError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Defaults; each can be overridden with the environment variable in wrap_backend
+TIMEOUT_SECONDS = 10.0           # LLM_TIMEOUT_SECONDS
+HEDGE_AFTER_SECONDS = 4.0        # LLM_HEDGE_AFTER_SECONDS, 0 disables hedging
+SLOW_CALL_SECONDS = 4.0          # LLM_SLOW_CALL_SECONDS
+FAILURE_THRESHOLD = 5            # LLM_BREAKER_FAILURES
+RESET_TIMEOUT_SECONDS = 30.0     # LLM_BREAKER_RESET_SECONDS
+HEDGE_WORKERS = 64               # LLM_HEDGE_WORKERS, threads for hedged sync calls (may outlive the request)
+
+
+class CircuitOpenError(LLMBackendError):
+    """Raised instead of calling the backend while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker
+
+    After ``failure_threshold`` failures in a row the breaker opens and
+    calls are refused for ``reset_timeout`` seconds. After that, one probe
+    call is let through (half-open): success closes the breaker, failure
+    opens it again. A success slower than ``slow_call_seconds`` counts as
+    a failure, so latency spikes trip it as well as errors do.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT_SECONDS, slow_call_seconds=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def allow_request(self):
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._counters['rejected'] += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self._counters['rejected'] += 1
+                    return False
+                self._probe_in_flight = True
+
+            self._counters['calls'] += 1
+            return True
+
+    def cancel_request(self):
+        """Undo allow_request() for a call that was never made, freeing the half-open probe"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self, elapsed):
+        if self.slow_call_seconds and elapsed > self.slow_call_seconds:
+            with self._lock:
+                self._counters['slow_calls'] += 1
+                self._on_failure()
+            return
+
+        with self._lock:
+            self._counters['successes'] += 1
+            self._consecutive_failures = 0
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._probe_in_flight = False
+                logger.info(f"Circuit breaker '{self.name}' closed")
+
+    def record_failure(self):
+        with self._lock:
+            self._counters['failures'] += 1
+            self._on_failure()
+
+    def _on_failure(self):
+        self._consecutive_failures += 1
+        if self._state == HALF_OPEN or \
+                (self._state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+            self._counters['opened'] += 1
+            logger.warning(f"Circuit breaker '{self.name}' opened after "
+                           f"{self._consecutive_failures} consecutive failures")
+
+    @property
+    def state(self):
+        return self._state
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            state = self._state
+            opened_at = self._opened_at
+            consecutive_failures = self._consecutive_failures
+
+        return {
+            'state': state,
+            'consecutive_failures': consecutive_failures,
+            'seconds_since_opened': round(time.monotonic() - opened_at, 1) if opened_at else None,
+            'calls': counters.get('calls', 0),
+            'successes': counters.get('successes', 0),
+            'failures': counters.get('failures', 0),
+            'slow_calls': counters.get('slow_calls', 0),
+            'rejected': counters.get('rejected', 0),
+            'opened': counters.get('opened', 0)
+        }
+
+
+class ResilientLLM(LLMBackend):
+    """An LLMBackend wrapped with a per-call deadline and a circuit breaker
+
+    ``complete_hedged`` (and its async form) gives up waiting after
+    ``hedge_after`` seconds and returns None so the caller can answer with
+    its fallback instead. A sync call keeps running in the background up
+    to its deadline, and ``on_late_reply`` receives its reply if it
+    arrives. At most ``hedge_workers`` sync calls are hedged at once;
+    beyond that ``complete_hedged`` makes a plain call on the caller's
+    thread instead of queueing.
+    """
+
+    def __init__(self, backend, breaker=None, timeout=TIMEOUT_SECONDS, hedge_after=HEDGE_AFTER_SECONDS,
+                 hedge_workers=HEDGE_WORKERS):
+        self.backend = backend
+        self.name = backend.name
+        self.breaker = breaker or CircuitBreaker(f'llm-{backend.name}', slow_call_seconds=SLOW_CALL_SECONDS)
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self._hedge_pool = None
+        self.hedge_workers = hedge_workers
+        self._hedge_slots = threading.BoundedSemaphore(hedge_workers)
+        self._pool_lock = threading.Lock()
+        self._counters = Counter()
+        self._counter_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def _allow(self):
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Circuit '{self.breaker.name}' is open")
+
+    def complete(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        self._allow()
+        return self._call(messages, max_tokens, temperature, timeout)
+
+    def _call(self, messages, max_tokens, temperature, timeout):
+        started = time.monotonic()
+        try:
+            reply = self.backend.complete(messages, max_tokens, temperature, timeout or self.timeout)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success(time.monotonic() - started)
+        return reply
+
+    def stream(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        self._allow()
+        started = time.monotonic()
+        first_token_after = None
+        try:
+            for token in self.backend.stream(messages, max_tokens, temperature, timeout or self.timeout):
+                if first_token_after is None:
+                    first_token_after = time.monotonic() - started
+                yield token
+        except GeneratorExit:
+            # The client went away; that says nothing about the backend
+            self.breaker.record_success(first_token_after or 0)
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        # Long replies take long to stream; only the wait for the first token counts
+        self.breaker.record_success(first_token_after or time.monotonic() - started)
+
+    async def complete_async(self, messages, max_tokens=300, temperature=0.7, timeout=None):
+        self._allow()
+        timeout = timeout or self.timeout
+        started = time.monotonic()
+        try:
+            reply = await asyncio.wait_for(
+                self.backend.complete_async(messages, max_tokens, temperature, timeout), timeout
+            )
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise LLMTimeoutError(f'LLM call exceeded {timeout}s')
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success(time.monotonic() - started)
+        return reply
+
+    def _pool(self):
+        with self._pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                      thread_name_prefix='llm-hedge')
+            return self._hedge_pool
+
+    def complete_hedged(self, messages, max_tokens=300, temperature=0.7, on_late_reply=None):
+        """complete(), or None if no reply within hedge_after seconds"""
+        if not self.hedge_after:
+            return self.complete(messages, max_tokens, temperature)
+
+        # Every hedge worker busy: queueing would only make the caller wait out its
+        # hedge, so call without one (the backend's own deadline still applies)
+        if not self._hedge_slots.acquire(blocking=False):
+            self._count('saturated')
+            return self.complete(messages, max_tokens, temperature)
+        try:
+            self._allow()
+            probe = self.breaker.state == HALF_OPEN
+            future = self._pool().submit(self._hedged_call, time.monotonic(), probe,
+                                         messages, max_tokens, temperature)
+        except Exception:
+            self._hedge_slots.release()
+            raise
+        try:
+            return future.result(timeout=self.hedge_after)
+        except FutureTimeoutError:
+            self._count('hedged')
+            if on_late_reply is not None:
+                future.add_done_callback(lambda done: self._deliver_late(done, on_late_reply))
+            return None
+
+    def _hedged_call(self, submitted_at, probe, messages, max_tokens, temperature):
+        try:
+            # Don't start a call the caller has stopped waiting for, or one the breaker now refuses
+            if time.monotonic() - submitted_at >= self.hedge_after or self.breaker.state == OPEN:
+                if probe:
+                    self.breaker.cancel_request()
+                self._count('skipped')
+                return None
+            return self._call(messages, max_tokens, temperature, None)
+        finally:
+            self._hedge_slots.release()
+
+    async def complete_hedged_async(self, messages, max_tokens=300, temperature=0.7, on_late_reply=None):
+        """complete_async(), or None if no reply within hedge_after seconds
+
+        Like ``complete_hedged``, the call keeps running up to its deadline
+        on the (long-lived) loop, and ``on_late_reply`` receives its reply.
+        """
+        if not self.hedge_after or self.hedge_after >= self.timeout:
+            return await self.complete_async(messages, max_tokens, temperature)
+
+        task = asyncio.ensure_future(self.complete_async(messages, max_tokens, temperature))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.hedge_after)
+        except asyncio.TimeoutError:
+            self._count('hedged')
+            task.add_done_callback(lambda done: self._deliver_late(done, on_late_reply))
+            return None
+
+    def _deliver_late(self, future, on_late_reply):
+        if future.cancelled() or future.exception() is not None or future.result() is None \
+                or on_late_reply is None:
+            return
+        self._count('late_replies')
+        try:
+            on_late_reply(future.result())
+        except Exception as e:
+            logger.error(f"Late LLM reply handler failed: {e}")
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self._counters)
+        return {
+            'backend': self.name,
+            'timeout_seconds': self.timeout,
+            'hedge_after_seconds': self.hedge_after,
+            'hedge_workers': self.hedge_workers,
+            'hedged': counters.get('hedged', 0),
+            'late_replies': counters.get('late_replies', 0),
+            'saturated': counters.get('saturated', 0),
+            'skipped': counters.get('skipped', 0),
+            'breaker': self.breaker.stats()
+        }
+
+
+def wrap_backend(backend):
+    """Wrap a backend from create_backend with settings from the environment"""
+    if backend is None:
+        return None
+
+    hedge_after = float(os.getenv('LLM_HEDGE_AFTER_SECONDS', HEDGE_AFTER_SECONDS))
+    breaker = CircuitBreaker(
+        f'llm-{backend.name}',
+        failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', FAILURE_THRESHOLD)),
+        reset_timeout=float(os.getenv('LLM_BREAKER_RESET_SECONDS', RESET_TIMEOUT_SECONDS)),
+        slow_call_seconds=float(os.getenv('LLM_SLOW_CALL_SECONDS', SLOW_CALL_SECONDS))
+    )
+    return ResilientLLM(
+        backend,
+        breaker=breaker,
+        timeout=float(os.getenv('LLM_TIMEOUT_SECONDS', TIMEOUT_SECONDS)),
+        hedge_after=hedge_after,
+        hedge_workers=int(os.getenv('LLM_HEDGE_WORKERS', HEDGE_WORKERS))
+    )
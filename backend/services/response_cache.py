@@ -0,0 +1,217 @@
+from collections import Counter, OrderedDict
+import math
+import re
+import threading
+import time
+
+NORMALIZE_PATTERN = re.compile(r'[^a-z0-9$.\s]+')
+
+MAX_ENTRIES = 1000
+TTL_SECONDS = 600
+
+# Cosine similarity of character trigram vectors needed for a near-duplicate hit
+SIMILARITY_THRESHOLD = 0.85
+# Most recent entries per filter bucket compared for near-duplicates
+MAX_SIMILARITY_CANDIDATES = 50
+
+# Words a near-duplicate may add or drop; every other word (brands, model
+# numbers, product nouns) must appear in both messages
+STOP_WORDS = frozenset(
+    'a an the i im me my you your we us show find get give want need looking look for '
+    'some any with and or of to in on at please can could would do does is are there '
+    'what which whats have has got'.split()
+)
+
+
+def normalize_message(message):
+    return ' '.join(NORMALIZE_PATTERN.sub(' ', message.lower()).split())
+
+
+def trigram_vector(text):
+    padded = f'  {text} '
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def content_terms(normalized):
+    """Words of a normalized message that change its meaning, singularized"""
+    terms = set()
+    for word in normalized.split():
+        word = word.strip('.')
+        if not word or word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.add(word)
+    return frozenset(terms)
+
+
+def cosine_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class _Entry:
+    __slots__ = ('bucket', 'response', 'product_ids', 'terms', 'vector', 'latency_ms', 'expires_at')
+
+    def __init__(self, bucket, response, product_ids, terms, vector, latency_ms, expires_at):
+        self.bucket = bucket
+        self.response = response
+        self.product_ids = product_ids
+        self.terms = terms
+        self.vector = vector
+        self.latency_ms = latency_ms
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """LRU + TTL cache of chatbot responses keyed on message and extracted filters
+
+    Messages are normalized before lookup. On an exact miss, recent entries
+    with the same filters and the same content terms are compared by
+    character trigram cosine similarity, so "show me laptops under $1000"
+    and "show me laptop under $1000" share an answer but "iphone 14 case"
+    and "iphone 15 case" do not. Entries are dropped when a product they cited
+    changes.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS,
+                 similarity_threshold=SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # (bucket, normalized message) -> _Entry
+        self._by_bucket = {}  # bucket -> OrderedDict of keys, oldest first
+        self._by_product = {}  # product id -> set of keys
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @staticmethod
+    def bucket_for(filters):
+        """Only the extracted filters matter; search_query is the message itself"""
+        price_range = filters.get('price_range')
+        return (
+            filters.get('category'),
+            tuple(price_range) if price_range else None
+        )
+
+    def get(self, message, filters):
+        bucket = self.bucket_for(filters)
+        normalized = normalize_message(message)
+        now = time.monotonic()
+
+        with self._lock:
+            key = (bucket, normalized)
+            entry = self._live_entry(key, now)
+            kind = 'hits'
+
+            if entry is None and self.similarity_threshold < 1.0:
+                key, entry = self._find_similar(bucket, normalized, now)
+                kind = 'similar_hits'
+
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters[kind] += 1
+            self._counters['saved_latency_ms'] += entry.latency_ms
+            return dict(entry.response)
+
+    def put(self, message, filters, response, product_ids=(), latency_ms=0.0):
+        bucket = self.bucket_for(filters)
+        normalized = normalize_message(message)
+        key = (bucket, normalized)
+
+        with self._lock:
+            self._remove(key)
+            entry = _Entry(bucket, dict(response), set(product_ids), content_terms(normalized),
+                           trigram_vector(normalized), latency_ms, time.monotonic() + self.ttl)
+            self._entries[key] = entry
+            self._by_bucket.setdefault(bucket, OrderedDict())[key] = None
+            for product_id in entry.product_ids:
+                self._by_product.setdefault(product_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._counters['evictions'] += 1
+
+    def invalidate_product(self, product_id):
+        with self._lock:
+            keys = self._by_product.pop(product_id, ())
+            for key in list(keys):
+                self._remove(key)
+                self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_bucket.clear()
+            self._by_product.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+
+        hits = counters.get('hits', 0) + counters.get('similar_hits', 0)
+        lookups = hits + counters.get('misses', 0)
+        return {
+            'size': size,
+            'hits': counters.get('hits', 0),
+            'similar_hits': counters.get('similar_hits', 0),
+            'misses': counters.get('misses', 0),
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'evictions': counters.get('evictions', 0),
+            'expired': counters.get('expired', 0),
+            'invalidations': counters.get('invalidations', 0),
+            'saved_latency_ms': round(counters.get('saved_latency_ms', 0.0), 1)
+        }
+
+    def _live_entry(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(key)
+            self._counters['expired'] += 1
+            return None
+        return entry
+
+    def _find_similar(self, bucket, normalized, now):
+        keys = self._by_bucket.get(bucket)
+        if not keys:
+            return None, None
+
+        terms = content_terms(normalized)
+        vector = trigram_vector(normalized)
+        best_key, best_entry, best_score = None, None, self.similarity_threshold
+        for key in list(reversed(keys))[:MAX_SIMILARITY_CANDIDATES]:
+            entry = self._live_entry(key, now)
+            # Close spelling is not enough: a different brand or model number is a different question
+            if entry is None or entry.terms != terms:
+                continue
+            score = cosine_similarity(vector, entry.vector)
+            if score >= best_score:
+                best_key, best_entry, best_score = key, entry, score
+
+        return best_key, best_entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        bucket_keys = self._by_bucket.get(entry.bucket)
+        if bucket_keys is not None:
+            bucket_keys.pop(key, None)
+            if not bucket_keys:
+                del self._by_bucket[entry.bucket]
+
+        for product_id in entry.product_ids:
+            keys = self._by_product.get(product_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_product[product_id]
@@ -0,0 +1,304 @@
+from bisect import bisect_left
+import json
+import logging
+import re
+import threading
+
+from models import Product
+from services import catalog_events
+from services.catalog_snapshot import WATERMARK_LOOKBACK
+from services.catalog_version import product_version
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+PRODUCT_FIELDS = ('name', 'brand', 'tags', 'description')
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    """In-memory inverted index: term -> {doc_id: {field: term frequency}}"""
+
+    def __init__(self, fields=PRODUCT_FIELDS):
+        self.fields = fields
+        self.docs = {}  # doc_id -> attributes used for filtering and sorting
+        self.is_built = False
+        self.version = None  # catalog version token the index was last brought up to
+        self.watermark = None  # newest updated_at read from the database
+        self._postings = {}
+        self._doc_terms = {}
+        self._field_lengths = {}
+        self._field_length_totals = dict.fromkeys(fields, 0)
+        self._vocabulary = None
+        self.lock = threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            self.docs = {}
+            self._postings = {}
+            self._doc_terms = {}
+            self._field_lengths = {}
+            self._field_length_totals = dict.fromkeys(self.fields, 0)
+            self._vocabulary = None
+            self.is_built = False
+            self.version = None
+            self.watermark = None
+
+    def add(self, doc_id, field_texts, attrs=None):
+        """Index (or re-index) a document from a {field: text} mapping"""
+        with self.lock:
+            self.remove(doc_id)
+
+            lengths = {}
+            terms = set()
+            for field in self.fields:
+                tokens = tokenize(field_texts.get(field))
+                lengths[field] = len(tokens)
+                self._field_length_totals[field] += len(tokens)
+                for token in tokens:
+                    field_freqs = self._postings.setdefault(token, {}).setdefault(doc_id, {})
+                    field_freqs[field] = field_freqs.get(field, 0) + 1
+                    terms.add(token)
+
+            self._field_lengths[doc_id] = lengths
+            self._doc_terms[doc_id] = terms
+            self.docs[doc_id] = attrs or {}
+            self._vocabulary = None
+
+    def remove(self, doc_id):
+        with self.lock:
+            terms = self._doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+
+            for term in terms:
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+
+            for field, length in self._field_lengths.pop(doc_id).items():
+                self._field_length_totals[field] -= length
+
+            self.docs.pop(doc_id, None)
+            self._vocabulary = None
+
+    def expand(self, term):
+        """Return indexed terms that start with ``term`` (exact match first)"""
+        with self.lock:
+            if self._vocabulary is None:
+                self._vocabulary = sorted(self._postings)
+            vocabulary = self._vocabulary
+
+            expansions = []
+            position = bisect_left(vocabulary, term)
+            while position < len(vocabulary):
+                candidate = vocabulary[position]
+                if not candidate.startswith(term):
+                    break
+                expansions.append(candidate)
+                position += 1
+
+            return expansions
+
+    def postings(self, term):
+        return self._postings.get(term, {})
+
+    def match(self, query_terms):
+        """Return ids of documents that contain every query term (prefix match)"""
+        with self.lock:
+            candidates = None
+            for term in query_terms:
+                term_docs = set()
+                for expansion in self.expand(term):
+                    term_docs.update(self._postings[expansion])
+
+                candidates = term_docs if candidates is None else candidates & term_docs
+                if not candidates:
+                    return set()
+
+            return candidates or set()
+
+    @property
+    def doc_count(self):
+        return len(self._field_lengths)
+
+    def field_length(self, doc_id, field):
+        return self._field_lengths.get(doc_id, {}).get(field, 0)
+
+    def average_field_length(self, field):
+        if not self._field_lengths:
+            return 0.0
+        return self._field_length_totals[field] / len(self._field_lengths)
+
+
+def product_document(values):
+    """Build the (field texts, attributes) pair indexed for a product row"""
+    tags = values.get('tags')
+    if tags:
+        try:
+            tags = ' '.join(json.loads(tags))
+        except (TypeError, ValueError):
+            pass
+
+    field_texts = {
+        'name': values.get('name'),
+        'brand': values.get('brand'),
+        'tags': tags,
+        'description': values.get('description')
+    }
+
+    attrs = {
+        'name': (values.get('name') or '').lower(),
+        'brand': values.get('brand'),
+        'category_id': values.get('category_id'),
+        'price': float(values['price']) if values.get('price') is not None else 0.0,
+        'rating': values.get('rating') or 0.0,
+        'stock_quantity': values.get('stock_quantity') or 0
+    }
+
+    return field_texts, attrs
+
+
+def filter_documents(index, doc_ids, category_id=None, brand=None, min_price=None,
+                     max_price=None, min_rating=None, in_stock=False):
+    """Apply the catalog filter parameters to indexed documents"""
+    brand = brand.lower() if brand else None
+    matched = []
+
+    for doc_id in doc_ids:
+        attrs = index.docs[doc_id]
+
+        if category_id and attrs['category_id'] != category_id:
+            continue
+        if brand and (not attrs['brand'] or brand not in attrs['brand'].lower()):
+            continue
+        if min_price is not None and attrs['price'] < min_price:
+            continue
+        if max_price is not None and attrs['price'] > max_price:
+            continue
+        if min_rating is not None and attrs['rating'] < min_rating:
+            continue
+        if in_stock and attrs['stock_quantity'] <= 0:
+            continue
+
+        matched.append(doc_id)
+
+    return matched
+
+
+product_index = SearchIndex()
+_build_lock = threading.Lock()
+
+# Changes committed while the index is being built, replayed once it is loaded
+_pending_lock = threading.Lock()
+_pending_changes = None
+
+
+def _product_columns():
+    return [getattr(Product, attr.key) for attr in Product.__mapper__.column_attrs]
+
+
+def _advance_watermark(values):
+    updated_at = values.get('updated_at')
+    if updated_at and (product_index.watermark is None or updated_at > product_index.watermark):
+        product_index.watermark = updated_at
+
+
+def ensure_product_index():
+    """The product index, built on first use and kept in step with the catalog version
+
+    Changes made in this process arrive through catalog events. When the
+    version shows changes from elsewhere (other workers, bulk inserts),
+    rows updated since the watermark are re-read; if the active count
+    still differs (a hard delete), the index is rebuilt.
+    """
+    # Read the version first: rows changed after this only make the token older
+    token, _ = product_version.current()
+    if product_index.is_built and product_index.version == token:
+        return product_index
+
+    with _build_lock:
+        if not product_index.is_built:
+            _build(token)
+        elif product_index.version != token and not _catch_up(token):
+            _build(token)
+
+    return product_index
+
+
+def _build(token):
+    global _pending_changes
+
+    product_index.clear()
+    with _pending_lock:
+        _pending_changes = []
+    count = 0
+    try:
+        rows = Product.query.with_entities(*_product_columns())\
+                            .filter(Product.is_active == True)\
+                            .yield_per(1000)
+        for row in rows:
+            values = row._asdict()
+            product_index.add(values['id'], *product_document(values))
+            _advance_watermark(values)
+            count += 1
+    except Exception:
+        with _pending_lock:
+            _pending_changes = None
+        raise
+
+    with _pending_lock:
+        # Rows read above may predate these commits, so apply them on top
+        for op, values in _pending_changes:
+            _apply_change(op, values)
+        _pending_changes = None
+        product_index.version = token
+        product_index.is_built = True
+    logger.info(f"Built product search index with {count} products")
+
+
+def _catch_up(token):
+    """Apply rows changed by other processes; False when a full rebuild is needed"""
+    if product_index.watermark is None:
+        return False
+
+    rows = Product.query.with_entities(*_product_columns())\
+                        .filter(Product.updated_at >= product_index.watermark - WATERMARK_LOOKBACK)\
+                        .all()
+    for row in rows:
+        values = row._asdict()
+        _apply_change('update', values)
+        _advance_watermark(values)
+
+    active_count = Product.query.filter(Product.is_active == True).count()
+    if active_count != product_index.doc_count:
+        return False
+    product_index.version = token
+    return True
+
+
+def _apply_change(op, values):
+    if op == 'delete' or not values.get('is_active'):
+        product_index.remove(values['id'])
+    else:
+        product_index.add(values['id'], *product_document(values))
+
+
+def _on_product_change(op, model, values):
+    with _pending_lock:
+        if _pending_changes is not None:
+            _pending_changes.append((op, values))
+            return
+        if not product_index.is_built:
+            return  # The first build reads the committed rows
+    _apply_change(op, values)
+
+
+catalog_events.subscribe(Product, _on_product_change)
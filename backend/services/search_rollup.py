@@ -0,0 +1,188 @@
+from collections import Counter
+from datetime import datetime, timedelta
+import time
+
+from sqlalchemy import MetaData, and_, desc, func, or_, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from models import db, SearchLog, SearchQueryRollup
+
+GRANULARITIES = ('hour', 'day')
+BUCKET_KEY = ('granularity', 'bucket_start', 'query_text')
+BACKFILL_CHUNK_SIZE = 10000
+# Rows per upsert statement, under SQLite's bound parameter limit
+UPSERT_CHUNK_SIZE = 1000
+
+# Hourly buckets older than this are deleted; daily buckets are kept
+HOURLY_RETENTION_DAYS = 31
+PRUNE_INTERVAL_SECONDS = 3600
+_last_pruned = 0.0
+
+
+def normalize_query(query):
+    """Normalize a search query the way rollup buckets are keyed"""
+    return ' '.join(query.lower().split())[:255]
+
+
+def bucket_start(timestamp, granularity):
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate_searches(searches):
+    """Fold (query, timestamp) pairs into {(granularity, bucket_start, query): count}"""
+    counts = Counter()
+    for query, timestamp in searches:
+        query_text = normalize_query(query)
+        if not query_text:
+            continue
+        for granularity in GRANULARITIES:
+            counts[(granularity, bucket_start(timestamp, granularity), query_text)] += 1
+    return counts
+
+
+def _upsert_counts(session, table, rows):
+    """INSERT ... ON DUPLICATE KEY / ON CONFLICT adding search_count, in the bind's dialect"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql.insert(table).values(rows)
+        return stmt.on_duplicate_key_update(search_count=table.c.search_count + stmt.inserted.search_count)
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=list(BUCKET_KEY),
+            set_={'search_count': table.c.search_count + stmt.excluded.search_count}
+        )
+    raise NotImplementedError(f"No rollup upsert for the {dialect} dialect")
+
+
+def increment_rollups(session, counts, table=None):
+    """Add aggregated counts to the rollup rows (or ``table``'s) with upserts"""
+    if not counts:
+        return
+    table = table if table is not None else SearchQueryRollup.__table__
+
+    rows = [
+        {
+            'granularity': granularity,
+            'bucket_start': bucket,
+            'query_text': query_text,
+            'search_count': count
+        }
+        for (granularity, bucket, query_text), count in counts.items()
+    ]
+
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        session.execute(_upsert_counts(session, table, rows[start:start + UPSERT_CHUNK_SIZE]))
+
+
+def prune_rollups(session, now=None, table=None):
+    """Delete hourly buckets older than HOURLY_RETENTION_DAYS"""
+    table = table if table is not None else SearchQueryRollup.__table__
+    cutoff = bucket_start(now or datetime.utcnow(), 'hour') - timedelta(days=HOURLY_RETENTION_DAYS)
+    session.execute(table.delete().where(table.c.granularity == 'hour', table.c.bucket_start < cutoff))
+
+
+def prune_rollups_periodically(session):
+    """prune_rollups at most every PRUNE_INTERVAL_SECONDS, for the live write path"""
+    global _last_pruned
+    if time.monotonic() - _last_pruned < PRUNE_INTERVAL_SECONDS:
+        return
+    prune_rollups(session)
+    _last_pruned = time.monotonic()
+
+
+def popular_queries(days=7, limit=10, now=None):
+    """Top queries over the last ``days`` days read from rollup buckets
+
+    Whole days come from daily buckets and the leading partial day from
+    hourly buckets, so at most ``days + 24`` buckets are summed. Past
+    HOURLY_RETENTION_DAYS the leading day is counted whole.
+    """
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=days)
+    first_hour = bucket_start(since, 'hour')
+    first_day = bucket_start(since, 'day')
+    if first_day < first_hour and since >= now - timedelta(days=HOURLY_RETENTION_DAYS):
+        first_day += timedelta(days=1)
+
+    search_count = func.sum(SearchQueryRollup.search_count).label('search_count')
+    return db.session.query(SearchQueryRollup.query_text, search_count)\
+                     .filter(or_(
+                         and_(SearchQueryRollup.granularity == 'day',
+                              SearchQueryRollup.bucket_start >= first_day),
+                         and_(SearchQueryRollup.granularity == 'hour',
+                              SearchQueryRollup.bucket_start >= first_hour,
+                              SearchQueryRollup.bucket_start < first_day)
+                     ))\
+                     .group_by(SearchQueryRollup.query_text)\
+                     .order_by(desc('search_count'), SearchQueryRollup.query_text)\
+                     .limit(limit).all()
+
+
+def _roll_up_logs(table, last_id, max_id, chunk_size, echo=None):
+    """Add search logs with ids in (last_id, max_id] to ``table``; returns the number read
+
+    With ``echo`` each chunk is committed and reported; without, the
+    caller's transaction stays open.
+    """
+    processed = 0
+    while max_id is None or last_id < max_id:
+        query = db.session.query(SearchLog.id, SearchLog.query, SearchLog.timestamp)\
+                          .filter(SearchLog.id > last_id)
+        if max_id is not None:
+            query = query.filter(SearchLog.id <= max_id)
+        rows = query.order_by(SearchLog.id).limit(chunk_size).all()
+        if not rows:
+            break
+
+        increment_rollups(db.session, aggregate_searches(
+            (row.query, row.timestamp) for row in rows if row.timestamp
+        ), table=table)
+
+        last_id = rows[-1].id
+        processed += len(rows)
+        if echo is not None:
+            db.session.commit()
+            echo(f"Rolled up {processed} search logs (through id {last_id})")
+    return processed
+
+
+def backfill_rollups(chunk_size=BACKFILL_CHUNK_SIZE, echo=print):
+    """Rebuild all rollups from search_logs into a staging table, then swap it in
+
+    The live table keeps serving (and counting) until one final transaction
+    replaces its rows with the staging table's and counts the logs written
+    since the backfill started. That transaction deletes first, so live
+    increments wait for it to commit and are applied on top.
+    """
+    live = SearchQueryRollup.__table__
+    staging = live.to_metadata(MetaData(), name=f'{live.name}_staging')
+    bind = db.session.get_bind()
+    staging.drop(bind, checkfirst=True)
+    staging.create(bind)
+
+    started = time.perf_counter()
+    try:
+        max_id = db.session.query(func.max(SearchLog.id)).scalar() or 0
+        processed = _roll_up_logs(staging, 0, max_id, chunk_size, echo)
+        prune_rollups(db.session, table=staging)
+        db.session.commit()
+
+        columns = [column.name for column in live.columns if column.name != 'id']
+        db.session.execute(live.delete())
+        db.session.execute(live.insert().from_select(
+            columns, select(*(staging.c[name] for name in columns))
+        ))
+        caught_up = _roll_up_logs(live, max_id, None, chunk_size)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        staging.drop(bind, checkfirst=True)
+
+    elapsed = time.perf_counter() - started
+    echo(f"Backfilled rollups from {processed + caught_up} search logs in {elapsed:.1f}s")
+    return processed + caught_up
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Ids kept per list; larger requests fall back to the live query
+MAX_LIST_LENGTH = 100
+
+# Rebuild after a product change, but at most this often
+MIN_REFRESH_INTERVAL = 30
+
+# Rebuild at least this often, for writes made by other processes
+MAX_AGE = 300
+
+FEATURED = 'featured'
+TOP_RATED = 'top_rated'
+
+
+class TopLists:
+    """Ranked product id lists built in one pass and held in memory
+
+    Keeps the featured list, the global top-rated list and a top-rated
+    list per category, each ordered by rating then review count and capped
+    at ``max_length``. Lists are rebuilt in a background thread when a
+    product changed or the lists are older than ``max_age``; requests keep
+    reading the previous lists meanwhile.
+    """
+
+    def __init__(self, model, max_length=MAX_LIST_LENGTH,
+                 min_refresh_interval=MIN_REFRESH_INTERVAL, max_age=MAX_AGE):
+        self.model = model
+        self.max_length = max_length
+        self.min_refresh_interval = min_refresh_interval
+        self.max_age = max_age
+        self._lists = None
+        self._built_at = 0.0
+        self._dirty = False
+        self._build_lock = threading.Lock()
+        self.builds = 0
+
+    def _load_rows(self):
+        model = self.model
+        return model.query.with_entities(model.id, model.category_id, model.is_featured)\
+                          .filter(model.is_active == True)\
+                          .order_by(model.rating.desc(), model.review_count.desc(), model.id.asc())\
+                          .yield_per(5000)
+
+    def build(self):
+        started = time.perf_counter()
+        lists = {FEATURED: [], TOP_RATED: []}
+
+        for product_id, category_id, is_featured in self._load_rows():
+            if is_featured and len(lists[FEATURED]) < self.max_length:
+                lists[FEATURED].append(product_id)
+            if len(lists[TOP_RATED]) < self.max_length:
+                lists[TOP_RATED].append(product_id)
+            if category_id is not None:
+                category_list = lists.setdefault((TOP_RATED, category_id), [])
+                if len(category_list) < self.max_length:
+                    category_list.append(product_id)
+
+        self._lists = lists
+        self._built_at = time.monotonic()
+        self.builds += 1
+        logger.info(f"Built top lists: {len(lists)} lists in {time.perf_counter() - started:.2f}s")
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def _ensure_fresh(self):
+        if self._lists is None:
+            with self._build_lock:
+                if self._lists is None:
+                    self._dirty = False
+                    self.build()
+            return
+
+        age = time.monotonic() - self._built_at
+        if (age >= self.max_age or (self._dirty and age >= self.min_refresh_interval)) \
+                and self._build_lock.acquire(blocking=False):
+            self._dirty = False
+            try:
+                app = current_app._get_current_object()
+                threading.Thread(target=self._refresh, args=(app,), name='top-lists-refresh',
+                                 daemon=True).start()
+            except Exception:
+                self._dirty = True
+                self._build_lock.release()
+                raise
+
+    def _refresh(self, app):
+        try:
+            with app.app_context():
+                self.build()
+        except Exception as e:
+            logger.error(f"Top lists refresh failed: {e}")
+            self._dirty = True
+        finally:
+            self._build_lock.release()
+
+    def featured(self):
+        self._ensure_fresh()
+        return self._lists[FEATURED]
+
+    def top_rated(self, category_id=None):
+        self._ensure_fresh()
+        if category_id:
+            return self._lists.get((TOP_RATED, category_id), [])
+        return self._lists[TOP_RATED]
+
+    def stats(self):
+        lists = self._lists
+        return {
+            'built': lists is not None,
+            'lists': len(lists) if lists is not None else 0,
+            'builds': self.builds,
+            'stale': self._dirty,
+            'age_seconds': round(time.monotonic() - self._built_at, 1) if lists is not None else None
+        }
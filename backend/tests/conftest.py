@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import types
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    # config.py holds deployment secrets and is not committed; tests only need the page sizes
+    config = types.ModuleType('config')
+    config.Config = type('Config', (), {
+        'PRODUCTS_PER_PAGE': 20,
+        'SEARCH_RESULTS_PER_PAGE': 20,
+        'AI_MODEL': 'gpt-3.5-turbo',
+        'OPENAI_API_KEY': None
+    })
+    sys.modules['config'] = config
+
+from flask import Flask
+from models import db, Category, Product
+
+
+@pytest.fixture
+def app(tmp_path):
+    from api.products import products_bp
+    from api.search import search_bp
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'catalog.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['TESTING'] = True
+    db.init_app(app)
+    app.register_blueprint(products_bp, url_prefix='/api')
+    app.register_blueprint(search_bp, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+        _reset_catalog_caches()
+
+    # No app context is held open, so each request gets a fresh session like in production
+    yield app
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+def _reset_catalog_caches():
+    """Forget catalog state held by module singletons from an earlier test's database"""
+    from api.products import product_cache, top_lists
+    from services.catalog_snapshot import catalog_snapshots
+    from services.catalog_version import product_version
+    from services.category_cache import category_cache
+    from services.search_index import product_index
+
+    product_cache.clear()
+    top_lists._lists = None
+    catalog_snapshots._snapshot = None
+    product_version.invalidate()
+    category_cache.invalidate()
+    product_index.clear()
+
+
+@pytest.fixture
+def catalog(app):
+    """Three categories with 30 active phone products spread across them"""
+    with app.app_context():
+        categories = [Category(name=name) for name in ('Phones', 'Laptops', 'Audio')]
+        db.session.add_all(categories)
+        db.session.flush()
+
+        db.session.add_all([
+            Product(name=f'Phone {i}', sku=f'SKU-{i}', price=Decimal(100 + i), brand='Acme',
+                    category_id=categories[i % 3].id, rating=i % 5, review_count=i,
+                    stock_quantity=i % 4, is_featured=i % 2 == 0)
+            for i in range(30)
+        ])
+        db.session.commit()
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager collecting the SQL statements run by the current thread"""
+
+    @contextmanager
+    def counter():
+        statements = []
+        thread_id = threading.get_ident()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            # Background refreshes run on their own threads and connections
+            if threading.get_ident() == thread_id:
+                statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
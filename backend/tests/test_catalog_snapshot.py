@@ -0,0 +1,88 @@
+"""In-memory filtering and ordering of CatalogSnapshot against what the SQL listing returns"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from services.catalog_snapshot import CatalogSnapshot
+
+Row = namedtuple('Row', 'id name price discount_price rating review_count stock_quantity category_id '
+                        'brand is_active is_featured created_at updated_at')
+
+START = datetime(2026, 1, 1)
+
+
+def _row(product_id, **values):
+    defaults = dict(name=f'Phone {product_id}', price=100.0 + product_id, discount_price=None,
+                    rating=product_id % 5, review_count=product_id, stock_quantity=product_id % 4,
+                    category_id=1 + product_id % 3, brand='Acme', is_active=True,
+                    is_featured=product_id % 2 == 0, created_at=START + timedelta(days=product_id),
+                    updated_at=START + timedelta(days=product_id))
+    defaults.update(values)
+    return Row(id=product_id, **defaults)
+
+
+def _snapshot(rows):
+    return CatalogSnapshot.from_rows(rows, token='t1')
+
+
+def _ids(snapshot, mask):
+    return snapshot.ids[mask].tolist()
+
+
+def test_mask_applies_every_filter_and_skips_inactive():
+    rows = [_row(i) for i in range(1, 13)]
+    rows[0] = _row(1, is_active=False)
+    rows[1] = _row(2, brand='Globex')
+    snapshot = _snapshot(reversed(rows))
+
+    assert 1 not in _ids(snapshot, snapshot.mask())
+    assert _ids(snapshot, snapshot.mask(category_id=2)) == [4, 7, 10]
+    assert _ids(snapshot, snapshot.mask(brand='GLOB')) == [2]
+    assert _ids(snapshot, snapshot.mask(min_price=105, max_price=107)) == [5, 6, 7]
+    assert _ids(snapshot, snapshot.mask(min_rating=4)) == [4, 9]
+    assert _ids(snapshot, snapshot.mask(in_stock=True, featured=True)) == [2, 6, 10]
+
+
+def test_top_orders_by_value_then_id_and_keeps_ties():
+    rows = [_row(i, rating=[3, 5, 3, None, 5, 1][i - 1]) for i in range(1, 7)]
+    snapshot = _snapshot(rows)
+    mask = snapshot.mask()
+
+    assert snapshot.top(mask, 'rating', True, 3).tolist() == [5, 2, 3]
+    assert snapshot.top(mask, 'rating', False, 6).tolist() == [4, 6, 1, 3, 2, 5]
+    assert snapshot.top(mask, 'name', False, 2).tolist() == [1, 2]
+
+
+def test_merged_updates_existing_rows_and_adds_new_ones():
+    snapshot = _snapshot([_row(i) for i in (1, 3, 5)])
+    later = START + timedelta(days=30)
+    merged = snapshot.merged([_row(3, price=1.0, brand='Initech', updated_at=later), _row(4)], 't2')
+
+    assert merged.ids.tolist() == [1, 3, 4, 5]
+    assert merged.token == 't2' and merged.watermark == later
+    assert merged.top(merged.mask(), 'price', False, 1).tolist() == [3]
+    assert _ids(merged, merged.mask(brand='initech')) == [3]
+    # The original is untouched
+    assert snapshot.ids.tolist() == [1, 3, 5]
+    assert snapshot.top(snapshot.mask(), 'price', False, 1).tolist() == [1]
+
+
+def test_merged_without_changes_keeps_the_data():
+    snapshot = _snapshot([_row(1), _row(2)])
+    merged = snapshot.merged([], 't2')
+    assert merged.token == 't2' and snapshot.token == 't1'
+    assert merged.ids.tolist() == [1, 2]
+
+
+def test_filter_ids_keeps_input_order_and_drops_unknown_ids():
+    snapshot = _snapshot([_row(i) for i in range(1, 9)] + [_row(9, is_active=False)])
+
+    assert snapshot.filter_ids([8, 99, 2, 9, 5]) == [8, 2, 5]
+    assert snapshot.filter_ids([8, 2, 5, 6], featured=True) == [8, 2, 6]
+    assert snapshot.filter_ids([]) == []
+
+
+def test_versions_are_updated_at_of_known_ids():
+    snapshot = _snapshot([_row(1), _row(2)])
+    versions = snapshot.versions([2, 7])
+    assert list(versions) == [2]
+    assert snapshot.merged([_row(2, updated_at=START + timedelta(days=9))], 't2').versions([2]) != versions
@@ -0,0 +1,90 @@
+"""Catalog ETags and Last-Modified must change with every committed product write"""
+from datetime import datetime, timedelta
+import threading
+import time
+
+from werkzeug.http import http_date
+
+from models import db, DataVersion, Product
+from services.catalog_version import CatalogVersion, product_version
+
+
+def test_write_stamped_before_newest_row_changes_token(app, catalog):
+    with app.app_context():
+        token, last_modified, _ = product_version.read()
+
+        # Like a transaction that stamped updated_at early and committed after a later one
+        product = db.session.get(Product, 1)
+        product.price = 1
+        product.updated_at = last_modified - timedelta(hours=1)
+        db.session.commit()
+
+        new_token, new_last_modified, _ = product_version.read()
+        assert new_token != token
+        assert new_last_modified >= last_modified
+
+
+def test_hard_delete_of_old_product_moves_last_modified(app, catalog):
+    with app.app_context():
+        Product.query.filter_by(id=2).update({'updated_at': datetime(2020, 1, 1)})
+        db.session.commit()
+        _, last_modified, count = product_version.read()
+
+        db.session.delete(db.session.get(Product, 2))
+        db.session.commit()
+
+        _, new_last_modified, new_count = product_version.read()
+        assert new_count == count - 1
+        assert new_last_modified > last_modified
+
+
+def test_if_modified_since_after_hard_delete_is_not_304(app, catalog):
+    with app.app_context():
+        # A catalog last written long ago; HTTP dates only have whole seconds
+        Product.query.update({'updated_at': datetime(2020, 1, 1)})
+        DataVersion.query.update({'updated_at': datetime(2020, 1, 1)})
+        db.session.commit()
+    product_version.invalidate()
+
+    client = app.test_client()
+    first = client.get('/api/products/featured')
+    assert first.status_code == 200
+    assert first.last_modified.year == 2020
+
+    with app.app_context():
+        db.session.delete(db.session.get(Product, 4))
+        db.session.commit()
+
+    later = client.get('/api/products/featured', headers={'If-Modified-Since': http_date(first.last_modified)})
+    assert later.status_code == 200
+
+
+def test_expired_version_is_re_read_by_one_thread(monkeypatch):
+    version = CatalogVersion(Product, Product.updated_at, ttl=60)
+    reads = []
+    release = threading.Event()
+
+    def read():
+        reads.append(1)
+        release.wait(5)
+        return f'token-{len(reads)}', None, 0
+
+    monkeypatch.setattr(version, 'read', read)
+    release.set()
+    assert version.current() == ('token-1', None)
+    release.clear()
+    version.invalidate()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(version.current())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # All but the reading thread return the previous value without waiting
+    while len(results) < 7:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(reads) == 2
+    assert sorted(token for token, _ in results) == ['token-1'] * 7 + ['token-2']
@@ -0,0 +1,64 @@
+"""Conversation memory shared between workers through the chat_sessions table"""
+from models import db, ChatSession
+from services.conversation_memory import ConversationMemory
+
+SESSION = 'session-1'
+
+
+def _write(user_message, bot_response):
+    db.session.add(ChatSession(session_id=SESSION, user_message=user_message, bot_response=bot_response))
+    db.session.commit()
+
+
+def _user_messages(memory):
+    return [message['content'] for message in memory.messages(SESSION) if message['role'] == 'user']
+
+
+def test_turn_answered_by_another_worker_is_picked_up(app):
+    with app.app_context():
+        memory = ConversationMemory(ChatSession, ChatSession.timestamp)
+        _write('hi', 'hello')
+        assert _user_messages(memory) == ['hi']
+
+        # Another worker answers the next message
+        _write('laptops?', 'Here are some laptops.')
+        assert _user_messages(memory) == ['hi', 'laptops?']
+
+
+def test_unwritten_local_turn_survives_a_reload(app):
+    with app.app_context():
+        memory = ConversationMemory(ChatSession, ChatSession.timestamp)
+        assert _user_messages(memory) == []
+        # Recorded here; the log sink hasn't written it yet
+        memory.record(SESSION, 'phones?', 'Here are some phones.')
+        _write('other worker', 'reply')
+        _write('and again', 'reply')
+
+        assert sorted(_user_messages(memory)) == ['and again', 'other worker', 'phones?']
+
+
+def test_own_turns_being_written_do_not_reload(app, monkeypatch):
+    with app.app_context():
+        memory = ConversationMemory(ChatSession, ChatSession.timestamp)
+        memory.messages(SESSION)
+        loads = []
+        monkeypatch.setattr(memory, '_load', lambda session_id: loads.append(session_id) or [])
+
+        for turn in range(3):
+            memory.record(SESSION, f'question {turn}', 'answer')
+            _write(f'question {turn}', 'answer')
+            memory.messages(SESSION)
+
+        assert loads == []
+        assert _user_messages(memory) == ['question 0', 'question 1', 'question 2']
+
+
+def test_session_cleared_elsewhere_is_dropped(app):
+    with app.app_context():
+        memory = ConversationMemory(ChatSession, ChatSession.timestamp)
+        _write('hi', 'hello')
+        assert _user_messages(memory) == ['hi']
+
+        ChatSession.query.filter_by(session_id=SESSION).delete()
+        db.session.commit()
+        assert _user_messages(memory) == []
@@ -0,0 +1,53 @@
+"""Batch retries and shutdown of the background log writer"""
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from models import db, SearchLog
+from services.log_sink import LogSink
+
+
+def _submit(app, sink, count):
+    with app.app_context():
+        for i in range(count):
+            sink.submit(SearchLog, {'query': f'query {i}', 'results_count': i})
+
+
+def _logged(app):
+    with app.app_context():
+        return db.session.query(SearchLog).count()
+
+
+def test_batch_failing_on_the_connection_is_retried_whole(app):
+    sink = LogSink(db, retry_backoff=0)
+    insert, failures = sink._insert, []
+
+    def flaky_insert(session, rows_by_model):
+        if len(failures) < 2:
+            failures.append(rows_by_model)
+            raise OperationalError('INSERT', {}, Exception('server has gone away'))
+        insert(session, rows_by_model)
+
+    sink._insert = flaky_insert
+    _submit(app, sink, 5)
+    sink.stop()
+
+    assert _logged(app) == 5
+    stats = sink.stats()
+    assert stats['batch_retries'] == 2
+    # One batch, never split into single-row writes
+    assert stats['batches'] == 1 and stats['failed'] == 0
+
+
+def test_stop_writes_everything_queued(app):
+    sink = LogSink(db, flush_interval=60, batch_size=5)
+    # The worker blocks on its first batch, so most rows are still queued when it stops
+    with sink._write_lock:
+        _submit(app, sink, 20)
+        stopper = threading.Thread(target=sink.stop)
+        stopper.start()
+        sink._stopping.wait()
+    stopper.join()
+
+    assert _logged(app) == 20
+    assert not sink.stats()['worker_alive']
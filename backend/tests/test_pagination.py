@@ -0,0 +1,72 @@
+"""Cursor tokens: round trips, and 400 rather than 500 for bad or reused cursors"""
+from base64 import urlsafe_b64encode
+from datetime import datetime
+from decimal import Decimal
+import json
+
+import pytest
+
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def _token(payload):
+    return urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@pytest.mark.parametrize('sort_value', [datetime(2026, 1, 2, 3, 4, 5), Decimal('19.99'), 4.5, 'phone'])
+def test_round_trip(sort_value):
+    assert decode_cursor(encode_cursor(sort_value, 7, 'price:asc'), 'price:asc') == (sort_value, 7)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    _token(['dec', 'abc', 1, None]),
+    _token(['dec', None, 1, None]),
+    _token(['dec', 'NaN', 1, None]),
+    _token(['dt', 'yesterday', 1, None]),
+    _token(['dt', None, 1, None]),
+    _token(['v', 1.5, '1', None]),
+    _token(['x', 1.5, 1, None]),
+])
+def test_malformed_cursor_is_a_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_cursor_for_another_order_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(4.5, 7, 'rating:desc'), 'price:desc')
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor('phone', 7, 'name:asc'), 'name:asc', value_types=(int, float))
+
+
+@pytest.mark.parametrize('url', [
+    '/api/products?pagination=cursor&cursor={bad}',
+    '/api/products?pagination=cursor&sort_by=rating&cursor={price}',
+    '/api/search?q=phone&pagination=cursor&cursor={bad}',
+    '/api/search?q=phone&pagination=cursor&sort_by=name&cursor={price}',
+])
+def test_endpoints_answer_bad_cursors_with_400(app, catalog, url):
+    client = app.test_client()
+    price_cursor = client.get('/api/products?pagination=cursor&sort_by=price&per_page=2')\
+                         .get_json()['pagination']['next_cursor']
+    response = client.get(url.format(bad=_token(['dec', 'abc', 1, None]), price=price_cursor))
+    assert response.status_code == 400, response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/products?pagination=cursor&sort_by=price&sort_order=desc&per_page=7',
+    '/api/search?q=phone&pagination=cursor&sort_by=rating&per_page=7',
+    '/api/search?q=phone&pagination=cursor&per_page=7',
+])
+def test_following_next_cursor_visits_every_product_once(app, catalog, url):
+    client = app.test_client()
+    seen = []
+    cursor = None
+    while True:
+        body = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+        seen += [product['id'] for product in body.get('products', body.get('results', []))]
+        cursor = body['pagination']['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 30
@@ -0,0 +1,35 @@
+"""Versioned lookups in the product payload cache"""
+from services.product_cache import ProductPayloadCache, SQLiteProductStore
+
+
+class _Loader:
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.calls = []
+
+    def __call__(self, product_ids):
+        self.calls.append(list(product_ids))
+        return {product_id: (1, self.payloads[product_id]) for product_id in product_ids}
+
+
+def test_entry_for_another_version_is_a_miss():
+    cache = ProductPayloadCache()
+    load = _Loader({1: b'old', 2: b'two'})
+    assert cache.get_many([1, 2], load, versions={1: 'a', 2: 'a'}) == [b'old', b'two']
+
+    load.payloads[1] = b'new'
+    assert cache.get_many([1, 2], load, versions={1: 'b', 2: 'a'}) == [b'new', b'two']
+    assert load.calls == [[1, 2], [1]]
+
+
+def test_shared_entry_for_another_version_is_a_miss(tmp_path):
+    path = str(tmp_path / 'products.sqlite')
+    writer = ProductPayloadCache(shared_store=SQLiteProductStore(path, 'test'))
+    writer.get_many([1], _Loader({1: b'old'}), versions={1: 'a'})
+
+    reader = ProductPayloadCache(shared_store=SQLiteProductStore(path, 'test'))
+    load = _Loader({1: b'new'})
+    assert reader.get_many([1], load, versions={1: 'a'}) == [b'old']
+    reader.clear()
+    assert reader.get_many([1], load, versions={1: 'b'}) == [b'new']
+    assert load.calls == [[1]]
@@ -0,0 +1,68 @@
+"""When the chatbot's TF-IDF snapshot is rebuilt after catalog writes"""
+from datetime import datetime
+
+from models import db, Category, Product
+from services.catalog_version import CatalogVersion
+from services.product_retriever import ProductRetriever
+
+
+def _retriever(app):
+    version = CatalogVersion(Product, Product.updated_at, data_version=False)
+    retriever = ProductRetriever(Product, Category, refresh_interval=0, version=version)
+    with app.app_context():
+        retriever.retrieve('phone')
+    return retriever
+
+
+def _values(app, name):
+    with app.app_context():
+        product = Product.query.filter_by(name=name).one()
+        return {attr: getattr(product, attr) for attr in ('id', 'name', 'description', 'price',
+                                                         'category_id', 'is_active', 'stock_quantity')}
+
+
+def _update_elsewhere(app, product_name, **values):
+    # Like another worker: no catalog event reaches this process
+    with app.app_context():
+        db.session.execute(Product.__table__.update().where(Product.name == product_name)
+                           .values(updated_at=datetime.utcnow(), **values))
+        db.session.commit()
+
+
+def _refresh(app, retriever):
+    with app.app_context():
+        retriever.version.invalidate()
+        retriever.retrieve('phone')
+    # The refresh thread holds the lock until it is done
+    with retriever._build_lock:
+        return retriever._snapshot
+
+
+def test_only_indexed_fields_mark_the_snapshot_stale(app, catalog):
+    retriever = _retriever(app)
+    values = _values(app, 'Phone 3')
+
+    retriever.product_changed('update', dict(values, stock_quantity=0))
+    assert not retriever.stats()['stale']
+
+    retriever.product_changed('update', dict(values, description='Now with a stylus'))
+    assert retriever.stats()['stale']
+
+
+def test_deactivating_marks_the_snapshot_stale(app, catalog):
+    retriever = _retriever(app)
+    retriever.product_changed('update', dict(_values(app, 'Phone 3'), is_active=False))
+    assert retriever.stats()['stale']
+
+
+def test_writes_elsewhere_rebuild_only_when_indexed_fields_changed(app, catalog):
+    retriever = _retriever(app)
+    snapshot = retriever._snapshot
+
+    _update_elsewhere(app, 'Phone 3', stock_quantity=0)
+    assert _refresh(app, retriever) is snapshot
+
+    _update_elsewhere(app, 'Phone 3', name='Walkman Classic')
+    assert _refresh(app, retriever) is not snapshot
+    with app.app_context():
+        assert retriever.retrieve('walkman') == [_values(app, 'Walkman Classic')['id']]
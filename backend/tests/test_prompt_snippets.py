@@ -0,0 +1,39 @@
+"""Product dicts and prompt lines are only rebuilt for changed products"""
+from services.prompt_snippets import PromptSnippetCache
+
+
+def _product(product_id, updated_at, name=None):
+    return {'id': product_id, 'name': name or f'Phone {product_id}', 'price': 100.0,
+            'description': 'A phone', 'category_id': 1, 'updated_at': updated_at}
+
+
+def test_only_changed_products_are_loaded():
+    cache = PromptSnippetCache()
+    loads = []
+
+    def load_many(product_ids):
+        loads.append(list(product_ids))
+        return {product_id: _product(product_id, versions[product_id], f'v{versions[product_id]}')
+                for product_id in product_ids}
+
+    versions = {1: 'a', 2: 'a', 3: 'a'}
+    assert [p['id'] for p in cache.products([(3, 'a'), (1, 'a')], load_many)] == [3, 1]
+
+    versions[1] = 'b'
+    products = cache.products([(1, 'b'), (2, 'a'), (3, 'a')], load_many)
+    assert loads == [[3, 1], [1, 2]]
+    assert [p['name'] for p in products] == ['vb', 'va', 'va']
+
+    text, tokens = cache.context(products)
+    assert text.startswith('- vb: $100.0 - A phone...\n') and tokens > 0
+
+
+def test_returned_dicts_are_copies_and_category_changes_drop_entries():
+    cache = PromptSnippetCache()
+    load_many = lambda product_ids: {product_id: _product(product_id, 'a') for product_id in product_ids}
+
+    cache.products([(1, 'a')], load_many)[0]['name'] = 'changed'
+    assert cache.products([(1, 'a')], load_many)[0]['name'] == 'Phone 1'
+
+    cache.invalidate_category(1)
+    assert cache.stats()['size'] == 0
@@ -0,0 +1,48 @@
+"""Listing endpoints must run the same number of statements for any page size"""
+import pytest
+
+from api.products import product_cache
+from services.catalog_snapshot import catalog_snapshots
+from services.catalog_version import product_version
+
+
+def _statements(client, count_queries, url):
+    # Cold product cache, so every product on the page is loaded from the database
+    product_cache.clear()
+    with count_queries() as statements:
+        response = client.get(url)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements)
+
+
+@pytest.fixture
+def client(app, catalog, monkeypatch):
+    # Keep the catalog version from being re-read mid-test
+    monkeypatch.setattr(product_version, 'ttl', 3600)
+    client = app.test_client()
+    # Build the search index, top lists and category cache outside the counted requests
+    for url in ('/api/search?q=phone', '/api/products/featured', '/api/products/recommendations'):
+        client.get(url)
+    return client
+
+
+@pytest.mark.parametrize('url, expected', [
+    # The live query: COUNT, the page, then categories in one batched SELECT
+    ('/api/products?per_page={n}', 3),
+    ('/api/products?pagination=cursor&per_page={n}', 2),
+    ('/api/products/featured?limit={n}', 2),
+    ('/api/products/recommendations?limit={n}', 2),
+    ('/api/search?q=phone&per_page={n}', 2),
+])
+def test_listing_statements_do_not_grow_with_page_size(client, count_queries, monkeypatch, url, expected):
+    monkeypatch.setattr(catalog_snapshots, 'current', lambda: None)
+    counts = [_statements(client, count_queries, url.format(n=n)) for n in (1, 5, 15)]
+    assert counts == [expected] * 3
+
+
+def test_snapshot_listing_loads_page_in_one_batch(app, client, count_queries):
+    with app.app_context():
+        catalog_snapshots.refresh()
+    counts = [_statements(client, count_queries, f'/api/products?per_page={n}&sort_by=price') for n in (1, 5, 15)]
+    # The product payloads and their categories
+    assert counts == [2] * 3
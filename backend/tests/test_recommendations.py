@@ -0,0 +1,25 @@
+"""Co-viewed products lead /products/recommendations on every path"""
+import pytest
+
+from api.products import top_lists
+from models import Product
+from services.catalog_snapshot import catalog_snapshots
+from services.cooccurrence import recommendation_store
+
+
+@pytest.mark.parametrize('limit', [3, 'max'])
+def test_related_products_come_first(app, catalog, monkeypatch, limit):
+    with app.app_context():
+        ids = {product.name: product.id for product in Product.query.all()}
+    related = [ids['Phone 3'], ids['Phone 8']]
+    monkeypatch.setattr(recommendation_store, 'related', lambda product_id, k, category_id=None: related)
+    # Cached path and, with limit past the top list length, the live query
+    monkeypatch.setattr(catalog_snapshots, 'current', lambda: None)
+    limit = top_lists.max_length if limit == 'max' else limit
+
+    response = app.test_client().get(
+        f'/api/products/recommendations?exclude_product_id={ids["Phone 1"]}&limit={limit}'
+    )
+    names = [product['name'] for product in response.get_json()['recommendations']]
+    assert names[:2] == ['Phone 3', 'Phone 8']
+    assert 'Phone 1' not in names and len(names) == len(set(names)) == min(limit, 29)
@@ -0,0 +1,52 @@
+"""The in-memory search index against rows written outside this process's ORM session"""
+from datetime import datetime
+
+from models import db, Product
+from services.catalog_version import product_version
+from services.search_index import SearchIndex
+
+
+def _search(client, query):
+    response = client.get(f'/api/search?q={query}&per_page=50')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return sorted(product['name'] for product in response.get_json()['results'])
+
+
+def _insert_without_events(app, **values):
+    # Like a bulk load or another worker: no catalog event reaches this process
+    now = datetime.utcnow()
+    with app.app_context():
+        category_id = Product.query.first().category_id
+        db.session.execute(Product.__table__.insert().values(
+            price=10, category_id=category_id, is_active=True, created_at=now, updated_at=now, **values
+        ))
+        db.session.commit()
+
+
+def test_rows_written_elsewhere_are_found_once_the_version_moves(app, catalog):
+    client = app.test_client()
+    assert _search(client, 'walkman') == []
+
+    _insert_without_events(app, name='Walkman Classic', sku='SKU-W1')
+    # Stands in for the version TTL running out
+    product_version.invalidate()
+    assert _search(client, 'walkman') == ['Walkman Classic']
+
+
+def test_hard_delete_elsewhere_rebuilds_the_index(app, catalog):
+    client = app.test_client()
+    assert len(_search(client, 'phone')) == 30
+
+    with app.app_context():
+        db.session.execute(Product.__table__.delete().where(Product.name == 'Phone 7'))
+        db.session.commit()
+    product_version.invalidate()
+    # The total comes from the index, not from the rows hydrated for the page
+    assert client.get('/api/search?q=phone').get_json()['pagination']['total'] == 29
+
+
+def test_prefix_expands_to_every_matching_term():
+    index = SearchIndex()
+    for doc_id in range(200):
+        index.add(doc_id, {'name': f'model{doc_id:03d}'})
+    assert index.match(['model']) == set(range(200))
@@ -0,0 +1,53 @@
+"""Search rollup upserts, backfill and retention on the test database (SQLite)"""
+from datetime import datetime, timedelta
+
+from models import db, SearchLog, SearchQueryRollup
+from services.search_rollup import (HOURLY_RETENTION_DAYS, aggregate_searches, backfill_rollups,
+                                    increment_rollups, popular_queries, prune_rollups)
+
+NOW = datetime(2026, 10, 17, 12, 30)
+
+
+def _counts():
+    return {(row.granularity, row.bucket_start, row.query_text): row.search_count
+            for row in SearchQueryRollup.query.all()}
+
+
+def test_increments_add_to_existing_buckets(app):
+    with app.app_context():
+        searches = [('Phone', NOW), ('phone ', NOW), ('case', NOW)]
+        increment_rollups(db.session, aggregate_searches(searches))
+        increment_rollups(db.session, aggregate_searches(searches[:1]))
+        db.session.commit()
+
+        assert _counts()[('hour', datetime(2026, 10, 17, 12), 'phone')] == 3
+        assert _counts()[('day', datetime(2026, 10, 17), 'case')] == 1
+        assert [(row.query_text, row.search_count) for row in popular_queries(days=1, now=NOW)] == \
+            [('phone', 3), ('case', 1)]
+
+
+def test_backfill_replaces_rollups_with_counts_from_the_logs(app):
+    with app.app_context():
+        db.session.add_all([SearchLog(query=query, results_count=1, timestamp=NOW)
+                            for query in ('phone', 'phone', 'laptop')])
+        # Stale counts the rebuild must replace
+        increment_rollups(db.session, aggregate_searches([('phone', NOW)] * 10))
+        db.session.commit()
+
+        assert backfill_rollups(chunk_size=2, echo=lambda message: None) == 3
+        assert _counts()[('day', datetime(2026, 10, 17), 'phone')] == 2
+        assert _counts()[('hour', datetime(2026, 10, 17, 12), 'laptop')] == 1
+
+
+def test_prune_drops_only_old_hourly_buckets(app):
+    with app.app_context():
+        old = NOW - timedelta(days=HOURLY_RETENTION_DAYS + 1)
+        increment_rollups(db.session, aggregate_searches([('phone', old), ('phone', NOW)]))
+        prune_rollups(db.session, now=NOW)
+        db.session.commit()
+
+        assert sorted((granularity, bucket) for granularity, bucket, _ in _counts()) == [
+            ('day', datetime(old.year, old.month, old.day)),
+            ('day', datetime(2026, 10, 17)),
+            ('hour', datetime(2026, 10, 17, 12)),
+        ]
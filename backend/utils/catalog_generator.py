@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+import json
+import math
+import random
+
+# Shared traits of a group of categories: brands, naming, price and specs
+CATEGORY_GROUPS = {
+    'electronics': {
+        'brands': ['Voltix', 'Nexora', 'Quantum', 'AudioTech', 'Pixelon', 'Arcwave', 'Lumina', 'Corex'],
+        'adjectives': ['Pro', 'Ultra', 'Max', 'Lite', 'Plus', 'Air', 'Mini', 'Edge'],
+        'price_median': 350.0,
+        'price_sigma': 0.8,
+        'tags': ['wireless', 'bluetooth', 'fast-charging', 'portable', 'premium', 'smart', '5g', 'waterproof'],
+        'specs': {
+            'warranty': ['1 year', '2 years', '3 years'],
+            'color': ['black', 'silver', 'white', 'blue', 'graphite'],
+            'connectivity': ['Bluetooth 5.0', 'Bluetooth 5.3', 'Wi-Fi 6', 'USB-C']
+        }
+    },
+    'clothing': {
+        'brands': ['Northline', 'Urbanist', 'Kestrel', 'Fable & Co', 'Driftwood', 'Marlo', 'Tidewear'],
+        'adjectives': ['Classic', 'Slim', 'Relaxed', 'Vintage', 'Essential', 'Organic', 'Stretch'],
+        'price_median': 45.0,
+        'price_sigma': 0.6,
+        'tags': ['cotton', 'casual', 'summer', 'winter', 'organic', 'slim-fit', 'sustainable', 'sale'],
+        'specs': {
+            'material': ['cotton', 'wool', 'polyester', 'linen', 'denim'],
+            'size': ['XS', 'S', 'M', 'L', 'XL'],
+            'color': ['black', 'navy', 'olive', 'grey', 'white', 'red']
+        }
+    },
+    'home': {
+        'brands': ['Hearthly', 'Oakmere', 'Casa Nova', 'Greenthumb', 'Lumen', 'Nordvik'],
+        'adjectives': ['Modern', 'Rustic', 'Compact', 'Deluxe', 'Minimalist', 'Foldable'],
+        'price_median': 80.0,
+        'price_sigma': 0.9,
+        'tags': ['eco-friendly', 'handmade', 'outdoor', 'indoor', 'energy-efficient', 'gift', 'durable'],
+        'specs': {
+            'material': ['oak', 'steel', 'bamboo', 'ceramic', 'glass'],
+            'color': ['natural', 'white', 'black', 'walnut', 'sage']
+        }
+    },
+    'books': {
+        'brands': ['Penrose Press', 'Harbor Books', 'Quillstone', 'Bluebird Publishing', 'Atlas House'],
+        'adjectives': ['Complete', 'Illustrated', 'Essential', 'Practical', 'Hidden', 'Last', 'Secret'],
+        'price_median': 18.0,
+        'price_sigma': 0.5,
+        'tags': ['bestseller', 'paperback', 'hardcover', 'award-winning', 'new-release', 'classic'],
+        'specs': {
+            'format': ['paperback', 'hardcover', 'ebook'],
+            'language': ['English', 'Spanish', 'French', 'German'],
+            'pages': ['180', '240', '320', '416', '512']
+        }
+    }
+}
+
+# Leaf categories created by DataSeeder.seed_categories -> (group, product nouns)
+CATEGORY_PROFILES = {
+    'Smartphones': ('electronics', ['Smartphone', 'Phone', 'Phone Case', 'Charger']),
+    'Laptops': ('electronics', ['Laptop', 'Notebook', 'Ultrabook', 'Laptop Stand']),
+    'Tablets': ('electronics', ['Tablet', 'Drawing Tablet', 'E-Reader']),
+    'Audio': ('electronics', ['Headphones', 'Earbuds', 'Speaker', 'Soundbar']),
+    'Gaming': ('electronics', ['Controller', 'Gaming Headset', 'Console', 'Gaming Mouse']),
+    "Men's Clothing": ('clothing', ['Shirt', 'Jeans', 'Hoodie', 'Jacket', 'Chinos']),
+    "Women's Clothing": ('clothing', ['Dress', 'Blouse', 'Skirt', 'Cardigan', 'Jeans']),
+    "Kids' Clothing": ('clothing', ['T-Shirt', 'Shorts', 'Pajamas', 'Raincoat']),
+    'Shoes': ('clothing', ['Sneakers', 'Running Shoes', 'Boots', 'Sandals', 'Loafers']),
+    'Accessories': ('clothing', ['Belt', 'Scarf', 'Cap', 'Backpack', 'Wallet']),
+    'Furniture': ('home', ['Coffee Table', 'Armchair', 'Bookshelf', 'Desk', 'Bed Frame']),
+    'Kitchen': ('home', ['Chef Knife', 'Blender', 'Cookware Set', 'Kettle', 'Cutting Board']),
+    'Garden': ('home', ['Planter', 'Garden Hose', 'Pruning Shears', 'Solar Light']),
+    'Decor': ('home', ['Wall Art', 'Vase', 'Table Lamp', 'Rug', 'Mirror']),
+    'Fiction': ('books', ['Novel', 'Mystery', 'Saga', 'Thriller']),
+    'Non-Fiction': ('books', ['Biography', 'History', 'Memoir', 'Essays']),
+    'Educational': ('books', ['Programming Guide', 'Workbook', 'Textbook', 'Handbook']),
+    "Children's Books": ('books', ['Picture Book', 'Storybook', 'Activity Book'])
+}
+
+# Fixed origin for created_at so the same seed always yields the same rows
+CREATED_AT_ORIGIN = datetime(2024, 1, 1)
+CREATED_AT_SPAN_DAYS = 730
+
+
+class SyntheticCatalog:
+    """Deterministic generator of realistic product rows
+
+    The same ``seed`` and ``start`` always produce the same products, so a
+    perf dataset can be rebuilt exactly on another machine.
+    """
+
+    def __init__(self, category_ids, seed=42):
+        # Only generate for categories that exist and have a profile
+        self.categories = sorted(
+            (name, category_ids[name]) for name in CATEGORY_PROFILES if name in category_ids
+        )
+        if not self.categories:
+            raise ValueError('No seeded categories match the synthetic catalog profiles')
+        self.seed = seed
+
+    def products(self, count, start=0):
+        """Yield ``count`` product column dicts, numbered from ``start``"""
+        for number in range(start, start + count):
+            yield self.product(number)
+
+    def product(self, number):
+        # One RNG per product keeps rows independent of chunking and start offset
+        rng = random.Random(f'{self.seed}:{number}')
+        category_name, category_id = rng.choice(self.categories)
+        group_name, nouns = CATEGORY_PROFILES[category_name]
+        group = CATEGORY_GROUPS[group_name]
+
+        brand = rng.choice(group['brands'])
+        noun = rng.choice(nouns)
+        adjective = rng.choice(group['adjectives'])
+        model = f'{rng.choice("ACEKMRSTVXZ")}{rng.randint(1, 99)}'
+        name = f'{brand} {adjective} {noun} {model}'
+
+        price = self._price(rng, group)
+        discount_price = None
+        if rng.random() < 0.2:
+            discount_price = round(price * (1 - rng.uniform(0.05, 0.3)), 2)
+
+        tags = rng.sample(group['tags'], rng.randint(2, 4)) + [noun.lower().replace(' ', '-')]
+        specifications = {key: rng.choice(values) for key, values in group['specs'].items()}
+
+        rating = round(min(5.0, max(1.0, rng.gauss(4.1, 0.5))), 1)
+        review_count = min(int(rng.paretovariate(1.2) * 5) - 5, 50000)
+        stock_quantity = 0 if rng.random() < 0.1 else rng.randint(1, 500)
+        created_at = CREATED_AT_ORIGIN + timedelta(seconds=rng.randint(0, CREATED_AT_SPAN_DAYS * 86400))
+
+        return {
+            'name': name,
+            'description': (
+                f'{adjective} {noun.lower()} from {brand}. '
+                f'{", ".join(tag.replace("-", " ") for tag in tags[:3]).capitalize()}.'
+            ),
+            'price': price,
+            'discount_price': discount_price,
+            'sku': f'SYN{self.seed}-{number:09d}',
+            'stock_quantity': stock_quantity,
+            'category_id': category_id,
+            'brand': brand,
+            'rating': rating,
+            'review_count': review_count,
+            'image_urls': json.dumps([f'https://example.com/images/syn/{number}.jpg']),
+            'tags': json.dumps(tags),
+            'specifications': json.dumps(specifications),
+            'is_active': rng.random() >= 0.02,
+            'is_featured': rng.random() < 0.03,
+            'created_at': created_at,
+            'updated_at': created_at
+        }
+
+    @staticmethod
+    def _price(rng, group):
+        # Log-normal prices with retail-style .99 endings
+        price = rng.lognormvariate(math.log(group['price_median']), group['price_sigma'])
+        return max(math.floor(price) + 0.99, 0.99)
@@ -0,0 +1,83 @@
+from datetime import datetime
+import json
+
+from utils.pagination import decode_cursor, encode_cursor, seek_after
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# Rows fetched per round trip when streaming a whole session
+STREAM_BATCH_SIZE = 500
+
+
+def parse_history_args(args):
+    """Read limit/before/after from request args; (None, None, None) means the whole session
+
+    Raises ValueError for a bad limit or cursor.
+    """
+    before = args.get('before')
+    after = args.get('after')
+    limit = args.get('limit')
+
+    if before and after:
+        raise ValueError('Use either before or after, not both')
+    if limit is None and not before and not after:
+        return None, None, None
+
+    limit = DEFAULT_LIMIT if limit is None else int(limit)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+
+    return (
+        min(limit, MAX_LIMIT),
+        decode_cursor(before, value_types=datetime) if before else None,
+        decode_cursor(after, value_types=datetime) if after else None
+    )
+
+
+def page_history(model, time_column, session_id, columns, limit, before=None, after=None):
+    """One page of a session's messages, oldest first, and whether more exist in that direction
+
+    With no cursor the page is the session's latest ``limit`` messages.
+    ``before`` pages back toward older messages and ``after`` forward toward
+    newer ones; each is a decoded (time, id) cursor.
+    """
+    query = model.query.with_entities(*columns).filter(model.session_id == session_id)
+
+    if after is not None:
+        rows = query.filter(seek_after(time_column, model.id, *after))\
+                    .order_by(time_column.asc(), model.id.asc())\
+                    .limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    if before is not None:
+        query = query.filter(seek_after(time_column, model.id, *before, descending=True))
+    rows = query.order_by(time_column.desc(), model.id.desc()).limit(limit + 1).all()
+    return list(reversed(rows[:limit])), len(rows) > limit
+
+
+def history_cursors(rows, time_key):
+    """(before, after) cursors continuing from the first and last rows of a page"""
+    if not rows:
+        return None, None
+    first, last = rows[0], rows[-1]
+    return (
+        encode_cursor(getattr(first, time_key), first.id),
+        encode_cursor(getattr(last, time_key), last.id)
+    )
+
+
+def stream_history(model, time_column, session_id, columns):
+    """All of a session's messages, oldest first, fetched in batches with a server-side cursor"""
+    return model.query.with_entities(*columns)\
+                      .filter(model.session_id == session_id)\
+                      .order_by(time_column.asc(), model.id.asc())\
+                      .yield_per(STREAM_BATCH_SIZE)
+
+
+def json_array_chunks(rows, serialize):
+    """Encode rows as a JSON array one element at a time"""
+    yield '['
+    for number, row in enumerate(rows):
+        yield (',' if number else '') + json.dumps(serialize(row))
+    yield ']'
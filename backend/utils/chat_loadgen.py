@@ -0,0 +1,174 @@
+"""Replay chat transcripts against /api/chat at a fixed request rate.
+
+Usage (against a running backend, e.g. started with LLM_BACKEND=fake):
+
+    python -m utils.chat_loadgen --url http://localhost:5000 --rps 20 --duration 60
+
+Requests are sent on a fixed schedule whether or not earlier ones have
+finished, and latency is measured from each request's scheduled start, so
+a slow server shows up as latency instead of as a lower request rate.
+Turns of one session are the exception: like a customer, a session waits
+for each reply before sending its next message, and that wait counts
+toward the next turn's latency.
+Results are grouped by the response's intent, which separates the LLM
+path (ai_processed) from the fallback path (fallback_processed).
+
+--transcripts takes a JSONL file with one transcript per line: a JSON
+list of customer messages sent in order within one chat session.
+"""
+import argparse
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+# Built-in transcripts, each replayed as one chat session
+DEFAULT_TRANSCRIPTS = [
+    ['Hi there!', 'I need a new smartphone under $800', 'Which one has the best camera?'],
+    ['Show me laptops between 500 and 1200', 'Are any of them good for gaming?', 'Is it in stock?'],
+    ['Looking for running shoes', 'What about something over $100?', 'Do you have them in size 10?'],
+    ['Can you recommend a good mystery novel?', 'Something popular this year', 'Thanks!'],
+    ['I want headphones for the gym', 'Wireless please, below $150', 'What is your return policy?'],
+    ['Do you sell garden furniture?', 'A table and four chairs', 'How long is shipping?'],
+    ['Help me find a gift for my dad', 'He likes tennis', 'Budget is around 60 dollars'],
+    ['What tablets do you have?', 'Cheapest one please', 'Does it come with a warranty?'],
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def load_transcripts(path):
+    with open(path) as f:
+        transcripts = [json.loads(line) for line in f if line.strip()]
+    return [messages for messages in transcripts if messages]
+
+
+class LoadResult:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)  # outcome -> latencies in ms
+        self.started = None
+        self.finished = None
+
+    def record(self, outcome, latency_ms):
+        with self._lock:
+            self.latencies[outcome].append(latency_ms)
+
+    def report(self):
+        elapsed = (self.finished - self.started) if self.started and self.finished else 0
+        total = sum(len(values) for values in self.latencies.values())
+        errors = sum(len(values) for outcome, values in self.latencies.items()
+                     if outcome == 'error' or outcome.startswith('http_') or outcome == 'network_error')
+
+        print(f"Requests: {total} in {elapsed:.1f}s "
+              f"({total / elapsed if elapsed else 0:.1f} req/s), "
+              f"errors: {errors} ({errors / total * 100 if total else 0:.1f}%)\n")
+        print(f"{'outcome':22} {'count':>7} {'share':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for outcome in sorted(self.latencies):
+            values = sorted(self.latencies[outcome])
+            print(f"{outcome:22} {len(values):7d} {len(values) / total * 100:6.1f}% "
+                  f"{percentile(values, 0.50):9.1f} {percentile(values, 0.95):9.1f} "
+                  f"{percentile(values, 0.99):9.1f} {values[-1]:9.1f}")
+
+        everything = sorted(value for values in self.latencies.values() for value in values)
+        print(f"{'all':22} {total:7d} {100.0 if total else 0:6.1f}% "
+              f"{percentile(everything, 0.50):9.1f} {percentile(everything, 0.95):9.1f} "
+              f"{percentile(everything, 0.99):9.1f} {everything[-1] if everything else 0:9.1f}")
+
+
+def send_chat(url, message, session_id, timeout):
+    """POST one message; returns the outcome label"""
+    body = json.dumps({'message': message, 'session_id': session_id}).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            payload = json.loads(response.read())
+            return payload.get('intent', 'unknown')
+    except urllib.error.HTTPError as e:
+        return f'http_{e.code}'
+    except Exception:
+        return 'network_error'
+
+
+def run(base_url, transcripts, rps, duration, concurrency, timeout):
+    url = base_url.rstrip('/') + '/api/chat'
+    result = LoadResult()
+    total_requests = int(rps * duration)
+
+    # One session per transcript replay; the n-th request plays the next turn
+    sessions = {}
+
+    def message_for(number):
+        slot = number % len(transcripts)
+        messages = transcripts[slot]
+        replay, turn = divmod(number // len(transcripts), len(messages))
+        key = (slot, replay)
+        if key not in sessions:
+            sessions[key] = str(uuid.uuid4())
+        return messages[turn], sessions[key]
+
+    # session_id -> turns scheduled while an earlier turn of the session was in flight
+    waiting = {}
+    waiting_lock = threading.Lock()
+
+    def fire(scheduled_at, message, session_id):
+        while True:
+            outcome = send_chat(url, message, session_id, timeout)
+            result.record(outcome, (time.perf_counter() - scheduled_at) * 1000)
+            with waiting_lock:
+                turns = waiting[session_id]
+                if not turns:
+                    del waiting[session_id]
+                    return
+                scheduled_at, message = turns.popleft()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        result.started = time.perf_counter()
+        for number in range(total_requests):
+            scheduled_at = result.started + number / rps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            message, session_id = message_for(number)
+            with waiting_lock:
+                if session_id in waiting:
+                    waiting[session_id].append((scheduled_at, message))
+                    continue
+                waiting[session_id] = deque()
+            pool.submit(fire, scheduled_at, message, session_id)
+    result.finished = time.perf_counter()
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--rps', type=float, default=10.0)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load to generate')
+    parser.add_argument('--concurrency', type=int, default=200, help='maximum in-flight requests')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--transcripts', help='JSONL file of transcripts (lists of messages)')
+    args = parser.parse_args()
+
+    transcripts = load_transcripts(args.transcripts) if args.transcripts else DEFAULT_TRANSCRIPTS
+    if not transcripts:
+        parser.error('no transcripts to replay')
+
+    print(f"Replaying {len(transcripts)} transcripts at {args.rps} req/s for {args.duration}s "
+          f"against {args.url}\n")
+    run(args.url, transcripts, args.rps, args.duration, args.concurrency, args.timeout).report()
+
+
+if __name__ == '__main__':
+    main()
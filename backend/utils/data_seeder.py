@@ -1,5 +1,10 @@
 from models import db, Category, Product
+from sqlalchemy import insert
+from utils.catalog_generator import SyntheticCatalog
 import json
+import time
+
+SEED_CHUNK_SIZE = 5000
 
 class DataSeeder:
     @staticmethod
@@ -97,30 +102,77 @@ class DataSeeder:
             # Add more products...
         ]
         
+        category_ids = DataSeeder.category_map()
+        rows = []
         for prod_data in products_data:
-            # Find category
-            category = Category.query.filter_by(name=prod_data["category"]).first()
-            if not category:
+            category_id = category_ids.get(prod_data["category"])
+            if not category_id:
                 continue
             
-            product = Product(
-                name=prod_data["name"],
-                description=prod_data["description"],
-                price=prod_data["price"],
-                discount_price=prod_data.get("discount_price"),
-                sku=prod_data["sku"],
-                stock_quantity=prod_data["stock_quantity"],
-                category_id=category.id,
-                brand=prod_data["brand"],
-                rating=prod_data["rating"],
-                review_count=prod_data["review_count"],
-                tags=json.dumps(prod_data["tags"]),
-                specifications=json.dumps(prod_data["specifications"]),
-                is_featured=prod_data.get("is_featured", False)
-            )
-            db.session.add(product)
+            rows.append({
+                "name": prod_data["name"],
+                "description": prod_data["description"],
+                "price": prod_data["price"],
+                "discount_price": prod_data.get("discount_price"),
+                "sku": prod_data["sku"],
+                "stock_quantity": prod_data["stock_quantity"],
+                "category_id": category_id,
+                "brand": prod_data["brand"],
+                "rating": prod_data["rating"],
+                "review_count": prod_data["review_count"],
+                "tags": json.dumps(prod_data["tags"]),
+                "specifications": json.dumps(prod_data["specifications"]),
+                "is_featured": prod_data.get("is_featured", False)
+            })
         
+        if rows:
+            db.session.execute(insert(Product), rows)
+        db.session.commit()
+    
+    @staticmethod
+    def category_map():
+        """Map category name -> id with a single query"""
+        return {name: category_id for category_id, name in db.session.query(Category.id, Category.name)}
+    
+    @staticmethod
+    def seed_synthetic_products(count, seed=42, start=0, chunk_size=SEED_CHUNK_SIZE, echo=print):
+        """Bulk insert ``count`` deterministic synthetic products in chunks
+        
+        Rows go through executemany INSERTs and skip ORM unit-of-work and
+        change events, so in-memory search structures need a restart (or
+        rebuild) to see them.
+        """
+        category_ids = DataSeeder.category_map()
+        if not category_ids:
+            DataSeeder.seed_categories()
+            category_ids = DataSeeder.category_map()
+        
+        catalog = SyntheticCatalog(category_ids, seed=seed)
+        started = time.perf_counter()
+        inserted = 0
+        chunk = []
+        
+        for product in catalog.products(count, start=start):
+            chunk.append(product)
+            if len(chunk) >= chunk_size:
+                inserted += DataSeeder._insert_chunk(chunk)
+                chunk = []
+                elapsed = time.perf_counter() - started
+                echo(f"Inserted {inserted}/{count} products ({inserted / elapsed:,.0f} rows/sec)")
+        
+        if chunk:
+            inserted += DataSeeder._insert_chunk(chunk)
+        
+        elapsed = time.perf_counter() - started
+        rate = inserted / elapsed if elapsed else 0
+        echo(f"Seeded {inserted} products in {elapsed:.1f}s ({rate:,.0f} rows/sec)")
+        return inserted
+    
+    @staticmethod
+    def _insert_chunk(rows):
+        db.session.execute(insert(Product), rows)
         db.session.commit()
+        return len(rows)
 
 # ===================================
 
@@ -151,10 +203,55 @@ def reset_db():
     except Exception as e:
         click.echo(f"Error resetting database: {e}")
 
+@click.command('backfill-search-rollups')
+@click.option('--chunk-size', default=10000, show_default=True, help='Search logs read per chunk')
+@with_appcontext
+def backfill_search_rollups(chunk_size):
+    """Rebuild search query rollups from existing search logs"""
+    try:
+        from services.search_rollup import backfill_rollups
+        backfill_rollups(chunk_size=chunk_size, echo=click.echo)
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f"Error backfilling search rollups: {e}")
+
+@click.command('seed-catalog')
+@click.option('--count', default=100000, show_default=True, help='Number of products to generate')
+@click.option('--seed', default=42, show_default=True, help='Random seed (same seed, same catalog)')
+@click.option('--start', default=0, show_default=True, help='First product number, to extend a catalog')
+@click.option('--chunk-size', default=SEED_CHUNK_SIZE, show_default=True, help='Rows per INSERT batch')
+@with_appcontext
+def seed_catalog(count, seed, start, chunk_size):
+    """Seed a large deterministic synthetic catalog for load testing"""
+    try:
+        DataSeeder.seed_synthetic_products(count, seed=seed, start=start,
+                                           chunk_size=chunk_size, echo=click.echo)
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f"Error seeding catalog: {e}")
+
+@click.command('build-recommendations')
+@click.option('--days', default=90, show_default=True, help='Days of chat and search logs to read')
+@click.option('--top-k', default=20, show_default=True, help='Related products kept per product')
+@click.option('--min-support', default=2, show_default=True, help='Sessions a pair must share')
+@click.option('--output', default=None, help='Index file (default: RECOMMENDATIONS_PATH)')
+@with_appcontext
+def build_recommendations(days, top_k, min_support, output):
+    """Rebuild co-occurrence recommendations from chat and search logs"""
+    try:
+        from services.cooccurrence import INDEX_PATH, build_recommendations as build
+        build(path=output or INDEX_PATH, days=days, top_k=top_k, min_support=min_support, echo=click.echo)
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f"Error building recommendations: {e}")
+
 # Register commands
 def register_commands(app):
     app.cli.add_command(seed_data)
     app.cli.add_command(reset_db)
+    app.cli.add_command(backfill_search_rollups)
+    app.cli.add_command(seed_catalog)
+    app.cli.add_command(build_recommendations)
 
 if __name__ == '__main__':
     from datetime import datetime
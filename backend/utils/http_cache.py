@@ -0,0 +1,68 @@
+from datetime import timezone
+from functools import wraps
+import hashlib
+import logging
+
+from flask import make_response, request
+
+logger = logging.getLogger(__name__)
+
+
+def catalog_etag(token):
+    """ETag for the current request: the data version plus the path and its query args"""
+    digest = hashlib.sha1(token.encode('utf-8'))
+    digest.update(request.path.encode('utf-8'))
+    for key, value in sorted(request.args.items(multi=True)):
+        digest.update(f"\0{key}={value}".encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def _http_date(last_modified):
+    # HTTP dates have whole seconds; stored timestamps are naive UTC
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0)
+
+
+def _is_fresh(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_get(validator, max_age):
+    """Serve the view with ETag, Last-Modified and Cache-Control, or 304 without running it
+
+    ``validator()`` returns ``(token, last_modified)`` describing the data
+    the view reads, where ``last_modified`` may be None. It is called before
+    the view, so it must be cheaper than the view (a memoized version, not
+    the query itself). If it fails, the view runs uncached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                token, last_modified = validator()
+                etag = catalog_etag(token)
+                last_modified = _http_date(last_modified) if last_modified else None
+            except Exception as e:
+                logger.warning(f"Skipping conditional GET for {request.path}: {e}")
+                return view(*args, **kwargs)
+
+            if _is_fresh(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            return response
+        return wrapper
+    return decorator
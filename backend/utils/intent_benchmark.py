@@ -0,0 +1,87 @@
+"""Measure per-message cost of intent and filter extraction.
+
+Usage (from the backend directory; needs no database):
+
+    python -m utils.intent_benchmark --iterations 20000 --brands 500
+
+Compares the compiled IntentMatcher with the previous keyword scan
+(one substring check per keyword plus an uncompiled re.findall).
+"""
+import argparse
+import re
+import time
+
+from services.intent_matcher import CATEGORY_KEYWORDS, INTENT_KEYWORDS, IntentMatcher
+
+SAMPLE_MESSAGES = [
+    'Hello there!',
+    'Show me smartphones under $500',
+    'I am looking for running shoes between 50 and 120',
+    'What is the best laptop for programming?',
+    'Is the tennis racket in stock?',
+    'Recommend a novel and a reading light',
+    'cheap headphones over $20 with good reviews please',
+    'Do you have any garden furniture? My budget is 300 dollars and I want something durable',
+]
+
+
+def legacy_extract(message):
+    """The scan that IntentMatcher replaced, kept for comparison"""
+    message_lower = message.lower()
+
+    prices = re.findall(r'\$?(\d+(?:\.\d{2})?)', message_lower)
+    price_range = None
+    if len(prices) >= 2:
+        price_range = (float(prices[0]), float(prices[1]))
+    elif len(prices) == 1:
+        if any(word in message_lower for word in ['under', 'below', 'less than']):
+            price_range = (0, float(prices[0]))
+        elif any(word in message_lower for word in ['over', 'above', 'more than']):
+            price_range = (float(prices[0]), 999999)
+
+    category = None
+    for label, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in message_lower for keyword in keywords):
+            category = label
+            break
+
+    intent = 'general'
+    for label, keywords in INTENT_KEYWORDS.items():
+        if any(keyword in message_lower for keyword in keywords):
+            intent = label
+            break
+
+    return category, intent, price_range
+
+
+def time_per_message(extract, messages, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        extract(messages[i % len(messages)])
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--brands', type=int, default=0,
+                        help='number of synthetic brand names to compile into the matcher')
+    args = parser.parse_args()
+
+    matcher = IntentMatcher(brands=[f'Brand{i}' for i in range(args.brands)])
+
+    started = time.perf_counter()
+    matcher.add_brands(['Voltix'])
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    legacy_us = time_per_message(legacy_extract, SAMPLE_MESSAGES, args.iterations)
+    matcher_us = time_per_message(matcher.match, SAMPLE_MESSAGES, args.iterations)
+
+    print(f"Messages: {len(SAMPLE_MESSAGES)} samples x {args.iterations} iterations")
+    print(f"Brands compiled: {len(matcher.brands)} (recompile {compile_ms:.2f} ms)")
+    print(f"Keyword scan:    {legacy_us:8.2f} us/message (first category, first intent)")
+    print(f"IntentMatcher:   {matcher_us:8.2f} us/message (all categories, intents and brands)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import json
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort_value, row_id, order=None):
+    """Encode the last row's (sort key, id) as an opaque URL-safe token
+
+    ``order`` (e.g. "price:desc") names the ordering the token belongs to;
+    decode_cursor rejects it for any other.
+    """
+    if isinstance(sort_value, datetime):
+        payload = ['dt', sort_value.isoformat(), row_id, order]
+    elif isinstance(sort_value, Decimal):
+        payload = ['dec', str(sort_value), row_id, order]
+    else:
+        payload = ['v', sort_value, row_id, order]
+
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, order=None, value_types=None):
+    """Decode a token from encode_cursor for ``order``
+
+    Raises ValueError if the token is malformed, was issued for another
+    ordering, or (with ``value_types``) carries a sort value of another type.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        kind, sort_value, row_id, token_order = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+    if token_order != order:
+        raise ValueError('Cursor does not match the requested sort order')
+
+    try:
+        if kind == 'dt':
+            sort_value = datetime.fromisoformat(sort_value)
+        elif kind == 'dec':
+            sort_value = Decimal(sort_value)
+            if not sort_value.is_finite():
+                raise ValueError
+        elif kind != 'v':
+            raise ValueError
+    except (TypeError, ValueError, InvalidOperation):
+        raise ValueError('Invalid cursor')
+
+    if value_types is not None and not isinstance(sort_value, value_types):
+        raise ValueError('Invalid cursor')
+    if not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise ValueError('Invalid cursor')
+    return sort_value, row_id
+
+
+def seek_after(column, id_column, sort_value, row_id, descending=False):
+    """WHERE clause selecting rows after (sort_value, row_id) in ORDER BY column, id"""
+    if descending:
+        return or_(column < sort_value, and_(column == sort_value, id_column < row_id))
+    return or_(column > sort_value, and_(column == sort_value, id_column > row_id))